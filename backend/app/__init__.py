@@ -1,5 +1,4 @@
 from flask import Flask, jsonify
-from pymongo import MongoClient
 from flask_cors import CORS
 import os
 from dotenv import load_dotenv
@@ -8,13 +7,14 @@ from app.config import Config
 # Load environment variables
 load_dotenv()
 
-def create_app(test_config=None):
-    """Application Factory Function"""
+def create_app(test_config=None, init_clients=True):
+    """Application Factory Function
+
+    With ``init_clients=False`` nothing connects or starts threads here; the
+    WSGI server initializes each worker after forking (see ``gunicorn.conf.py``).
+    """
     app = Flask(__name__)
     
-    # Set debug mode
-    app.debug = True
-    
     # Set up CORS - allow all origins for now
     CORS(app)
     
@@ -24,34 +24,46 @@ def create_app(test_config=None):
     else:
         app.config.from_mapping(test_config)
     
-    # Initialize MongoDB
-    try:
-        client = MongoClient(app.config["MONGO_URI"])
-        # Test connection
-        client.admin.command('ping')
-        app.db = client.get_default_database()
-        print("✅ Connected to MongoDB successfully")
-    except Exception as e:
-        print(f"❌ MongoDB connection error: {e}")
-        # Continue anyway to allow the API to start
+    # Encode ObjectIds and datetimes in responses, with orjson when installed
+    from app.utils.serialization import init_json
+    init_json(app)
+    
+    # Request and MongoDB timings for /metrics
+    from app.utils.metrics import init_request_metrics, register_mongo_metrics
+    init_request_metrics(app)
+    register_mongo_metrics()
+    
+    # Per-request spans and the Server-Timing header
+    from app.utils.tracing import init_tracing, register_mongo_tracing
+    init_tracing(app)
+    register_mongo_tracing()
+    
+    # gzip/brotli for large responses; after tracing so it's timed as a span
+    from app.utils.compression import init_compression
+    init_compression(app)
+    
+    # Per-query-shape stats for /debug/queries
+    from app.utils.query_monitor import register_query_monitor
+    register_query_monitor(app.config)
+    
+    # MongoDB, LLM clients and background jobs are per process
+    from app.utils.lifecycle import init_lifecycle, init_process, readiness
+    init_lifecycle(app)
     
     # Import and register blueprints
     try:
-        from app.routes import misc, alexa, patients, daily_summary
+        from app.routes import misc, alexa, patients, daily_summary, events
         app.register_blueprint(misc.bp)
         app.register_blueprint(alexa.bp)
         app.register_blueprint(patients.bp)
         app.register_blueprint(daily_summary.bp)
-        
-        # Start background tasks for database updates
-        from app.tasks.background_tasks import start_background_tasks
-        start_background_tasks()
-        print("✅ Started background database update tasks")
+        app.register_blueprint(events.bp)
         
         # Print registered routes for debugging
-        print("\n🔍 Registered Routes:")
-        for rule in app.url_map.iter_rules():
-            print(f"  {rule.endpoint} -> {rule.rule} [{', '.join(rule.methods)}]")
+        if app.debug:
+            print("\n🔍 Registered Routes:")
+            for rule in app.url_map.iter_rules():
+                print(f"  {rule.endpoint} -> {rule.rule} [{', '.join(rule.methods)}]")
         
     except ImportError as e:
         print(f"❌ Error importing blueprints: {e}")
@@ -65,7 +77,15 @@ def create_app(test_config=None):
     def health():
         return jsonify({
             "status": "OK",
-            "mongodb": "connected" if 'db' in app.__dict__ else "not connected"
+            "mongodb": "connected" if app.extensions.get("mongodb_connected") else "not connected"
         })
+    
+    @app.route('/api/ready')
+    def ready():
+        is_ready, checks = readiness(app)
+        return jsonify({"status": "ready" if is_ready else "not ready", **checks}), 200 if is_ready else 503
+    
+    if init_clients:
+        init_process(app)
 
     return app
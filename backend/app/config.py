@@ -9,6 +9,112 @@ class Config:
     
     # OpenAI configuration
     OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+    # Alternative OpenAI-compatible endpoint, e.g. the fake server used by benchmarks
+    OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL")
+    
+    # Models used for Alexa conversation turns. When the primary model won't
+    # finish within the turn's deadline, the fast model answers instead with
+    # a shorter completion.
+    OPENAI_CONVERSATION_MODEL = os.getenv("OPENAI_CONVERSATION_MODEL", "gpt-4-turbo")
+    OPENAI_FAST_MODEL = os.getenv("OPENAI_FAST_MODEL", "gpt-4o-mini")
+    OPENAI_FALLBACK_MAX_TOKENS = int(os.getenv("OPENAI_FALLBACK_MAX_TOKENS", 300))
+    OPENAI_FALLBACK_RESERVE_SECONDS = float(os.getenv("OPENAI_FALLBACK_RESERVE_SECONDS", 2.0))
+    # Symptom analysis uses structured outputs, so needs a model that supports them
+    OPENAI_ANALYSIS_MODEL = os.getenv("OPENAI_ANALYSIS_MODEL", "gpt-4o")
+    
+    # Settle clear-cut symptoms locally and only ask the LLM about the rest
+    SYMPTOM_TAGGER_ENABLED = os.getenv("SYMPTOM_TAGGER_ENABLED", "true").lower() == "true"
+    SYMPTOM_TAGGER_MIN_CONFIDENCE = float(os.getenv("SYMPTOM_TAGGER_MIN_CONFIDENCE", 0.8))
+    # Extract symptoms after every turn so only a finalize is left at the end
+    SYMPTOM_EXTRACTION_PER_TURN = os.getenv("SYMPTOM_EXTRACTION_PER_TURN", "true").lower() == "true"
+    
+    # Serve deterministic interview turns (greeting, moving on after a clear
+    # "no") from templates instead of the LLM
+    INTERVIEW_ENGINE_ENABLED = os.getenv("INTERVIEW_ENGINE_ENABLED", "true").lower() == "true"
+    
+    # Time budget for an Alexa turn; Alexa gives up on skills after 8 seconds
+    ALEXA_DEADLINE_SECONDS = float(os.getenv("ALEXA_DEADLINE_SECONDS", 7.0))
+    
+    # Circuit breakers around each OpenAI model: open when this share of recent
+    # calls fail or run slower than the slow-call threshold, probe after the open period
+    LLM_BREAKER_FAILURE_RATE = float(os.getenv("LLM_BREAKER_FAILURE_RATE", 0.5))
+    LLM_BREAKER_SLOW_CALL_SECONDS = float(os.getenv("LLM_BREAKER_SLOW_CALL_SECONDS", 15.0))
+    LLM_BREAKER_SLOW_CALL_RATE = float(os.getenv("LLM_BREAKER_SLOW_CALL_RATE", 0.5))
+    LLM_BREAKER_OPEN_SECONDS = float(os.getenv("LLM_BREAKER_OPEN_SECONDS", 30.0))
+    
+    # Hedged requests for interactive turns: send a backup request when the first
+    # is slower than this latency percentile, for at most this share of requests
+    LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "false").lower() == "true"
+    LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", 95))
+    LLM_HEDGE_BUDGET_RATIO = float(os.getenv("LLM_HEDGE_BUDGET_RATIO", 0.1))
+    
+    # LLM scheduling: concurrent calls per priority class and in total, and
+    # OpenAI rate limits shared by all workers (0 disables the shared limiter)
+    LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 16))
+    LLM_CONCURRENCY_LIMITS = {
+        "interactive": int(os.getenv("LLM_CONCURRENCY_INTERACTIVE", 16)),
+        "summary": int(os.getenv("LLM_CONCURRENCY_SUMMARY", 4)),
+        "analysis": int(os.getenv("LLM_CONCURRENCY_ANALYSIS", 2)),
+        "batch": int(os.getenv("LLM_CONCURRENCY_BATCH", 1))
+    }
+    LLM_REQUESTS_PER_MINUTE = int(os.getenv("LLM_REQUESTS_PER_MINUTE", 500))
+    LLM_TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", 200000))
+    LLM_RATE_INTERACTIVE_RESERVE = float(os.getenv("LLM_RATE_INTERACTIVE_RESERVE", 0.2))
+    LLM_QUEUE_TIMEOUT_SECONDS = float(os.getenv("LLM_QUEUE_TIMEOUT_SECONDS", 60))
+    
+    # Memo for LLM calls: "on" reuses deterministic (temperature 0) results,
+    # "record" also writes every response to LLM_FIXTURES_DIR and "replay"
+    # serves every call from there without network access
+    LLM_MEMO_MODE = os.getenv("LLM_MEMO_MODE", "on")
+    LLM_MEMO_STORE = os.getenv("LLM_MEMO_STORE", "mongo")
+    LLM_MEMO_TTL_SECONDS = int(os.getenv("LLM_MEMO_TTL_SECONDS", 7 * 24 * 3600))
+    LLM_MEMO_MAX_ENTRIES = int(os.getenv("LLM_MEMO_MAX_ENTRIES", 10000))
+    LLM_MEMO_DIR = os.getenv("LLM_MEMO_DIR", os.path.join(os.path.dirname(__file__), "..", ".llm_memo"))
+    LLM_MEMO_MAX_BYTES = int(os.getenv("LLM_MEMO_MAX_BYTES", 100 * 1024 * 1024))
+    LLM_FIXTURES_DIR = os.getenv("LLM_FIXTURES_DIR", os.path.join(os.path.dirname(__file__), "..", "fixtures", "llm"))
+    
+    # Request tracing: every response gets a Server-Timing breakdown; this
+    # share of traces (plus any the caller marked sampled) is exported as
+    # JSON lines or to an OTLP/HTTP collector ("jsonl", "otlp" or "none")
+    TRACING_ENABLED = os.getenv("TRACING_ENABLED", "true").lower() == "true"
+    TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", 0.05))
+    TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "jsonl")
+    TRACE_JSONL_PATH = os.getenv("TRACE_JSONL_PATH", os.path.join(os.path.dirname(__file__), "..", "traces.jsonl"))
+    TRACE_OTLP_ENDPOINT = os.getenv("TRACE_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+    TRACE_SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME", "clinical-backend")
+    
+    # MongoDB query monitor: per-shape stats, a warning for operations slower
+    # than QUERY_SLOW_MS or returning more than QUERY_MAX_DOCUMENTS documents,
+    # and an explain() of each new query shape to find collection scans
+    QUERY_MONITOR_ENABLED = os.getenv("QUERY_MONITOR_ENABLED", "true").lower() == "true"
+    QUERY_SLOW_MS = float(os.getenv("QUERY_SLOW_MS", 100))
+    QUERY_MAX_DOCUMENTS = int(os.getenv("QUERY_MAX_DOCUMENTS", 500))
+    QUERY_EXPLAIN_NEW_SHAPES = os.getenv("QUERY_EXPLAIN_NEW_SHAPES", "true").lower() == "true"
+    
+    # Patient list: filtered totals are counted up to this many and then
+    # reported as an estimate
+    PATIENT_LIST_COUNT_LIMIT = int(os.getenv("PATIENT_LIST_COUNT_LIMIT", 1000))
+    
+    # Cohort symptom queries: each process keeps this many days of every
+    # patient's symptom history in memory, reloaded once it is this old
+    SYMPTOM_INDEX_DAYS = int(os.getenv("SYMPTOM_INDEX_DAYS", 365))
+    SYMPTOM_INDEX_MAX_AGE_SECONDS = float(os.getenv("SYMPTOM_INDEX_MAX_AGE_SECONDS", 300))
+    
+    # Server-Sent Events: each open /api/events/stream holds one of the
+    # worker's WEB_THREADS threads, so a process serves at most
+    # EVENT_STREAM_MAX_CONNECTIONS streams (others get a 503 and should
+    # long-poll /api/events) and closes each after EVENT_STREAM_MAX_SECONDS;
+    # EventSource reconnects and resumes from Last-Event-ID
+    EVENT_STREAM_MAX_CONNECTIONS = int(os.getenv("EVENT_STREAM_MAX_CONNECTIONS", 2))
+    EVENT_STREAM_MAX_SECONDS = float(os.getenv("EVENT_STREAM_MAX_SECONDS", 300))
+    
+    # Response compression: JSON and text bodies of at least
+    # COMPRESSION_MIN_BYTES are sent with brotli (when installed) or gzip,
+    # whichever the client accepts
+    COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "true").lower() == "true"
+    COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", 1024))
+    COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", 6))
+    COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", 4))
     
     # Alexa API key configuration
     ALEXA_API_KEY = os.getenv("ALEXA_API_KEY")
@@ -16,4 +122,23 @@ class Config:
     # List of valid API keys for authenticating requests
     VALID_API_KEYS = [ALEXA_API_KEY]
     
-    DEBUG = True
\ No newline at end of file
+    # Background job runner: how long the leader lease lasts and how often it is renewed
+    JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", 30))
+    JOB_HEARTBEAT_SECONDS = int(os.getenv("JOB_HEARTBEAT_SECONDS", 10))
+    
+    # Serving: the debugger and route listing are for local development only.
+    # Background jobs can be disabled on web workers when a separate process
+    # runs them; otherwise the job runner's leader lease keeps them to one
+    # process. Readiness pings MongoDB with this timeout
+    DEBUG = os.getenv("FLASK_DEBUG", "false").lower() == "true"
+    BACKGROUND_JOBS_ENABLED = os.getenv("BACKGROUND_JOBS_ENABLED", "true").lower() == "true"
+    JOB_STOP_TIMEOUT_SECONDS = int(os.getenv("JOB_STOP_TIMEOUT_SECONDS", 5))
+    MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", 30000))
+    READINESS_TIMEOUT_SECONDS = float(os.getenv("READINESS_TIMEOUT_SECONDS", 2))
+    
+    # Startup: with STARTUP_WARMUP a background thread pings MongoDB, starts
+    # the job runner and builds the OpenAI client after boot; jobs that run
+    # on start wait JOB_START_DELAY_SECONDS so they don't compete with the
+    # first requests
+    STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "true").lower() == "true"
+    JOB_START_DELAY_SECONDS = float(os.getenv("JOB_START_DELAY_SECONDS", 10))
\ No newline at end of file
@@ -26,7 +26,7 @@ class ConversationHelper:
         }
     
     @staticmethod
-    def create_bot_message(patient_id, content, chain_of_thoughts=None):
+    def create_bot_message(patient_id, content, chain_of_thoughts=None, served_by=None):
         """Create a bot message document."""
         message = {
             "_id": ObjectId(),
@@ -38,6 +38,10 @@ class ConversationHelper:
         
         if chain_of_thoughts:
             message["chain_of_thoughts"] = chain_of_thoughts
+        
+        # Which model/fallback path produced the response
+        if served_by:
+            message["served_by"] = served_by
             
         return message
     
@@ -60,15 +64,6 @@ class ConversationHelper:
             
         return formatted
     
-    @staticmethod
-    def json_encoder(obj):
-        """Custom JSON encoder for MongoDB documents."""
-        if isinstance(obj, ObjectId):
-            return str(obj)
-        if isinstance(obj, datetime):
-            return obj.isoformat()
-        raise TypeError(f"Object of type {type(obj)} is not JSON serializable")
-
     @staticmethod
     def get_initial_symptom_states():
         """Get initial symptom states structure"""
@@ -1,19 +1,237 @@
-from flask import Blueprint, jsonify, request, current_app
+from flask import Blueprint, jsonify, request, current_app, Response, stream_with_context
 from datetime import datetime, timedelta
 from functools import wraps
-from ..utils.openai_utils import get_conversation_response, analyze_symptoms, get_openai_client
+from ..utils.openai_utils import (
+    get_conversation_response, stream_conversation_response, analyze_symptoms,
+    get_openai_client, load_prompt, CONVERSATION_SYSTEM_PROMPT
+)
 from ..models.conversation import ConversationHelper
 from bson import ObjectId
+from pymongo.errors import ExecutionTimeout
 import os
 import json
 from app.middleware.auth import api_key_required
+from app.utils.deadline import Deadline, InvalidDeadline, DeadlineExceeded
+from app.utils.analysis_queue import queue_symptom_analysis
+from app.utils.patient_list import reported_symptoms
+from app.utils.patient_overview import refresh_patient_overview
+from app.utils.symptom_history import refresh_symptom_history
+from app.utils.incremental_analysis import schedule_turn_extraction, finalize_symptom_analysis, last_user_message_id
+from app.utils.interview import local_reply as interview_reply, record_turn as record_interview_turn
+from app.utils.symptom_tagger import strip_status_header, STATUS_HEADER_SEPARATOR, STATUS_HEADER_START
+from app.utils.events import (
+    publish_event, read_events, latest_sequence, format_event,
+    CONVERSATION_MESSAGE, SYMPTOM_STATES_UPDATED, ALEXA_ID_ASSIGNED
+)
 
 bp = Blueprint('alexa', __name__)
 
+CONVERSATION_END_MARKER = "CONVERSATION_END"
+
+# served_by for turns answered by the interview engine without the LLM
+INTERVIEW_SERVED_BY = {"path": "interview", "model": None, "max_tokens": None}
+
+def prepare_conversation(patient, content, deadline=None):
+    """
+    Store the user's message and build the OpenAI message list for the turn.
+    Returns the formatted messages and today's conversation logs.
+    """
+    # Create and store user message
+    user_msg = ConversationHelper.create_user_message(
+        patient_id=str(patient["_id"]),
+        content=content
+    )
+    current_app.db.conversation_logs.insert_one(user_msg)
+    publish_event(current_app.db, CONVERSATION_MESSAGE, ConversationHelper.format_for_frontend(user_msg), patient=patient)
+
+    # Get conversation history for this patient from today
+    today_start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    history = current_app.db.conversation_logs.find({
+        "patient_id": str(patient["_id"]),
+        "created_at": {"$gte": today_start}
+    }).sort("created_at", 1)
+    if deadline is not None:
+        history = history.max_time_ms(deadline.mongo_ms())
+    conversation_logs = list(history)
+
+    # Format logs for OpenAI, which calls the bot's turns "assistant"
+    formatted_logs = []
+    for log in conversation_logs:
+        formatted_logs.append({
+            "role": "assistant" if log["role"] == "bot" else log["role"],
+            "content": log["content"]
+        })
+    
+    # Add system message if this is the start of conversation
+    if len(formatted_logs) <= 1:
+        formatted_logs.insert(0, {
+            "role": "system",
+            "content": load_prompt(CONVERSATION_SYSTEM_PROMPT)
+        })
+
+    return formatted_logs, conversation_logs
+
+def finish_conversation(patient, response_text, chain_of_thoughts, conversation_logs, served_by=None):
+    """
+    Store the bot's response and, if the conversation is over, finalize today's
+    symptoms; otherwise extract symptoms from this turn in the background.
+    Returns the response without the status header and end marker, and
+    whether it ended.
+    """
+    # Check if conversation should end
+    should_end = CONVERSATION_END_MARKER in response_text
+    
+    # Remove the model's symptom status header and the CONVERSATION_END
+    # marker before storing the reply and sending it to the client
+    cleaned_response = strip_status_header(response_text).replace(CONVERSATION_END_MARKER, "").strip()
+    
+    # Store bot response
+    bot_msg = ConversationHelper.create_bot_message(
+        patient_id=str(patient["_id"]),
+        content=cleaned_response,
+        chain_of_thoughts=chain_of_thoughts,
+        served_by=served_by
+    )
+    current_app.db.conversation_logs.insert_one(bot_msg)
+    publish_event(current_app.db, CONVERSATION_MESSAGE, ConversationHelper.format_for_frontend(bot_msg), patient=patient)
+    
+    today_date = datetime.utcnow().strftime("%Y-%m-%d")
+    if current_app.config.get("INTERVIEW_ENGINE_ENABLED", True) and conversation_logs:
+        try:
+            record_interview_turn(
+                current_app.db, patient, today_date, conversation_logs[-1].get("content", ""),
+                cleaned_response, local=served_by == INTERVIEW_SERVED_BY, ended=should_end
+            )
+        except Exception as e:
+            print(f"Error updating interview state: {str(e)}")
+    
+    if not should_end:
+        schedule_turn_extraction(patient, today_date)
+    
+    # If conversation is ending, analyze symptoms
+    if should_end:
+        # Store the symptom states for today's date
+        update = {
+            "last_conversation_date": datetime.utcnow(),
+            "conversation_ended": True
+        }
+        # Set with the $unset below, so a per-turn extraction still running
+        # doesn't write the provisional states back
+        message_id = last_user_message_id(conversation_logs)
+        if message_id is not None:
+            update[f"symptoms_finalized_through.{today_date}"] = message_id
+        
+        # Finish the per-turn analysis of today's conversation, or queue it
+        # if OpenAI is unavailable rather than recording no symptoms
+        try:
+            symptom_analysis = finalize_symptom_analysis(current_app.db, patient, today_date, conversation_logs)
+            update[f"symptom_states.{today_date}"] = symptom_analysis
+            update["reported_symptoms"] = reported_symptoms(symptom_analysis)
+        except Exception as e:
+            symptom_analysis = None
+            today_start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+            queue_symptom_analysis(
+                current_app.db, patient, f"symptom_states.{today_date}",
+                since=today_start, reason=str(e)
+            )
+        
+        # Update patient document with symptom states
+        current_app.db.patients.update_one(
+            {"_id": patient["_id"]},
+            {"$set": update, "$unset": {f"provisional_symptom_states.{today_date}": ""}}
+        )
+        refresh_patient_overview(current_app.db, patient["_id"])
+        if symptom_analysis is not None:
+            refresh_symptom_history(current_app.db, patient["_id"])
+            publish_event(current_app.db, SYMPTOM_STATES_UPDATED, {
+                "date": today_date,
+                "symptom_states": symptom_analysis
+            }, patient=patient)
+
+    return cleaned_response, should_end
+
+def withhold_marker_prefix(text):
+    """
+    Split streamed text into the part that is safe to send and a tail that
+    might be the start of the end marker, which must not reach the client.
+    """
+    text = text.replace(CONVERSATION_END_MARKER, "")
+    for length in range(min(len(CONVERSATION_END_MARKER) - 1, len(text)), 0, -1):
+        if CONVERSATION_END_MARKER.startswith(text[-length:]):
+            return text[:-length], text[-length:]
+    return text, ""
+
+def withhold_status_header(text):
+    """
+    Split the start of a streamed reply into the part that is safe to send
+    and the part held back because it may still be the status header.
+    Returns ``(safe, held)``; ``held`` is None once the header is settled.
+    """
+    if STATUS_HEADER_SEPARATOR in text:
+        return strip_status_header(text), None
+    start = text.lstrip()
+    if STATUS_HEADER_START.startswith(start) or start.startswith(STATUS_HEADER_START):
+        return "", text
+    return text, None
+
+def stream_conversation(patient, formatted_logs, conversation_logs, local_reply=None, deadline=None):
+    """
+    Stream the bot's response as newline-delimited JSON.
+
+    Each ``{"delta": ...}`` line carries new text; the final line has
+    ``"done": true`` with the full response and ``should_end``. The bot
+    message is persisted once the stream completes. A ``local_reply`` from
+    the interview engine is sent as a single delta. The model's stream is
+    cut off at ``deadline``.
+    """
+    parts = []
+    pending = ""
+    header = ""
+    served_by = None
+    try:
+        if local_reply is not None:
+            served_by = INTERVIEW_SERVED_BY
+            deltas = [local_reply]
+        else:
+            deltas = stream_conversation_response(formatted_logs, deadline=deadline)
+        for delta in deltas:
+            parts.append(delta)
+            if header is not None:
+                delta, header = withhold_status_header(header + delta)
+            safe, pending = withhold_marker_prefix(pending + delta)
+            if safe:
+                yield json.dumps({"delta": safe}) + "\n"
+        response_text = "".join(parts)
+        if header:
+            # The stream ended without a separator: it wasn't a header after all
+            pending += header.replace(CONVERSATION_END_MARKER, "")
+    except Exception as e:
+        print(f"Error streaming conversation response: {str(e)}")
+        response_text = "I'm sorry, I encountered an error processing your request."
+        pending = ""
+        yield json.dumps({"delta": response_text}) + "\n"
+
+    try:
+        # Flush any held-back text that turned out not to be the marker
+        if pending:
+            yield json.dumps({"delta": pending}) + "\n"
+        cleaned_response, should_end = finish_conversation(
+            patient, response_text, None, conversation_logs, served_by=served_by
+        )
+        yield json.dumps({"done": True, "response": cleaned_response, "should_end": should_end}) + "\n"
+    except Exception as e:
+        print(f"Error finishing streamed conversation: {str(e)}")
+        yield json.dumps({"done": True, "error": str(e)}) + "\n"
+
 @bp.route("/api/alexa/user/<alexa_user_id>/conversation", methods=["POST"])
 @api_key_required
 def create_conversation_log(alexa_user_id):
-    """Create a conversation log entry and generate response from OpenAI."""
+    """
+    Create a conversation log entry and generate response from OpenAI.
+    
+    With ``?stream=1`` the response is streamed as newline-delimited JSON
+    chunks instead of returned in one body.
+    """
     try:
         data = request.get_json()
         if not data or 'content' not in data:
@@ -21,87 +239,54 @@ def create_conversation_log(alexa_user_id):
 
         print(f"Received message: {data['content']}")  # Debug print
 
+        # Alexa drops the turn if we don't answer in time, so every database
+        # and LLM call below works within what's left of one budget
+        deadline = Deadline.from_request(request, current_app.config.get("ALEXA_DEADLINE_SECONDS", 7.0))
+
         # Find patient
-        patient = current_app.db.patients.find_one({"alexa_user_id": alexa_user_id})
+        patient = current_app.db.patients.find_one(
+            {"alexa_user_id": alexa_user_id},
+            max_time_ms=deadline.mongo_ms()
+        )
         if not patient:
             return jsonify({"error": "Patient not found"}), 404
 
-        # Create and store user message
-        user_msg = ConversationHelper.create_user_message(
-            patient_id=str(patient["_id"]),
-            content=data['content']
-        )
-        current_app.db.conversation_logs.insert_one(user_msg)
+        formatted_logs, conversation_logs = prepare_conversation(patient, data['content'], deadline=deadline)
 
-        # Get conversation history for this patient from today
-        today_start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
-        conversation_logs = list(
-            current_app.db.conversation_logs.find({
-                "patient_id": str(patient["_id"]),
-                "created_at": {"$gte": today_start}
-            }).sort("created_at", 1)
-        )
+        # Deterministic interview steps are answered without the LLM
+        local_reply = None
+        if current_app.config.get("INTERVIEW_ENGINE_ENABLED", True):
+            today_date = datetime.utcnow().strftime("%Y-%m-%d")
+            local_reply = interview_reply(current_app.db, patient, today_date, data['content'])
 
-        # Format logs for OpenAI
-        formatted_logs = []
-        for log in conversation_logs:
-            formatted_logs.append({
-                "role": log["role"],
-                "content": log["content"]
-            })
-        
-        # Add system message if this is the start of conversation
-        if len(formatted_logs) <= 1:
-            with open("app/prompts/system_prompt.txt", "r") as f:
-                system_prompt = f.read()
-                
-            formatted_logs.insert(0, {
-                "role": "system",
-                "content": system_prompt
-            })
+        if request.args.get('stream') in ('1', 'true'):
+            return Response(
+                stream_with_context(stream_conversation(patient, formatted_logs, conversation_logs, local_reply, deadline)),
+                mimetype='application/x-ndjson',
+                headers={'X-Accel-Buffering': 'no'}
+            )
 
-        # Get response from OpenAI
-        response_text, chain_of_thoughts = get_conversation_response(formatted_logs)
-        
-        # Check if conversation should end
-        should_end = "CONVERSATION_END" in response_text
-        
-        # Remove the CONVERSATION_END marker before sending to client
-        cleaned_response = response_text.replace("CONVERSATION_END", "").strip()
+        if local_reply is not None:
+            response_text, chain_of_thoughts, served_by = local_reply, None, INTERVIEW_SERVED_BY
+        else:
+            # Get response from OpenAI
+            response_text, chain_of_thoughts, served_by = get_conversation_response(formatted_logs, deadline=deadline)
         
-        # Store bot response
-        bot_msg = ConversationHelper.create_bot_message(
-            patient_id=str(patient["_id"]),
-            content=cleaned_response,
-            chain_of_thoughts=chain_of_thoughts
+        cleaned_response, should_end = finish_conversation(
+            patient, response_text, chain_of_thoughts, conversation_logs, served_by=served_by
         )
-        current_app.db.conversation_logs.insert_one(bot_msg)
-        
-        # If conversation is ending, analyze symptoms
-        if should_end:
-            # Analyze symptoms from today's conversation
-            symptom_analysis = analyze_symptoms(conversation_logs)
-            
-            # Store the symptom states for today's date
-            today_date = datetime.utcnow().strftime("%Y-%m-%d")
-            
-            # Update patient document with symptom states
-            current_app.db.patients.update_one(
-                {"_id": patient["_id"]},
-                {
-                    "$set": {
-                        f"symptom_states.{today_date}": symptom_analysis,
-                        "last_conversation_date": datetime.utcnow(),
-                        "conversation_ended": True
-                    }
-                }
-            )
         
         return jsonify({
             "response": cleaned_response,
-            "should_end": should_end
+            "should_end": should_end,
+            "served_by": served_by
         })
 
+    except InvalidDeadline as e:
+        return jsonify({"error": str(e)}), 400
+    except (DeadlineExceeded, ExecutionTimeout) as e:
+        # Out of time, whether before a call or in a query's maxTimeMS
+        return jsonify({"error": str(e)}), 504
     except Exception as e:
         print(f"Error in conversation: {str(e)}")
         return jsonify({"error": str(e)}), 500
@@ -189,8 +374,13 @@ def get_conversation_logs(alexa_user_id):
         # Format logs for frontend
         formatted_logs = [ConversationHelper.format_for_frontend(log) for log in logs]
         
-        # Get symptom states for this date
+        # Get symptom states for this date, or the provisional ones while
+        # the conversation is still going
         symptom_states = patient.get("symptom_states", {}).get(date, {})
+        provisional = False
+        if not symptom_states and patient.get("provisional_symptom_states", {}).get(date):
+            symptom_states = patient["provisional_symptom_states"][date]
+            provisional = True
         
         # Organize logs by symptom
         symptom_logs = {}
@@ -218,7 +408,8 @@ def get_conversation_logs(alexa_user_id):
         return jsonify({
             "date": date,
             "symptom_logs": symptom_logs,
-            "all_logs": formatted_logs
+            "all_logs": formatted_logs,
+            "provisional": provisional
         })
         
     except Exception as e:
@@ -241,23 +432,33 @@ def session_end(alexa_user_id):
             ).sort("created_at", 1)
         )
 
-        # Format logs for analysis
-        formatted_logs = [ConversationHelper.format_for_frontend(log) for log in conversation_logs]
-        
-        # Analyze symptoms
-        symptom_analysis = analyze_symptoms(formatted_logs)
+        update = {
+            "last_conversation_date": datetime.utcnow(),
+            "conversation_ended": True
+        }
+
+        # Analyze symptoms, queueing the analysis if OpenAI is unavailable
+        try:
+            symptom_analysis = analyze_symptoms(conversation_logs)
+            update["symptom_states"] = symptom_analysis
+            update["reported_symptoms"] = reported_symptoms(symptom_analysis)
+        except Exception as e:
+            symptom_analysis = None
+            queue_symptom_analysis(current_app.db, patient, "symptom_states", reason=str(e))
 
         # Update patient document
         current_app.db.patients.update_one(
             {"_id": patient["_id"]},
-            {
-                "$set": {
-                    "symptom_states": symptom_analysis,
-                    "last_conversation_date": datetime.utcnow(),
-                    "conversation_ended": True
-                }
-            }
+            {"$set": update}
         )
+        refresh_patient_overview(current_app.db, patient["_id"])
+        if symptom_analysis is None:
+            return jsonify({"message": "Session ended successfully", "analysis": "queued"})
+
+        refresh_symptom_history(current_app.db, patient["_id"])
+        publish_event(current_app.db, SYMPTOM_STATES_UPDATED, {
+            "symptom_states": symptom_analysis
+        }, patient=patient)
 
         return jsonify({"message": "Session ended successfully"})
 
@@ -277,8 +478,12 @@ def get_symptom_states(alexa_user_id):
         if not patient:
             return jsonify({"error": "Patient not found"}), 404
 
-        # Get symptom states for the requested date
-        symptom_states = patient.get("symptom_states", {}).get(date, {})
+        # Get symptom states for the requested date, falling back to the
+        # provisional states of a conversation still in progress
+        symptom_states = (
+            patient.get("symptom_states", {}).get(date)
+            or patient.get("provisional_symptom_states", {}).get(date, {})
+        )
         
         # If no symptom states exist for this date, return default structure
         if not symptom_states:
@@ -317,8 +522,35 @@ def test_openai():
 @bp.route("/api/alexa/updates", methods=["GET"])
 @api_key_required
 def get_alexa_updates():
-    """Check for recent updates to Alexa user IDs."""
+    """Check for recent updates to Alexa user IDs.
+    
+    Pass ``after_seq`` (the ``cursor`` from a previous response) to read from
+    the event log instead of by time, which can't miss or repeat updates.
+    """
     try:
+        after_seq = request.args.get('after_seq')
+        if after_seq is not None:
+            events, cursor = read_events(
+                current_app.db,
+                after=int(after_seq),
+                limit=1000,
+                types={ALEXA_ID_ASSIGNED}
+            )
+            updates = []
+            for event in events:
+                formatted = format_event(event)
+                updates.append({
+                    "patient_id": formatted.get("patient_id"),
+                    "patient_name": formatted["payload"].get("patient_name", "Unknown"),
+                    "alexa_user_id": formatted["payload"].get("alexa_user_id"),
+                    "updated_at": formatted["payload"].get("updated_at")
+                })
+            return jsonify({
+                "updates": updates,
+                "cursor": cursor,
+                "server_time": datetime.utcnow().isoformat()
+            })
+        
         # Get the timestamp from the request query parameter
         # Default to 1 minute ago if not provided
         from_time_str = request.args.get('from_time')
@@ -345,6 +577,7 @@ def get_alexa_updates():
         
         return jsonify({
             "updates": updates,
+            "cursor": latest_sequence(current_app.db),
             "server_time": datetime.utcnow().isoformat()
         })
     
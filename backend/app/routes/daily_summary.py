@@ -1,18 +1,14 @@
-from flask import Blueprint, request, jsonify, current_app
-import os
-from openai import OpenAI
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context
+import json
 from datetime import datetime
-from dotenv import load_dotenv
-
-load_dotenv()
+from ..utils.openai_utils import chat_completion, stream_chat_completion
 
 bp = Blueprint('daily_summary', __name__)
 
-# Initialize OpenAI client
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+SUMMARY_MODEL = "gpt-4o"
 
-def generate_summary(wearable_data, symptoms_data, date):
-    """Generate a health summary using OpenAI's GPT-4."""
+def build_summary_messages(wearable_data, symptoms_data, date):
+    """Build the chat messages asking for a daily health summary."""
     prompt = f"""
     Generate a concise health summary based on the following patient data for {date}:
     Wearable Data: {wearable_data}
@@ -20,19 +16,45 @@ def generate_summary(wearable_data, symptoms_data, date):
     Provide a brief summary focusing on health insights, avoiding unnecessary repetition.
     """
 
-    try:
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": "You are a helpful health assistant summarizing patient data."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=300
-        )
-        summary = response.choices[0].message.content
-        return summary.strip()
-    except Exception as e:
-        return str(e)
+    return [
+        {"role": "system", "content": "You are a helpful health assistant summarizing patient data."},
+        {"role": "user", "content": prompt}
+    ]
+
+def generate_summary(wearable_data, symptoms_data, date):
+    """Generate a health summary using OpenAI's GPT-4."""
+    response = chat_completion(
+        build_summary_messages(wearable_data, symptoms_data, date),
+        purpose="summary",
+        model=SUMMARY_MODEL,
+        max_tokens=300
+    )
+    summary = response.choices[0].message.content
+    return summary.strip()
+
+def cache_summary(patient_id, date, summary):
+    """Keep the latest generated summary so it can be served while OpenAI is down."""
+    current_app.db.daily_summaries.update_one(
+        {"_id": f"{patient_id}:{date}"},
+        {"$set": {"summary": summary, "generated_at": datetime.utcnow()}},
+        upsert=True
+    )
+
+def cached_summary(patient_id, date):
+    """The last summary generated for a patient and date, formatted for the response."""
+    cached = current_app.db.daily_summaries.find_one({"_id": f"{patient_id}:{date}"})
+    if not cached:
+        return None
+    return {
+        "date": date,
+        "summary": cached["summary"],
+        "cached": True,
+        "generated_at": cached["generated_at"].isoformat()
+    }
+
+def sse_message(event, data):
+    """Format a single Server-Sent Events message."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
 
 @bp.route('/api/daily-summary/<patient_id>', methods=['GET'])
 def get_daily_summary(patient_id):
@@ -53,10 +75,72 @@ def get_daily_summary(patient_id):
         symptoms_data = patient.get("conversationLog", {})
 
         # Generate the summary with the date included
-        summary = generate_summary(wearable_data, symptoms_data, date)
+        try:
+            summary = generate_summary(wearable_data, symptoms_data, date)
+        except Exception as e:
+            # Serve the last good summary rather than waiting on a degraded OpenAI
+            print(f"Error generating daily summary: {str(e)}")
+            cached = cached_summary(patient_id, date)
+            if cached:
+                return jsonify(cached)
+            return jsonify({"error": "Summary service is temporarily unavailable"}), 503
+
+        cache_summary(patient_id, date, summary)
         return jsonify({"date": date, "summary": summary})
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@bp.route('/api/daily-summary/<patient_id>/stream', methods=['GET'])
+def stream_daily_summary(patient_id):
+    """
+    Stream a daily health summary as Server-Sent Events.
+
+    Sends a ``token`` event per chunk of text as the model generates it,
+    then a ``done`` event with the full summary, or an ``error`` event.
+    """
+    date = request.args.get('date', datetime.now().strftime('%Y-%m-%d'))
+
+    try:
+        patient = current_app.db.patients.find_one(
+            {"id": patient_id},
+            {"wearableSensorData": 1, "conversationLog": 1}
+        )
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    if not patient:
+        return jsonify({"error": "Patient not found"}), 404
+
+    messages = build_summary_messages(
+        patient.get("wearableSensorData", {}),
+        patient.get("conversationLog", {}),
+        date
+    )
+
+    def generate():
+        parts = []
+        try:
+            for delta in stream_chat_completion(messages, purpose="summary", model=SUMMARY_MODEL, max_tokens=300):
+                parts.append(delta)
+                yield sse_message("token", {"text": delta})
+        except Exception as e:
+            print(f"Error streaming daily summary: {str(e)}")
+            cached = cached_summary(patient_id, date)
+            if cached and not parts:
+                yield sse_message("done", cached)
+            else:
+                yield sse_message("error", {"error": "Summary service is temporarily unavailable"})
+            return
+
+        summary = "".join(parts).strip()
+        cache_summary(patient_id, date, summary)
+        yield sse_message("done", {"date": date, "summary": summary})
 
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        }
+    )
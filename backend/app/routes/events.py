@@ -0,0 +1,130 @@
+from flask import Blueprint, jsonify, request, current_app, Response, stream_with_context
+import json
+import time
+import threading
+from ..utils.events import wait_for_events, latest_sequence, format_event
+
+bp = Blueprint('events', __name__)
+
+# Upper bound on how long a long-poll request may be held open
+MAX_WAIT_SECONDS = 30
+
+# SSE comment sent when idle so proxies don't close the connection
+SSE_KEEPALIVE_SECONDS = 15
+
+# Streams open in this process, capped at EVENT_STREAM_MAX_CONNECTIONS
+_open_streams = 0
+_open_streams_lock = threading.Lock()
+
+
+def parse_cursor():
+    """Read the resume cursor from Last-Event-ID, ?after=, or start at the newest event."""
+    # An EventSource reconnects to the same URL, so Last-Event-ID wins over ?after=
+    after = request.headers.get('Last-Event-ID') or request.args.get('after')
+    if after in (None, '', 'latest'):
+        return latest_sequence(current_app.db)
+    return int(after)
+
+
+def open_stream_slot():
+    """Count a new stream against the cap; False if the process is at it."""
+    global _open_streams
+    with _open_streams_lock:
+        if _open_streams >= current_app.config.get("EVENT_STREAM_MAX_CONNECTIONS", 2):
+            return False
+        _open_streams += 1
+        return True
+
+
+def close_stream_slot():
+    global _open_streams
+    with _open_streams_lock:
+        _open_streams -= 1
+
+
+def parse_types():
+    types = request.args.get('types')
+    return set(types.split(',')) if types else None
+
+
+@bp.route('/api/events', methods=['GET'])
+def poll_events():
+    """Long-poll for events after a sequence cursor."""
+    try:
+        after = parse_cursor()
+        timeout = min(float(request.args.get('timeout', 25)), MAX_WAIT_SECONDS)
+        limit = min(int(request.args.get('limit', 100)), 1000)
+
+        events, cursor = wait_for_events(
+            current_app.db,
+            after=after,
+            timeout=timeout,
+            limit=limit,
+            types=parse_types()
+        )
+
+        return jsonify({
+            "events": [format_event(event) for event in events],
+            "cursor": cursor
+        })
+
+    except ValueError as e:
+        return jsonify({"error": f"Invalid parameter: {str(e)}"}), 400
+    except Exception as e:
+        print(f"Error polling events: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+
+@bp.route('/api/events/stream', methods=['GET'])
+def stream_events():
+    """
+    Server-Sent Events stream of the event log, resumable with Last-Event-ID.
+
+    Each stream holds a worker thread, so streams are capped per process and
+    closed after EVENT_STREAM_MAX_SECONDS; the client reconnects and resumes
+    where the stream stopped.
+    """
+    try:
+        after = parse_cursor()
+    except ValueError as e:
+        return jsonify({"error": f"Invalid parameter: {str(e)}"}), 400
+
+    if not open_stream_slot():
+        response = jsonify({"error": "Too many event streams open, use /api/events instead"})
+        response.headers['Retry-After'] = str(SSE_KEEPALIVE_SECONDS)
+        return response, 503
+
+    types = parse_types()
+    db = current_app.db
+    closes_at = time.monotonic() + current_app.config.get("EVENT_STREAM_MAX_SECONDS", 300)
+
+    def generate():
+        cursor = after
+        last_sent = time.monotonic()
+        # Tell the client how long to wait before reconnecting
+        yield "retry: 1000\n\n"
+        while time.monotonic() < closes_at:
+            timeout = min(SSE_KEEPALIVE_SECONDS, max(closes_at - time.monotonic(), 0))
+            events, cursor = wait_for_events(db, after=cursor, timeout=timeout, types=types)
+            for event in events:
+                formatted = format_event(event)
+                yield f"id: {formatted['seq']}\nevent: {formatted['type']}\ndata: {json.dumps(formatted)}\n\n"
+                last_sent = time.monotonic()
+            if time.monotonic() - last_sent >= SSE_KEEPALIVE_SECONDS:
+                yield ": keepalive\n\n"
+                last_sent = time.monotonic()
+        # An event with only an id moves the client's Last-Event-ID to the
+        # cursor, so the reconnect doesn't miss or repeat anything
+        yield f"id: {cursor}\n\n"
+
+    response = Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+    # Runs even if the client goes away before the stream starts
+    response.call_on_close(close_stream_slot)
+    return response
@@ -1,4 +1,11 @@
-from flask import Blueprint, jsonify, current_app
+from flask import Blueprint, jsonify, current_app, request, Response
+from app.utils.circuit_breaker import breaker_states
+from app.utils import llm_stats
+from app.utils.symptom_tagger import tagger_stats
+from app.utils.interview import interview_stats
+from app.utils.metrics import render_metrics, set_llm_gauges
+from app.utils.query_monitor import get_query_monitor
+from app.utils.openai_utils import get_hedge_policy, get_llm_scheduler, get_llm_memo
 
 bp = Blueprint('misc', __name__)
 
@@ -20,4 +27,58 @@ def list_routes():
             "methods": list(rule.methods),
             "path": str(rule)
         })
-    return jsonify(routes) 
\ No newline at end of file
+    return jsonify(routes)
+
+@bp.route('/debug/queries', methods=['GET'])
+def query_report():
+    """MongoDB query shapes in this process ranked by total time, with slow, large and scan flags."""
+    monitor = get_query_monitor()
+    if monitor is None:
+        return jsonify({"error": "Query monitor is disabled"}), 503
+    limit = request.args.get('limit', 50, type=int)
+    flagged_only = request.args.get('flagged') in ('1', 'true')
+    return jsonify(monitor.report(limit=limit, flagged_only=flagged_only))
+
+@bp.route('/api/jobs', methods=['GET'])
+def list_jobs():
+    """Show background job state, last run durations and the current leader."""
+    runner = getattr(current_app, 'job_runner', None)
+    if runner is None:
+        return jsonify({"error": "Job runner is not running in this process"}), 503
+    try:
+        return jsonify(runner.status())
+    except Exception as e:
+        print(f"Error getting job status: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+@bp.route('/api/llm/status', methods=['GET'])
+def llm_status():
+    """Circuit breaker state and recent latency for each LLM model in this process."""
+    return jsonify({
+        "breakers": breaker_states(),
+        "models": llm_stats.summary(),
+        "hedging": get_hedge_policy().snapshot(),
+        "scheduler": get_llm_scheduler().snapshot(),
+        "symptom_tagger": tagger_stats(),
+        "memo": get_llm_memo().snapshot()
+    })
+
+@bp.route('/api/interview/stats', methods=['GET'])
+def get_interview_stats():
+    """Average LLM calls and locally served turns per completed check-in."""
+    try:
+        days = int(request.args.get('days', 7))
+        return jsonify(interview_stats(current_app.db, days))
+    except Exception as e:
+        print(f"Error getting interview stats: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+@bp.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus metrics: request, LLM, MongoDB and background job timings."""
+    try:
+        set_llm_gauges(breaker_states(), get_llm_scheduler().snapshot())
+    except Exception as e:
+        print(f"Error updating LLM gauges: {str(e)}")
+    body, content_type = render_metrics()
+    return Response(body, content_type=content_type)
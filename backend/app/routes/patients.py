@@ -3,32 +3,116 @@ from datetime import datetime
 import json
 from bson import ObjectId
 from app.middleware.auth import api_key_required
+from app.utils.alexa_ids import generate_alexa_id
+from app.utils.events import publish_event, PATIENT_CREATED, ALEXA_ID_ASSIGNED
+from app.utils.patient_list import list_patients, list_fields, split_values, parse_int, parse_date, InvalidListQuery
+from app.utils.patient_overview import cohort_overview, refresh_patient_overview
 
 bp = Blueprint('patients', __name__)
 
 @bp.route('/api/patients', methods=['GET'])
 def get_all_patients():
-    """Get all patients with basic information for the sidebar."""
+    """
+    Get a page of patients with basic information for the sidebar.
+    
+    Query parameters (all optional):
+      limit                     page size, 1-200 (default 50)
+      cursor                    next_cursor from the previous page
+      sort, order               name, age, risk or last_conversation; asc or desc
+      risk_level, gender        comma-separated values to match
+      min_age, max_age          inclusive age range
+      last_conversation_after   YYYY-MM-DD, inclusive
+      last_conversation_before  YYYY-MM-DD, inclusive
+      symptoms                  comma-separated; all must be reported in the latest check-in
+      q                         name search (prefix and typo tolerant, best matches only)
+    
+    Returns {"patients": [...], "next_cursor", "total", "total_is_estimate"}.
+    """
     try:
-        # Only fetch fields needed for the sidebar to improve performance
-        patients = list(current_app.db.patients.find({}, {
-            'id': 1, 
-            'name': 1, 
-            'age': 1, 
-            'gender': 1, 
-            'riskLevel': 1,
-            '_id': 0  # Exclude MongoDB's _id field
-        }))
-        
-        if not patients:
-            # Return empty array instead of 404 to allow for empty patient list
-            return jsonify([])
-        
-        return jsonify(patients)
+        page = list_patients(
+            current_app.db,
+            request.args,
+            count_limit=current_app.config.get("PATIENT_LIST_COUNT_LIMIT", 1000)
+        )
+        return jsonify(page)
+    except InvalidListQuery as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         print(f"Error fetching patients: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+@bp.route('/api/patients/overview', methods=['GET'])
+def get_patients_overview():
+    """
+    Get the whole cohort at a glance for triage: one compact row per patient
+    with risk, latest vitals, latest check-in symptoms and last conversation,
+    highest risk first.
+    
+    Rows come from the patient_overview collection, which the write paths
+    keep current, in a single indexed read.
+    """
+    try:
+        rows = cohort_overview(current_app.db)
+        return jsonify({"patients": rows, "count": len(rows)})
+    except Exception as e:
+        print(f"Error fetching patient overview: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+@bp.route('/api/patients/symptom-query', methods=['GET'])
+def query_symptoms():
+    """
+    Find patients by how often they reported symptoms over recent days,
+    e.g. palpitations on at least 3 of the last 7 days.
+    
+    Query parameters:
+      symptoms   comma-separated symptom categories (required)
+      window     number of days, ending on end_date (default 7)
+      end_date   YYYY-MM-DD, last day of the window (default today, UTC)
+      mode       any (at least one day), all (every day) or count (default)
+      min_days   days required in count mode (default 1)
+      match      a day counts if it reports any (default) or all of the symptoms
+    
+    Answered from this process's in-memory cohort index, which may be up to
+    SYMPTOM_INDEX_MAX_AGE_SECONDS behind the latest check-ins.
+    Returns {"patients": [{"_id", "days"}], "count", "window": {"start", "end"}}.
+    """
+    # NumPy takes about 100 ms to import, so the index stays out of startup
+    from app.utils.symptom_index import get_symptom_index, InvalidSymptomQuery
+    from app.utils.symptom_history import day_number, day_date
+    
+    try:
+        index = get_symptom_index(
+            current_app.db,
+            days=current_app.config.get("SYMPTOM_INDEX_DAYS", 365),
+            max_age=current_app.config.get("SYMPTOM_INDEX_MAX_AGE_SECONDS", 300)
+        )
+        window = parse_int(request.args, "window")
+        window = 7 if window is None else window
+        min_days = parse_int(request.args, "min_days")
+        end_date = parse_date(request.args, "end_date")
+        end_day = day_number(end_date) if end_date else index.last_day
+        patient_ids, days = index.query(
+            split_values(request.args.get("symptoms")),
+            window=window,
+            mode=request.args.get("mode", "count"),
+            min_days=1 if min_days is None else min_days,
+            match=request.args.get("match", "any"),
+            end_day=end_day
+        )
+        return jsonify({
+            "patients": [{"_id": patient_id, "days": count} for patient_id, count in zip(patient_ids, days)],
+            "count": len(patient_ids),
+            "window": {
+                "start": day_date(end_day - window + 1).isoformat(),
+                "end": day_date(end_day).isoformat()
+            }
+        })
+    except (InvalidListQuery, InvalidSymptomQuery) as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        print(f"Error querying symptoms: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
 @bp.route('/api/patients/<patient_id>', methods=['GET'])
 def get_patient(patient_id):
     """Get a single patient by ID with full details."""
@@ -37,10 +121,6 @@ def get_patient(patient_id):
         if not patient:
             return jsonify({"error": "Patient not found"}), 404
         
-        # Convert ObjectId to string for JSON serialization
-        if '_id' in patient:
-            patient['_id'] = str(patient['_id'])
-        
         return jsonify(patient)
     except Exception as e:
         print(f"Error fetching patient {patient_id}: {str(e)}")
@@ -174,13 +254,20 @@ def create_patient():
         alexa_user_id = data.get('alexa_user_id')
         date_of_birth = data.get('date_of_birth')
         
-        if not name or not alexa_user_id:
-            return jsonify({"error": "Name and Alexa User ID are required"}), 400
+        if not name:
+            return jsonify({"error": "Name is required"}), 400
         
         # Check if patient with this Alexa User ID already exists
-        existing = current_app.db.patients.find_one({"alexa_user_id": alexa_user_id})
-        if existing:
-            return jsonify({"error": f"Patient with Alexa User ID {alexa_user_id} already exists"}), 409
+        if alexa_user_id:
+            existing = current_app.db.patients.find_one({"alexa_user_id": alexa_user_id})
+            if existing:
+                return jsonify({"error": f"Patient with Alexa User ID {alexa_user_id} already exists"}), 409
+        
+        # Assign an Alexa ID inline if the caller didn't provide one, so the
+        # patient can use the skill immediately instead of waiting for a sync
+        auto_assigned = not alexa_user_id
+        if auto_assigned:
+            alexa_user_id = generate_alexa_id()
         
         # Create patient document
         patient = {
@@ -191,12 +278,32 @@ def create_patient():
             "conversation_ended": False,
             "symptom_states": {}
         }
+        patient.update(list_fields(patient))
         
         # Insert into database
         result = current_app.db.patients.insert_one(patient)
         patient_id = str(result.inserted_id)
+        refresh_patient_overview(current_app.db, result.inserted_id)
+        
+        if auto_assigned:
+            current_app.db.alexa_id_logs.insert_one({
+                "patient_id": patient_id,
+                "alexa_user_id": alexa_user_id,
+                "created_at": patient["alexa_id_added_at"]
+            })
         
-        return jsonify({"_id": patient_id, "message": "Patient created successfully"}), 201
+        publish_event(current_app.db, PATIENT_CREATED, {"name": name}, patient=patient)
+        publish_event(current_app.db, ALEXA_ID_ASSIGNED, {
+            "patient_name": name,
+            "alexa_user_id": alexa_user_id,
+            "updated_at": patient["alexa_id_added_at"].isoformat()
+        }, patient=patient)
+        
+        return jsonify({
+            "_id": patient_id,
+            "alexa_user_id": alexa_user_id,
+            "message": "Patient created successfully"
+        }), 201
     
     except Exception as e:
         print(f"Error creating patient: {str(e)}")
@@ -211,16 +318,6 @@ def get_patient_by_alexa_id(alexa_user_id):
         if not patient:
             return jsonify({"error": f"Patient with Alexa User ID {alexa_user_id} not found"}), 404
         
-        # Convert MongoDB document to JSON
-        patient["_id"] = str(patient["_id"])
-        
-        # Convert datetime objects
-        if "alexa_id_added_at" in patient:
-            patient["alexa_id_added_at"] = patient["alexa_id_added_at"].isoformat()
-        
-        if "last_conversation_date" in patient:
-            patient["last_conversation_date"] = patient["last_conversation_date"].isoformat()
-        
         return jsonify(patient), 200
     
     except Exception as e:
@@ -1,17 +1,24 @@
-import time
 import logging
-import threading
-import schedule
 from datetime import datetime
-import uuid
 import os
 from flask import current_app
 from pymongo import MongoClient
-from bson import ObjectId
+from pymongo.errors import OperationFailure
+from app.tasks.job_runner import JobRunner, job
+from app.utils.alexa_ids import MISSING_ALEXA_ID, assign_alexa_id
+from app.utils.analysis_queue import process_pending_analyses
+from app.utils.patient_list import backfill_list_fields
+from app.utils.patient_overview import rebuild_patient_overview
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Error codes Mongo returns when change streams need a replica set or sharded cluster
+CHANGE_STREAM_UNSUPPORTED_CODES = (40573, 40324)
+
+# Resume point for the patient change stream across leadership changes in this process
+_patients_resume_token = None
+
 def get_db_connection():
     """Get a MongoDB connection, either from current_app or create a new one"""
     try:
@@ -35,53 +42,19 @@ def sync_alexa_ids():
     try:
         db = get_db_connection()
         
-        # Find patients without Alexa IDs
-        patients = list(db.patients.find({"alexa_user_id": {"$exists": False}}))
-        
-        # Also find patients with empty Alexa IDs
-        patients_empty_id = list(db.patients.find({"alexa_user_id": ""}))
-        
-        # Combine both lists
-        patients.extend(patients_empty_id)
+        # Find patients without Alexa IDs (missing or empty)
+        patients = list(db.patients.find(MISSING_ALEXA_ID, {"_id": 1, "name": 1}))
         
         if not patients:
-            logger.info("No patients found without Alexa user IDs")
             return []
         
         logger.info(f"Found {len(patients)} patients without Alexa user IDs")
         new_alexa_ids = []
         
         for patient in patients:
-            # Generate a new Alexa ID
-            alexa_id = f"amzn1.ask.account.auto.{uuid.uuid4().hex[:8]}"
-            
-            # Update the patient record
-            result = db.patients.update_one(
-                {"_id": patient["_id"]},
-                {
-                    "$set": {
-                        "alexa_user_id": alexa_id,
-                        "alexa_id_added_at": datetime.utcnow()
-                    }
-                }
-            )
-            
-            if result.modified_count > 0:
-                patient_name = patient.get('name', f"Patient {str(patient['_id'])}")
-                logger.info(f"Added Alexa ID to patient {patient_name}: {alexa_id}")
-                
-                # Create a log of this assignment
-                db.alexa_id_logs.insert_one({
-                    "patient_id": str(patient["_id"]),
-                    "alexa_user_id": alexa_id,
-                    "created_at": datetime.utcnow()
-                })
-                
-                new_alexa_ids.append({
-                    "patient_id": str(patient["_id"]),
-                    "patient_name": patient_name,
-                    "alexa_id": alexa_id
-                })
+            assignment = assign_alexa_id(db, patient)
+            if assignment:
+                new_alexa_ids.append(assignment)
         
         return new_alexa_ids
     
@@ -89,35 +62,94 @@ def sync_alexa_ids():
         logger.error(f"Error during Alexa ID sync: {str(e)}")
         return []
 
+@job("update_database", interval=60, max_interval=900)
 def update_database():
-    """Main database update function that runs periodically"""
-    logger.info(f"Database update check started at {datetime.now()}")
+    """
+    Slow reconciliation pass for Alexa IDs.
     
-    try:
-        # Sync Alexa IDs
-        new_alexa_ids = sync_alexa_ids()
-        
-        if new_alexa_ids:
-            logger.info(f"Database updated with {len(new_alexa_ids)} new Alexa IDs")
-        else:
-            logger.info("No database updates required")
-    except Exception as e:
-        logger.error(f"Error in database update: {str(e)}")
+    New patients normally get their ID from the create path or the change
+    stream watcher; this only catches writes those missed, and backs off
+    while there is nothing to do.
+    """
+    new_alexa_ids = sync_alexa_ids()
+    
+    if new_alexa_ids:
+        logger.info(f"Reconciliation assigned {len(new_alexa_ids)} missing Alexa IDs")
+        return True
+    return False
 
-def run_scheduler():
-    """Run the scheduler continuously"""
-    # Initial run on startup
-    update_database()
+@job("watch_patient_inserts", interval=5, max_interval=3600)
+def watch_patient_inserts():
+    """
+    Assign Alexa IDs as soon as patients are inserted, using a change stream.
     
-    # Schedule regular updates (every 15 seconds in this case)
-    schedule.every(15).seconds.do(update_database)
+    Runs until this process loses leadership. Standalone Mongo deployments
+    don't support change streams, in which case the job backs off and the
+    reconciliation job does the work.
+    """
+    global _patients_resume_token
+    
+    runner = current_app.job_runner
+    db = get_db_connection()
+    pipeline = [{"$match": {"operationType": {"$in": ["insert", "replace"]}}}]
     
-    while True:
-        schedule.run_pending()
-        time.sleep(1)
+    try:
+        with db.patients.watch(
+            pipeline,
+            resume_after=_patients_resume_token,
+            max_await_time_ms=1000
+        ) as stream:
+            logger.info("Watching patient inserts for missing Alexa IDs")
+            while runner.should_continue() and stream.alive:
+                change = stream.try_next()
+                _patients_resume_token = stream.resume_token
+                if change is None:
+                    continue
+                
+                patient = change.get("fullDocument") or {}
+                if patient and not patient.get("alexa_user_id"):
+                    assign_alexa_id(db, patient)
+    except OperationFailure as e:
+        if e.code in CHANGE_STREAM_UNSUPPORTED_CODES:
+            logger.info("Change streams are not supported by this deployment; relying on reconciliation")
+            return False
+        # The resume token may have fallen off the oplog; start from now next time
+        _patients_resume_token = None
+        raise
+
+@job("process_pending_analyses", interval=30, max_interval=120)
+def run_pending_analyses():
+    """Retry symptom analyses that were queued while OpenAI was unavailable"""
+    completed = process_pending_analyses(get_db_connection())
+    if completed:
+        logger.info(f"Completed {completed} queued symptom analyses")
+        return True
+    return False
+
+@job("backfill_patient_list_fields", interval=10, max_interval=3600)
+def run_list_fields_backfill():
+    """Derive the name search and symptom fields for patients added or seeded without them"""
+    updated = backfill_list_fields(get_db_connection())
+    if updated:
+        logger.info(f"Updated list fields for {updated} patients")
+        return True
+    return False
+
+@job("rebuild_patient_overview", interval=3600)
+def run_overview_rebuild():
+    """Rebuild the cohort overview from the patients, repairing rows a write path missed"""
+    rows = rebuild_patient_overview(get_db_connection())
+    logger.info(f"Rebuilt the overview of {rows} patients")
 
-def start_background_tasks():
-    """Start background tasks in a separate thread"""
-    thread = threading.Thread(target=run_scheduler, daemon=True)
-    thread.start()
-    logger.info("Background database update scheduler started") 
\ No newline at end of file
+def start_background_tasks(app):
+    """Start the leader-elected job runner for this process"""
+    runner = JobRunner(
+        app,
+        lease_seconds=app.config.get("JOB_LEASE_SECONDS", 30),
+        heartbeat_seconds=app.config.get("JOB_HEARTBEAT_SECONDS", 10),
+        start_delay=app.config.get("JOB_START_DELAY_SECONDS", 0)
+    )
+    runner.start()
+    app.job_runner = runner
+    logger.info("Background job runner started")
+    return runner
@@ -0,0 +1,269 @@
+import os
+import time
+import uuid
+import socket
+import logging
+import threading
+from datetime import datetime, timedelta
+from pymongo.errors import DuplicateKeyError
+from app.utils.metrics import observe_job
+
+logger = logging.getLogger(__name__)
+
+# Name of the lease document that elects the process running all jobs
+LEADER_LEASE = "job-runner"
+
+# Registry of declared jobs, keyed by job name
+JOBS = {}
+
+
+class Job:
+    """A periodic job declared with the :func:`job` decorator."""
+
+    def __init__(self, name, func, interval, max_interval=None, run_on_start=True):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.max_interval = max_interval
+        self.current_interval = interval
+        self.run_on_start = run_on_start
+        self.next_run = None
+        self.running = False
+        self.last_started_at = None
+        self.last_finished_at = None
+        self.last_duration = None
+        self.last_status = None
+        self.last_error = None
+        self.runs = 0
+        self.failures = 0
+
+    def schedule_next(self, now, idle=False):
+        # Jobs with a max_interval back off exponentially while they report no work
+        if self.max_interval and idle:
+            self.current_interval = min(self.current_interval * 2, self.max_interval)
+        else:
+            self.current_interval = self.interval
+        self.next_run = now + self.current_interval
+
+
+def job(name, interval, max_interval=None, run_on_start=True):
+    """Register a function as a periodic background job.
+
+    The function is called with no arguments inside an application context,
+    only in the process that currently holds the leader lease. If
+    ``max_interval`` is set and the function returns False (nothing to do),
+    the interval doubles up to ``max_interval`` until it reports work again.
+    """
+    def decorator(func):
+        JOBS[name] = Job(name, func, interval, max_interval=max_interval, run_on_start=run_on_start)
+        return func
+    return decorator
+
+
+class JobRunner:
+    """Runs registered jobs in the single process holding the Mongo leader lease.
+
+    Every process starts a runner. A heartbeat thread keeps trying to acquire
+    (or renew) the lease in the ``job_leases`` collection; only the current
+    holder executes jobs, so multi-worker servers and the debug reloader
+    don't run the same job concurrently.
+    """
+
+    def __init__(self, app, lease_seconds=30, heartbeat_seconds=10, start_delay=0):
+        self.app = app
+        self.lease_seconds = lease_seconds
+        self.heartbeat_seconds = heartbeat_seconds
+        # Jobs that run on start wait this long after the runner starts
+        self.start_delay = start_delay
+        self.started_at = None
+        self.owner_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.is_leader = False
+        self._stop = threading.Event()
+        self._threads = []
+
+    @property
+    def db(self):
+        return self.app.db
+
+    def start(self):
+        """Start the heartbeat and scheduler threads."""
+        self.started_at = time.monotonic()
+        for target, name in ((self._heartbeat_loop, "job-heartbeat"), (self._run_loop, "job-runner")):
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"Job runner {self.owner_id} started with {len(JOBS)} registered jobs")
+
+    def stop(self, timeout=5):
+        """Stop the runner threads and give up the lease if we hold it."""
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self.release()
+
+    def try_acquire(self):
+        """Acquire or renew the leader lease. Returns True if we are the leader."""
+        now = datetime.utcnow()
+        try:
+            self.db.job_leases.find_one_and_update(
+                {
+                    "_id": LEADER_LEASE,
+                    "$or": [
+                        {"owner": self.owner_id},
+                        {"expires_at": {"$lte": now}}
+                    ]
+                },
+                {
+                    "$set": {
+                        "owner": self.owner_id,
+                        "heartbeat_at": now,
+                        "expires_at": now + timedelta(seconds=self.lease_seconds)
+                    }
+                },
+                upsert=True
+            )
+            leader = True
+        except DuplicateKeyError:
+            # Another live process holds the lease
+            leader = False
+        except Exception as e:
+            logger.error(f"Error renewing job lease: {str(e)}")
+            leader = False
+
+        if leader != self.is_leader:
+            logger.info(f"Job runner {self.owner_id} {'acquired' if leader else 'lost'} leadership")
+        self.is_leader = leader
+        return leader
+
+    def should_continue(self):
+        """Whether a long-running job should keep going in this process."""
+        return self.is_leader and not self._stop.is_set()
+
+    def release(self):
+        """Expire the lease immediately so another process can take over."""
+        if not self.is_leader:
+            return
+        try:
+            self.db.job_leases.update_one(
+                {"_id": LEADER_LEASE, "owner": self.owner_id},
+                {"$set": {"expires_at": datetime.utcnow()}}
+            )
+        except Exception as e:
+            logger.error(f"Error releasing job lease: {str(e)}")
+        self.is_leader = False
+
+    def _heartbeat_loop(self):
+        while not self._stop.is_set():
+            self.try_acquire()
+            self._stop.wait(self.heartbeat_seconds)
+
+    def _run_loop(self):
+        while not self._stop.is_set():
+            if self.is_leader:
+                now = time.monotonic()
+                for registered in list(JOBS.values()):
+                    if registered.next_run is None:
+                        if registered.run_on_start:
+                            registered.next_run = max(now, self.started_at + self.start_delay)
+                        else:
+                            registered.schedule_next(now)
+                    if registered.next_run <= now and not registered.running:
+                        # Each run gets its own thread so a long job can't delay the others
+                        registered.running = True
+                        threading.Thread(
+                            target=self.run_job,
+                            args=(registered,),
+                            name=f"job-{registered.name}",
+                            daemon=True
+                        ).start()
+            self._stop.wait(1)
+
+    def run_job(self, registered):
+        """Run a single job now and record its outcome."""
+        registered.running = True
+        registered.last_started_at = datetime.utcnow()
+        started = time.perf_counter()
+        error = None
+        idle = False
+        try:
+            with self.app.app_context():
+                idle = registered.func() is False
+            registered.last_status = "success"
+        except Exception as e:
+            error = str(e)
+            # Failures back off like idle runs so a broken job doesn't spin
+            idle = True
+            registered.failures += 1
+            registered.last_status = "error"
+            logger.error(f"Job {registered.name} failed: {error}")
+        finally:
+            registered.running = False
+            registered.runs += 1
+            registered.last_duration = round(time.perf_counter() - started, 4)
+            observe_job(registered.name, registered.last_duration, error)
+            registered.last_finished_at = datetime.utcnow()
+            registered.last_error = error
+            registered.schedule_next(time.monotonic(), idle=idle)
+            self._record_state(registered)
+
+    def _record_state(self, registered):
+        try:
+            self.db.job_state.update_one(
+                {"_id": registered.name},
+                {
+                    "$set": {
+                        "owner": self.owner_id,
+                        "interval_seconds": registered.current_interval,
+                        "last_started_at": registered.last_started_at,
+                        "last_finished_at": registered.last_finished_at,
+                        "last_duration_seconds": registered.last_duration,
+                        "last_status": registered.last_status,
+                        "last_error": registered.last_error
+                    },
+                    "$inc": {
+                        "runs": 1,
+                        "failures": 1 if registered.last_status == "error" else 0
+                    }
+                },
+                upsert=True
+            )
+        except Exception as e:
+            logger.error(f"Error recording state for job {registered.name}: {str(e)}")
+
+    def status(self):
+        """Fleet-wide job status: the current leader plus each job's last run."""
+        lease = self.db.job_leases.find_one({"_id": LEADER_LEASE}) or {}
+        expires_at = lease.get("expires_at")
+        leader_alive = bool(expires_at and expires_at > datetime.utcnow())
+
+        stored = {doc["_id"]: doc for doc in self.db.job_state.find({})}
+        jobs = []
+        for name, registered in JOBS.items():
+            doc = stored.get(name, {})
+            jobs.append({
+                "name": name,
+                "interval_seconds": registered.interval,
+                "current_interval_seconds": doc.get("interval_seconds", registered.interval),
+                "owner": doc.get("owner"),
+                "runs": doc.get("runs", 0),
+                "failures": doc.get("failures", 0),
+                "last_status": doc.get("last_status"),
+                "last_error": doc.get("last_error"),
+                "last_started_at": doc["last_started_at"].isoformat() if doc.get("last_started_at") else None,
+                "last_finished_at": doc["last_finished_at"].isoformat() if doc.get("last_finished_at") else None,
+                "last_duration_seconds": doc.get("last_duration_seconds"),
+                "running_here": registered.running
+            })
+
+        return {
+            "leader": {
+                "owner": lease.get("owner") if leader_alive else None,
+                "heartbeat_at": lease["heartbeat_at"].isoformat() if lease.get("heartbeat_at") else None,
+                "expires_at": expires_at.isoformat() if expires_at else None
+            },
+            "this_process": {
+                "owner": self.owner_id,
+                "is_leader": self.is_leader
+            },
+            "jobs": jobs
+        }
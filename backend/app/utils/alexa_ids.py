@@ -0,0 +1,66 @@
+import uuid
+import logging
+from datetime import datetime
+from app.utils.events import publish_event, ALEXA_ID_ASSIGNED
+
+logger = logging.getLogger(__name__)
+
+# Matches patient documents that still need an Alexa ID
+MISSING_ALEXA_ID = {
+    "$or": [
+        {"alexa_user_id": {"$exists": False}},
+        {"alexa_user_id": ""}
+    ]
+}
+
+
+def generate_alexa_id():
+    """Generate a new auto-assigned Alexa user ID."""
+    return f"amzn1.ask.account.auto.{uuid.uuid4().hex[:8]}"
+
+
+def assign_alexa_id(db, patient):
+    """
+    Assign an Alexa ID to a patient that doesn't have one yet.
+
+    The update is conditional on the ID still being missing, so the create
+    path, the change-stream watcher and the reconciliation job can all race
+    on the same patient safely. Returns the assignment, or None if another
+    writer got there first.
+    """
+    alexa_id = generate_alexa_id()
+    now = datetime.utcnow()
+
+    result = db.patients.update_one(
+        {"_id": patient["_id"], **MISSING_ALEXA_ID},
+        {
+            "$set": {
+                "alexa_user_id": alexa_id,
+                "alexa_id_added_at": now
+            }
+        }
+    )
+    if result.modified_count == 0:
+        return None
+
+    patient_name = patient.get('name', f"Patient {str(patient['_id'])}")
+    logger.info(f"Added Alexa ID to patient {patient_name}: {alexa_id}")
+
+    # Create a log of this assignment
+    db.alexa_id_logs.insert_one({
+        "patient_id": str(patient["_id"]),
+        "alexa_user_id": alexa_id,
+        "created_at": now
+    })
+
+    assignment = {
+        "patient_id": str(patient["_id"]),
+        "patient_name": patient_name,
+        "alexa_id": alexa_id
+    }
+    publish_event(db, ALEXA_ID_ASSIGNED, {
+        "patient_name": patient_name,
+        "alexa_user_id": alexa_id,
+        "updated_at": now.isoformat()
+    }, patient=patient)
+    return assignment
@@ -0,0 +1,90 @@
+import logging
+from datetime import datetime
+from bson import ObjectId
+from pymongo import ASCENDING, ReturnDocument
+from app.utils.openai_utils import analyze_symptoms
+from app.utils.circuit_breaker import CircuitOpenError
+from app.utils.events import publish_event, SYMPTOM_STATES_UPDATED
+from app.utils.patient_list import latest_symptom_states, reported_symptoms
+from app.utils.patient_overview import refresh_patient_overview
+from app.utils.symptom_history import refresh_symptom_history
+
+logger = logging.getLogger(__name__)
+
+# Analyses that keep failing for reasons other than an open circuit are left
+# in the queue for inspection after this many attempts
+MAX_ATTEMPTS = 5
+
+
+def queue_symptom_analysis(db, patient, target_field, since=None, reason=None):
+    """
+    Defer a symptom analysis that couldn't run now (e.g. OpenAI's circuit is open).
+
+    ``target_field`` is the patient field the result is written to and
+    ``since`` limits the analysis to messages created from that time on.
+    """
+    db.pending_analyses.update_one(
+        {"patient_id": str(patient["_id"]), "target_field": target_field},
+        {
+            "$set": {
+                "since": since,
+                "until": datetime.utcnow(),
+                "reason": reason
+            },
+            "$setOnInsert": {
+                "created_at": datetime.utcnow(),
+                "attempts": 0
+            }
+        },
+        upsert=True
+    )
+    logger.info(f"Queued symptom analysis for patient {patient['_id']} into {target_field}: {reason}")
+
+
+def process_pending_analyses(db, limit=20):
+    """
+    Run queued analyses, oldest first. Stops as soon as the circuit is
+    still open. Returns the number of analyses completed.
+    """
+    completed = 0
+    pending = db.pending_analyses.find(
+        {"attempts": {"$lt": MAX_ATTEMPTS}}
+    ).sort("created_at", ASCENDING).limit(limit)
+
+    for item in pending:
+        query = {"patient_id": item["patient_id"], "created_at": {"$lte": item["until"]}}
+        if item.get("since"):
+            query["created_at"]["$gte"] = item["since"]
+        conversation_logs = list(db.conversation_logs.find(query).sort("created_at", ASCENDING))
+
+        try:
+            symptom_analysis = analyze_symptoms(conversation_logs)
+        except CircuitOpenError:
+            break
+        except Exception as e:
+            logger.error(f"Queued symptom analysis for patient {item['patient_id']} failed: {str(e)}")
+            db.pending_analyses.update_one({"_id": item["_id"]}, {"$inc": {"attempts": 1}})
+            continue
+
+        patient = db.patients.find_one_and_update(
+            {"_id": ObjectId(item["patient_id"])},
+            {"$set": {item["target_field"]: symptom_analysis}},
+            projection={"_id": 1, "id": 1, "symptom_states": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        db.pending_analyses.delete_one({"_id": item["_id"]})
+        completed += 1
+
+        if patient:
+            # The queued check-in may not be the latest one
+            latest = latest_symptom_states(patient.pop("symptom_states", None))
+            db.patients.update_one({"_id": patient["_id"]}, {"$set": {"reported_symptoms": reported_symptoms(latest)}})
+            refresh_patient_overview(db, patient["_id"])
+            refresh_symptom_history(db, patient["_id"])
+
+            payload = {"symptom_states": symptom_analysis}
+            if item["target_field"].startswith("symptom_states."):
+                payload["date"] = item["target_field"].split(".", 1)[1]
+            publish_event(db, SYMPTOM_STATES_UPDATED, payload, patient=patient)
+
+    return completed
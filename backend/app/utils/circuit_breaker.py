@@ -0,0 +1,179 @@
+import time
+import logging
+import threading
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency whose circuit is open."""
+
+    def __init__(self, name, retry_in):
+        super().__init__(f"Circuit {name} is open; retry in {retry_in:.0f}s")
+        self.name = name
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """Failure-rate and latency circuit breaker for one model/endpoint.
+
+    Outcomes of the last ``window_size`` calls are kept. Once at least
+    ``min_calls`` are recorded, the circuit opens if the share of failures
+    or of calls slower than ``slow_call_seconds`` reaches its threshold.
+    After ``open_seconds`` it goes half-open and lets ``half_open_calls``
+    probes through: if they all succeed it closes, otherwise it reopens.
+
+    ``before_call`` returns a probe token for calls admitted as half-open
+    probes (None otherwise), to be passed back with the call's outcome, so a
+    call started earlier can't count as a probe when it finishes.
+    ``on_transition(name, state)`` is called with the initial state and on
+    every change, e.g. to export it as a metric.
+    """
+
+    def __init__(self, name, window_size=20, min_calls=5, failure_rate_threshold=0.5,
+                 slow_call_seconds=15.0, slow_call_rate_threshold=0.5,
+                 open_seconds=30.0, half_open_calls=1, on_transition=None):
+        self.name = name
+        self.window_size = window_size
+        self.min_calls = min_calls
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate_threshold = slow_call_rate_threshold
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+
+        self.state = CLOSED
+        self.opened_at = None
+        self.times_opened = 0
+        self._outcomes = deque(maxlen=window_size)
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        # Half-open periods so far; probe tokens are the period they belong to
+        self._half_open_round = 0
+        self._lock = threading.Lock()
+        self.on_transition = on_transition
+        self._notify()
+
+    def _notify(self):
+        if self.on_transition is None:
+            return
+        try:
+            self.on_transition(self.name, self.state)
+        except Exception as e:
+            logger.warning(f"Circuit {self.name}: state callback failed: {str(e)}")
+
+    def before_call(self):
+        """Reserve permission to call, or raise CircuitOpenError. Returns the probe token."""
+        with self._lock:
+            if self.state == OPEN:
+                waited = time.monotonic() - self.opened_at
+                if waited < self.open_seconds:
+                    raise CircuitOpenError(self.name, self.open_seconds - waited)
+                self._transition(HALF_OPEN)
+
+            if self.state == HALF_OPEN:
+                if self._probes_in_flight >= self.half_open_calls:
+                    raise CircuitOpenError(self.name, self.open_seconds)
+                self._probes_in_flight += 1
+                return self._half_open_round
+            return None
+
+    def _is_probe(self, probe):
+        return probe is not None and self.state == HALF_OPEN and probe == self._half_open_round
+
+    def release_probe(self, probe):
+        """Give back permission reserved by before_call for a call that was never made."""
+        with self._lock:
+            if self._is_probe(probe):
+                self._probes_in_flight -= 1
+
+    def record_success(self, duration, probe=None):
+        with self._lock:
+            slow = duration >= self.slow_call_seconds
+            if self._is_probe(probe):
+                self._probes_in_flight -= 1
+                if slow:
+                    self._transition(OPEN)
+                    return
+                self._probe_successes += 1
+                if self._probe_successes >= self.half_open_calls:
+                    self._transition(CLOSED)
+                return
+
+            # Other calls only count while closed: one started before the
+            # circuit opened says nothing about the probes
+            if self.state == CLOSED:
+                self._outcomes.append((False, slow))
+                self._evaluate()
+
+    def record_failure(self, probe=None):
+        with self._lock:
+            if self._is_probe(probe):
+                self._probes_in_flight -= 1
+                self._transition(OPEN)
+                return
+
+            if self.state == CLOSED:
+                self._outcomes.append((True, False))
+                self._evaluate()
+
+    def _evaluate(self):
+        if len(self._outcomes) < self.min_calls:
+            return
+        total = len(self._outcomes)
+        failure_rate = sum(1 for failed, _ in self._outcomes if failed) / total
+        slow_rate = sum(1 for _, slow in self._outcomes if slow) / total
+        if failure_rate >= self.failure_rate_threshold or slow_rate >= self.slow_call_rate_threshold:
+            self._transition(OPEN)
+
+    def _transition(self, state):
+        logger.warning(f"Circuit {self.name}: {self.state} -> {state}")
+        self.state = state
+        self._notify()
+        if state == OPEN:
+            self.opened_at = time.monotonic()
+            self.times_opened += 1
+        elif state == HALF_OPEN:
+            self._half_open_round += 1
+            self._probes_in_flight = 0
+            self._probe_successes = 0
+        elif state == CLOSED:
+            self._outcomes.clear()
+
+    def snapshot(self):
+        with self._lock:
+            total = len(self._outcomes)
+            return {
+                "name": self.name,
+                "state": self.state,
+                "times_opened": self.times_opened,
+                "window_calls": total,
+                "failure_rate": sum(1 for failed, _ in self._outcomes if failed) / total if total else 0.0,
+                "slow_call_rate": sum(1 for _, slow in self._outcomes if slow) / total if total else 0.0,
+                "retry_in_seconds": max(0.0, self.open_seconds - (time.monotonic() - self.opened_at))
+                if self.state == OPEN else 0.0
+            }
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name, **settings):
+    """Get or create the breaker for a dependency, e.g. ``"conversation:gpt-4-turbo"``."""
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name, **settings)
+        return _breakers[name]
+
+
+def breaker_states():
+    """Snapshots of every breaker created in this process."""
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return [breaker.snapshot() for breaker in breakers]
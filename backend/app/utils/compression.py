@@ -0,0 +1,75 @@
+import gzip
+import logging
+from flask import request
+from app.utils.tracing import span, SERIALIZE
+
+try:
+    import brotli
+except ImportError:  # optional: without it only gzip is offered
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+COMPRESSIBLE_TYPES = ("application/json", "text/")
+
+
+def available_encodings():
+    """Encodings this process can produce, in order of preference."""
+    return ["br", "gzip"] if brotli is not None else ["gzip"]
+
+
+def choose_encoding(accept_encodings):
+    """The best encoding the client accepts, or None for identity."""
+    encoding = accept_encodings.best_match(available_encodings())
+    if encoding and accept_encodings.quality(encoding) > 0:
+        return encoding
+    return None
+
+
+def compress(data, encoding, gzip_level=6, brotli_quality=4):
+    if encoding == "br":
+        return brotli.compress(data, quality=brotli_quality)
+    return gzip.compress(data, compresslevel=gzip_level, mtime=0)
+
+
+def init_compression(app):
+    """Compress JSON and text responses above ``COMPRESSION_MIN_BYTES``.
+
+    Picks brotli (if installed) or gzip from the request's Accept-Encoding.
+    Streamed responses such as the SSE endpoints are left alone so their
+    events aren't held back. Register after tracing so the time shows up
+    as a ``response.compress`` span.
+    """
+    if not app.config.get("COMPRESSION_ENABLED", True):
+        return
+
+    min_bytes = app.config.get("COMPRESSION_MIN_BYTES", 1024)
+    gzip_level = app.config.get("COMPRESSION_GZIP_LEVEL", 6)
+    brotli_quality = app.config.get("COMPRESSION_BROTLI_QUALITY", 4)
+
+    @app.after_request
+    def compress_response(response):
+        if (
+            response.direct_passthrough
+            or response.is_streamed
+            or response.status_code < 200
+            or response.status_code in (204, 304)
+            or "Content-Encoding" in response.headers
+            or not (response.mimetype or "").startswith(COMPRESSIBLE_TYPES)
+        ):
+            return response
+
+        response.vary.add("Accept-Encoding")
+        encoding = choose_encoding(request.accept_encodings)
+        if encoding is None or (response.content_length or 0) < min_bytes:
+            return response
+
+        with span("response.compress", SERIALIZE, encoding=encoding):
+            data = response.get_data()
+            compressed = compress(data, encoding, gzip_level, brotli_quality)
+        if len(compressed) >= len(data):
+            return response
+
+        response.set_data(compressed)
+        response.headers["Content-Encoding"] = encoding
+        return response
@@ -0,0 +1,57 @@
+import time
+
+
+class DeadlineExceeded(Exception):
+    """Raised when there is no time left in a request's budget."""
+
+
+class InvalidDeadline(ValueError):
+    """Raised when a request's deadline header leaves no budget at all."""
+
+
+class Deadline:
+    """A point in time by which a request must be answered.
+
+    Created once per request and passed down to Mongo queries (as
+    ``maxTimeMS``) and LLM calls (as the client timeout), so every step
+    works within what's left of the same budget.
+    """
+
+    def __init__(self, seconds):
+        self.budget = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    @classmethod
+    def from_request(cls, request, default_seconds, header="X-Request-Deadline-Ms"):
+        """
+        Use the caller's remaining budget from a header if sent, else the default.
+
+        A header that isn't a number is ignored; raises InvalidDeadline if it
+        is zero or negative, since the request would fail at its first step.
+        """
+        value = request.headers.get(header)
+        if value:
+            try:
+                milliseconds = int(value)
+            except ValueError:
+                return cls(default_seconds)
+            if milliseconds <= 0:
+                raise InvalidDeadline(f"{header} must be a positive number of milliseconds")
+            return cls(min(milliseconds / 1000, default_seconds))
+        return cls(default_seconds)
+
+    def remaining(self):
+        """Seconds left, never negative."""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        return self.remaining() <= 0
+
+    def elapsed(self):
+        return self.budget - (self.expires_at - time.monotonic())
+
+    def mongo_ms(self, minimum=1):
+        """Remaining budget as a Mongo ``maxTimeMS`` value."""
+        if self.expired():
+            raise DeadlineExceeded("Request deadline exceeded before database operation")
+        return max(minimum, int(self.remaining() * 1000))
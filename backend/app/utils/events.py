@@ -0,0 +1,245 @@
+import os
+import time
+import queue
+import logging
+import threading
+from datetime import datetime, timedelta
+from pymongo import ASCENDING, ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+# Event types written by the mutating paths
+PATIENT_CREATED = "patient_created"
+ALEXA_ID_ASSIGNED = "alexa_id_assigned"
+CONVERSATION_MESSAGE = "conversation_message"
+SYMPTOM_STATES_UPDATED = "symptom_states_updated"
+
+# How long events are kept before Mongo's TTL monitor removes them
+EVENT_RETENTION = timedelta(days=7)
+
+# A sequence number that has been allocated but not yet inserted is waited on
+# for this long before readers skip past it (e.g. the writer crashed)
+GAP_TIMEOUT = timedelta(seconds=2)
+
+# How often waiting readers re-check Mongo for events written by other processes
+POLL_INTERVAL = 0.25
+
+# Most events the publisher writes with one sequence allocation and insert
+PUBLISH_BATCH_SIZE = 100
+
+# Newest events latest_sequence looks at for one still being inserted
+LATEST_SCAN = 100
+
+# Woken on every publish in this process so local waiters see events immediately
+_new_event = threading.Condition()
+_published = 0
+
+
+def ensure_event_indexes(db):
+    """Create the TTL index that bounds the event log."""
+    db.events.create_index(
+        [("created_at", ASCENDING)],
+        expireAfterSeconds=int(EVENT_RETENTION.total_seconds())
+    )
+
+
+def next_sequence(db, name="events", count=1):
+    """Atomically allocate the next ``count`` numbers from a named counter; returns the last."""
+    counter = db.counters.find_one_and_update(
+        {"_id": name},
+        {"$inc": {"seq": count}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    return counter["seq"]
+
+
+def write_events(db, events):
+    """Number and insert a batch of events, in order, with one counter update and one insert."""
+    last = next_sequence(db, count=len(events))
+    # Stamped now rather than when queued: readers time gaps in the
+    # sequence from created_at
+    now = datetime.utcnow()
+    for seq, event in enumerate(events, start=last - len(events) + 1):
+        event["_id"] = seq
+        event["created_at"] = now
+    db.events.insert_many(events)
+
+    global _published
+    with _new_event:
+        _published += len(events)
+        _new_event.notify_all()
+
+
+class EventPublisher:
+    """Writes published events from a background thread, in batches.
+
+    Requests only queue their events, so publishing adds no MongoDB round
+    trips to them. Events from one process keep their order. The thread is
+    started by the first event each process publishes, after any fork.
+    """
+
+    def __init__(self):
+        self._queue = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _start(self):
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._lock:
+            if self._pid != pid:
+                self._queue = queue.Queue()
+                threading.Thread(target=self._run, args=(self._queue,), name="event-publisher", daemon=True).start()
+                self._pid = pid
+
+    def submit(self, db, event):
+        self._start()
+        self._queue.put((db, event))
+
+    def flush(self, timeout=5.0):
+        """Wait up to ``timeout`` seconds for queued events to be written; True if they were."""
+        if self._pid != os.getpid():
+            return True
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def _run(self, pending):
+        while True:
+            batch = [pending.get()]
+            while len(batch) < PUBLISH_BATCH_SIZE:
+                try:
+                    batch.append(pending.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                by_db = {}
+                for db, event in batch:
+                    by_db.setdefault(id(db), (db, []))[1].append(event)
+                for db, events in by_db.values():
+                    write_events(db, events)
+            except Exception as e:
+                logger.error(f"Error publishing {len(batch)} events: {str(e)}")
+            finally:
+                for _ in batch:
+                    pending.task_done()
+
+
+_publisher = EventPublisher()
+
+
+def publish_event(db, event_type, payload, patient=None):
+    """
+    Queue an event for the log; it is written and local listeners are woken
+    shortly after, off the request path.
+
+    Publishing never raises: the event log is a notification channel, and a
+    failure here must not fail the write that produced it.
+    """
+    try:
+        event = {
+            "type": event_type,
+            "payload": payload
+        }
+        if patient is not None:
+            event["patient_id"] = str(patient["_id"])
+            if patient.get("id"):
+                event["patient_ref"] = patient["id"]
+
+        _publisher.submit(db, event)
+    except Exception as e:
+        logger.error(f"Error publishing {event_type} event: {str(e)}")
+
+
+def flush_events(timeout=5.0):
+    """Wait for this process's queued events to be written, e.g. before it exits."""
+    return _publisher.flush(timeout)
+
+
+def read_events(db, after=0, limit=100, types=None):
+    """
+    Read events with a sequence number greater than ``after``.
+
+    Only a contiguous run of sequence numbers is returned, so a reader never
+    advances its cursor past an event that is still being inserted. A gap
+    older than GAP_TIMEOUT is assumed lost and skipped.
+    """
+    events = list(db.events.find({"_id": {"$gt": after}}).sort("_id", 1).limit(limit))
+
+    contiguous = []
+    expected = after + 1
+    for event in events:
+        # A reader starting from the beginning accepts whatever is retained first
+        starting = after == 0 and not contiguous
+        if event["_id"] != expected and not starting:
+            if datetime.utcnow() - event["created_at"] < GAP_TIMEOUT:
+                break
+        contiguous.append(event)
+        expected = event["_id"] + 1
+
+    cursor = contiguous[-1]["_id"] if contiguous else after
+    if types:
+        contiguous = [event for event in contiguous if event["type"] in types]
+    return contiguous, cursor
+
+
+def wait_for_events(db, after=0, timeout=25, limit=100, types=None):
+    """Block until events after ``after`` are available or ``timeout`` elapses."""
+    deadline = time.monotonic() + timeout
+    while True:
+        seen = _published
+        events, cursor = read_events(db, after=after, limit=limit, types=types)
+        if events:
+            return events, cursor
+
+        # Filtered-out events still move the cursor forward
+        after = cursor
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return [], cursor
+
+        with _new_event:
+            # Skip the wait if something was published while we were reading
+            if _published == seen:
+                _new_event.wait(min(POLL_INTERVAL, remaining))
+
+
+def latest_sequence(db):
+    """
+    A cursor at the newest event, or 0 if there are none.
+
+    The counter can run ahead of events still being inserted, so this is the
+    newest inserted event with no recent gap before it: a reader starting
+    here gets any event still in flight once it lands.
+    """
+    newest = list(db.events.find({}, {"created_at": 1}).sort("_id", -1).limit(LATEST_SCAN))
+    if not newest:
+        return 0
+    newest.reverse()
+    cursor = newest[0]["_id"]
+    for event in newest[1:]:
+        if event["_id"] != cursor + 1 and datetime.utcnow() - event["created_at"] < GAP_TIMEOUT:
+            break
+        cursor = event["_id"]
+    return cursor
+
+
+def format_event(event):
+    """Format an event document for API consumers."""
+    formatted = {
+        "seq": event["_id"],
+        "type": event["type"],
+        "payload": event.get("payload", {}),
+        "created_at": event["created_at"].isoformat()
+    }
+    if "patient_id" in event:
+        formatted["patient_id"] = event["patient_id"]
+    if "patient_ref" in event:
+        formatted["patient_ref"] = event["patient_ref"]
+    return formatted
@@ -0,0 +1,128 @@
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+logger = logging.getLogger(__name__)
+
+# Shared by all hedged calls in this process; each hedged call uses two workers
+_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="llm-hedge")
+
+
+class HedgePolicy:
+    """Decides when to send a backup request and caps how many are sent.
+
+    The budget is a token bucket: every hedgeable request adds
+    ``budget_ratio`` tokens (up to ``burst``), and each hedge spends one, so
+    over time hedges are at most ``budget_ratio`` of requests.
+    """
+
+    def __init__(self, percentile=95, budget_ratio=0.1, burst=5):
+        self.percentile = percentile
+        self.budget_ratio = budget_ratio
+        self.burst = burst
+        self._tokens = 0.0
+        self._lock = threading.Lock()
+        self.stats = {
+            "requests": 0,
+            "hedges": 0,
+            "hedge_wins": 0,
+            "primary_wins": 0,
+            "budget_denied": 0,
+            "scheduler_denied": 0,
+            "no_latency_data": 0
+        }
+
+    def record(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def start_request(self):
+        with self._lock:
+            self.stats["requests"] += 1
+            self._tokens = min(self.burst, self._tokens + self.budget_ratio)
+
+    def try_spend(self):
+        """Take one hedge from the budget, if any is left."""
+        with self._lock:
+            if self._tokens >= 1:
+                self._tokens -= 1
+                self.stats["hedges"] += 1
+                return True
+            self.stats["budget_denied"] += 1
+            return False
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats["budget_tokens"] = round(self._tokens, 3)
+        stats["percentile"] = self.percentile
+        stats["hedge_rate"] = stats["hedges"] / stats["requests"] if stats["requests"] else 0.0
+        stats["hedge_win_rate"] = stats["hedge_wins"] / stats["hedges"] if stats["hedges"] else 0.0
+        return stats
+
+
+def hedged_call(policy, make_client, call, delay, timeout=None, context=None, admit=None):
+    """
+    Run ``call(client)``; if it hasn't finished after ``delay`` seconds and
+    the budget allows, run an identical backup and return whichever result
+    arrives first.
+
+    ``make_client(timeout)`` gives the client for an attempt; ``timeout``
+    (seconds) bounds the whole call, so the backup gets only what is left
+    of it. ``admit()`` clears the backup with the caller's scheduler: it
+    returns None to refuse it, or a ``finish(called, result)`` callback run
+    once the backup is done. The loser is not aborted; it finishes (or
+    times out) in the background and its result is discarded. ``context``
+    is a factory for a context manager (e.g. the Flask app context) entered
+    around each attempt.
+    """
+    policy.start_request()
+    if delay is None:
+        policy.record("no_latency_data")
+        return call(make_client(timeout))
+
+    def attempt(client):
+        if context is None:
+            return call(client)
+        with context():
+            return call(client)
+
+    started = time.monotonic()
+    primary = _executor.submit(attempt, make_client(timeout))
+    done, _ = wait([primary], timeout=delay)
+    remaining = None if timeout is None else timeout - (time.monotonic() - started)
+    if done or (remaining is not None and remaining <= 0):
+        return primary.result()
+
+    finish = admit() if admit is not None else None
+    if admit is not None and finish is None:
+        policy.record("scheduler_denied")
+        return primary.result()
+    if not policy.try_spend():
+        if finish is not None:
+            finish(False, None)
+        return primary.result()
+
+    backup = _executor.submit(attempt, make_client(remaining))
+    if finish is not None:
+        backup.add_done_callback(
+            lambda future: finish(not future.cancelled(), None if future.cancelled() or future.exception() else future.result())
+        )
+    pending = {primary, backup}
+    error = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is not None:
+                error = future.exception()
+                continue
+
+            policy.record("hedge_wins" if future is backup else "primary_wins")
+            for loser in pending:
+                # Only stops an attempt that hasn't started yet
+                loser.cancel()
+            return future.result()
+
+    # Both attempts failed
+    raise error
@@ -0,0 +1,154 @@
+import logging
+import threading
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from pymongo import ASCENDING
+from app.models.conversation import ConversationHelper
+from app.utils.symptom_tagger import tag_conversation, record_tagging
+from app.utils.openai_utils import analyze_symptoms, analyze_symptoms_with_llm
+from app.utils.events import publish_event, SYMPTOM_STATES_UPDATED
+
+logger = logging.getLogger(__name__)
+
+# Per-turn extraction runs off the request thread
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="symptom-extract")
+
+# One extraction at a time per patient-day within this process, so a
+# finalize usually waits for (and reuses) the extraction of the previous turn
+# instead of repeating it. Keys share a fixed set of locks so the set doesn't
+# grow; correctness across workers comes from the conditional write in
+# process_turn, not from these locks.
+_locks = [threading.Lock() for _ in range(64)]
+
+
+def _lock_for(key):
+    return _locks[hash(key) % len(_locks)]
+
+
+def extraction_key(patient, date):
+    return f"{patient['_id']}:{date}"
+
+
+def day_conversation_logs(db, patient, date):
+    day_start = datetime.strptime(date, "%Y-%m-%d")
+    return list(db.conversation_logs.find({
+        "patient_id": str(patient["_id"]),
+        "created_at": {"$gte": day_start, "$lt": day_start + timedelta(days=1)}
+    }).sort("created_at", ASCENDING))
+
+
+def extract_symptoms(db, patient, date, conversation_logs):
+    """
+    Symptom states for the conversation so far.
+
+    The tagger settles what it can; for the rest, an earlier LLM verdict is
+    reused as long as the messages bearing on that symptom haven't changed,
+    so each turn only sends the LLM symptoms with new evidence. Verdicts are
+    kept in ``symptom_extractions``. Returns the states and the tagging.
+    """
+    key = extraction_key(patient, date)
+    tagging = tag_conversation(conversation_logs, current_app.config.get("SYMPTOM_TAGGER_MIN_CONFIDENCE", 0.8))
+    cached = (db.symptom_extractions.find_one({"_id": key}) or {}).get("llm", {})
+
+    symptom_states = ConversationHelper.get_initial_symptom_states()
+    symptom_states.update(tagging.resolved)
+    stale = []
+    for symptom in tagging.uncertain:
+        entry = cached.get(symptom)
+        if entry and entry["evidence"] == tagging.related[symptom]:
+            symptom_states[symptom] = entry["state"]
+        else:
+            stale.append(symptom)
+
+    if stale:
+        needed = set().union(*(tagging.related[symptom] for symptom in stale))
+        messages = [log for log in conversation_logs if str(log["_id"]) in needed]
+        results = analyze_symptoms_with_llm(messages, stale)
+        symptom_states.update(results)
+
+        update = {
+            f"llm.{symptom}": {"evidence": tagging.related[symptom], "state": results[symptom]}
+            for symptom in stale
+        }
+        update.update({"patient_id": str(patient["_id"]), "date": date, "updated_at": datetime.utcnow()})
+        db.symptom_extractions.update_one({"_id": key}, {"$set": update}, upsert=True)
+
+    return symptom_states, tagging
+
+
+def last_user_message_id(conversation_logs):
+    """ID of the patient's latest message, the evidence a finalize covers."""
+    for log in reversed(conversation_logs):
+        if log.get("role") == "user":
+            return log["_id"]
+    return None
+
+
+def not_finalized(patient, date, message_id):
+    """Filter matching the patient only while no finalize of ``date`` covers ``message_id``."""
+    return {
+        "_id": patient["_id"],
+        f"symptoms_finalized_through.{date}": {"$not": {"$gte": message_id}}
+    }
+
+
+def process_turn(app, patient, date):
+    """Update the provisional symptom states after a conversation turn.
+
+    The provisional states are written only if the patient document shows no
+    finalize covering this turn yet. The end of the conversation sets
+    ``symptoms_finalized_through`` in the same update that drops the
+    provisional states, so a turn finishing late can't bring them back.
+    """
+    with app.app_context():
+        db = app.db
+        try:
+            with _lock_for(extraction_key(patient, date)):
+                conversation_logs = day_conversation_logs(db, patient, date)
+                message_id = last_user_message_id(conversation_logs)
+                if message_id is None or not db.patients.count_documents(not_finalized(patient, date, message_id), limit=1):
+                    # The conversation was finalized while this turn was queued
+                    return
+                symptom_states, _ = extract_symptoms(db, patient, date, conversation_logs)
+
+                result = db.patients.update_one(
+                    not_finalized(patient, date, message_id),
+                    {"$set": {f"provisional_symptom_states.{date}": symptom_states}}
+                )
+                if result.matched_count:
+                    publish_event(db, SYMPTOM_STATES_UPDATED, {
+                        "date": date,
+                        "symptom_states": symptom_states,
+                        "provisional": True
+                    }, patient=patient)
+        except Exception as e:
+            # The finalize step at the end of the conversation catches up
+            logger.warning(f"Per-turn symptom extraction for patient {patient['_id']} failed: {str(e)}")
+
+
+def schedule_turn_extraction(patient, date):
+    """Start extracting symptoms from the latest turn in the background."""
+    if not current_app.config.get("SYMPTOM_TAGGER_ENABLED", True):
+        return
+    if not current_app.config.get("SYMPTOM_EXTRACTION_PER_TURN", True):
+        return
+    app = current_app._get_current_object()
+    _executor.submit(process_turn, app, {"_id": patient["_id"], "id": patient.get("id")}, date)
+
+
+def finalize_symptom_analysis(db, patient, date, conversation_logs):
+    """
+    The day's final symptom states at the end of a conversation.
+
+    After per-turn extraction this is usually just a re-tag plus cached LLM
+    verdicts; at most the symptoms touched by the last answer go to the LLM.
+    Raises if the LLM is needed and unavailable. The caller marks the day
+    finalized with ``symptoms_finalized_through``.
+    """
+    if not current_app.config.get("SYMPTOM_TAGGER_ENABLED", True):
+        return analyze_symptoms(conversation_logs)
+    with _lock_for(extraction_key(patient, date)):
+        symptom_states, tagging = extract_symptoms(db, patient, date, conversation_logs)
+    record_tagging(tagging)
+    return symptom_states
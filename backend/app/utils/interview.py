@@ -0,0 +1,198 @@
+import re
+from datetime import datetime, timedelta
+from pymongo.errors import DuplicateKeyError
+from app.models.conversation import ConversationHelper
+from app.utils.symptom_tagger import tag_message, classify_answer, asked_symptoms, normalize, strip_status_header
+
+# Status of each symptom within a check-in
+PENDING = "pending"
+DENIED = "denied"
+DISCUSSED = "discussed"
+
+# Screening question asked locally for each symptom, from the system prompt
+SYMPTOM_QUESTIONS = {
+    "Shortness of Breath": "Have you experienced any difficulty breathing?",
+    "Palpitation": "Have you noticed your heart racing or beating irregularly?",
+    "Chest Discomfort": "Have you felt any discomfort or pressure in your chest?",
+    "Swelling": "Have you noticed any swelling in your legs or ankles?",
+    "Fatigue": "Are you feeling more tired than usual?",
+    "Syncope": "Have you felt lightheaded or dizzy recently?"
+}
+
+ACKNOWLEDGEMENTS = ["Okay, thank you.", "Good to hear.", "Thanks for letting me know.", "Alright."]
+
+OPENING = "Thanks for checking in. I'll ask you a few quick questions about how you've been feeling."
+
+CLOSING = (
+    "Thank you for sharing how you've been feeling today. That's all my questions for now. "
+    "Take care! CONVERSATION_END"
+)
+
+# Opening messages that need no empathy or follow-up before the questions
+# start: an explicit allowlist of plain greetings and clearly positive
+# answers, matched against the whole message without punctuation. Anything
+# else, however short, goes to the LLM.
+GREETING = r"(hi|hello|hey|good morning|good afternoon|good evening|morning)( there| alexa)?"
+FEELING = r"(i'?m|i am|i'?m doing|i am doing|doing|i'?m feeling|i am feeling|feeling|i feel)"
+DEGREE = r"(pretty|really|very|quite)"
+# A bare "well" usually starts a longer answer, so it needs a verb or degree before it
+POSITIVE = (
+    rf"(({FEELING} )?({DEGREE} )?(good|fine|great|okay|ok|alright|all right|not bad)"
+    rf"|{FEELING} ({DEGREE} )?well|{DEGREE} well)( today)?"
+)
+SIMPLE_OPENING = re.compile(
+    rf"^(?P<greeting>{GREETING})?( ?(?P<positive>{POSITIVE}))?( ?(thanks|thank you))?( ?(and )?how are you( today)?)?$"
+)
+PUNCTUATION = re.compile(r"[^\w\s']")
+
+
+def is_simple_opening(content):
+    """True for a plain greeting and/or a clearly positive "how are you" answer."""
+    text = " ".join(PUNCTUATION.sub(" ", normalize(content)).split())
+    match = SIMPLE_OPENING.match(text)
+    return bool(match and (match.group("greeting") or match.group("positive")))
+
+
+def session_key(patient, date):
+    return f"{patient['_id']}:{date}"
+
+
+def get_session(db, patient, date):
+    """Today's interview state for a patient, created on the first turn."""
+    key = session_key(patient, date)
+    session = db.interview_sessions.find_one({"_id": key})
+    if session:
+        return session
+
+    session = {
+        "_id": key,
+        "patient_id": str(patient["_id"]),
+        "date": date,
+        "status": "active",
+        "symptoms": {symptom: PENDING for symptom in ConversationHelper.SYMPTOM_CATEGORIES},
+        "asking": [],
+        "llm_calls": 0,
+        "local_turns": 0,
+        "started_at": datetime.utcnow()
+    }
+    try:
+        db.interview_sessions.insert_one(session)
+    except DuplicateKeyError:
+        session = db.interview_sessions.find_one({"_id": key})
+    return session
+
+
+def next_question(session):
+    for symptom in ConversationHelper.SYMPTOM_CATEGORIES:
+        if session["symptoms"].get(symptom) == PENDING:
+            return SYMPTOM_QUESTIONS[symptom]
+    return None
+
+
+def is_clear_denial(content, asking):
+    """True if the patient plainly said no to every symptom just asked, and nothing else."""
+    if "?" in content:
+        return False
+    tags = tag_message(content)
+    # Anything reported, or about a symptom not asked, needs the LLM
+    if any(experienced or symptom not in asking for symptom, (experienced, _) in tags.items()):
+        return False
+    if any(confidence < 0.8 for _, confidence in tags.values()):
+        return False
+    answer = classify_answer(content)
+    if answer is False:
+        return True
+    return answer is None and bool(tags) and set(asking) <= set(tags)
+
+
+def local_reply(db, patient, date, content):
+    """
+    The next interview turn if it can be served without the LLM, else None.
+
+    Handled locally: a plain greeting at the start of a check-in, and a
+    clear "no" to the screening question just asked, which moves on to the
+    next symptom's question (or closes the check-in once all are covered).
+    Anything reported, hedged, asked or off-script goes to the LLM.
+    """
+    session = get_session(db, patient, date)
+    if session["status"] != "active":
+        return None
+
+    started = session["llm_calls"] or session["local_turns"]
+    if not started:
+        if is_simple_opening(content):
+            return f"{OPENING} {next_question(session)}"
+        return None
+
+    asking = session.get("asking") or []
+    if not asking or not is_clear_denial(content, asking):
+        return None
+
+    for symptom in asking:
+        session["symptoms"][symptom] = DENIED
+    question = next_question(session)
+    if question is None:
+        return CLOSING
+    acknowledgement = ACKNOWLEDGEMENTS[session["local_turns"] % len(ACKNOWLEDGEMENTS)]
+    return f"{acknowledgement} {question}"
+
+
+def record_turn(db, patient, date, user_content, response_text, local, ended):
+    """
+    Update the interview state with the turn just answered.
+
+    The pending symptoms the reply asks about (ignoring the model's status
+    header, which names every symptom) become the ones awaiting an answer.
+    A symptom asked before is settled: denied if the patient plainly said
+    no, otherwise discussed (the LLM took the turn to follow it up).
+    """
+    session = get_session(db, patient, date)
+    symptoms = session["symptoms"]
+    asking = session.get("asking") or []
+
+    denied = is_clear_denial(user_content, asking) if asking else False
+    for symptom in asking:
+        symptoms[symptom] = DENIED if denied else DISCUSSED
+    # The patient may also have brought up symptoms on their own
+    for symptom, (experienced, _) in tag_message(user_content).items():
+        if symptoms.get(symptom) == PENDING and experienced:
+            symptoms[symptom] = DISCUSSED
+
+    asked = asked_symptoms(strip_status_header(response_text))
+    now_asking = [
+        symptom for symptom in ConversationHelper.SYMPTOM_CATEGORIES
+        if symptom in asked and symptoms.get(symptom) == PENDING
+    ]
+    update = {
+        "$set": {"symptoms": symptoms, "asking": now_asking},
+        "$inc": {"local_turns" if local else "llm_calls": 1}
+    }
+    if ended:
+        update["$set"].update({"status": "completed", "completed_at": datetime.utcnow()})
+    db.interview_sessions.update_one({"_id": session["_id"]}, update)
+
+
+def interview_stats(db, days=7):
+    """LLM calls and locally served turns per completed check-in over the last ``days``."""
+    since = (datetime.utcnow() - timedelta(days=days)).strftime("%Y-%m-%d")
+    totals = list(db.interview_sessions.aggregate([
+        {"$match": {"status": "completed", "date": {"$gte": since}}},
+        {"$group": {
+            "_id": None,
+            "completed": {"$sum": 1},
+            "llm_calls": {"$sum": "$llm_calls"},
+            "local_turns": {"$sum": "$local_turns"}
+        }}
+    ]))
+    if not totals:
+        return {"days": days, "completed": 0, "avg_llm_calls": 0.0, "avg_local_turns": 0.0, "local_turn_fraction": 0.0}
+
+    totals = totals[0]
+    turns = totals["llm_calls"] + totals["local_turns"]
+    return {
+        "days": days,
+        "completed": totals["completed"],
+        "avg_llm_calls": totals["llm_calls"] / totals["completed"],
+        "avg_local_turns": totals["local_turns"] / totals["completed"],
+        "local_turn_fraction": totals["local_turns"] / turns if turns else 0.0
+    }
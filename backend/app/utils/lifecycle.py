@@ -0,0 +1,170 @@
+import os
+import time
+import logging
+import threading
+import pymongo
+from pymongo import MongoClient
+
+logger = logging.getLogger(__name__)
+
+_init_lock = threading.Lock()
+
+
+def connect_mongo(app):
+    """Create this process's MongoDB client and set ``app.db``.
+
+    Doesn't touch the network: pymongo connects in the background, and
+    :func:`check_mongo` (run by the warm-up) confirms the server answers.
+    """
+    from app.utils.query_monitor import get_query_monitor
+
+    try:
+        client = MongoClient(
+            app.config["MONGO_URI"],
+            serverSelectionTimeoutMS=app.config.get("MONGO_SERVER_SELECTION_TIMEOUT_MS", 30000)
+        )
+        app.db = client.get_default_database(default="patient_data")
+        query_monitor = get_query_monitor()
+        if query_monitor is not None:
+            query_monitor.attach(client)
+        return True
+    except Exception as e:
+        print(f"❌ MongoDB configuration error: {e}")
+        return False
+
+
+def check_mongo(app):
+    """Ping MongoDB and create the indexes the app relies on, once it answers."""
+    from app.utils.events import ensure_event_indexes
+    from app.utils.patient_list import ensure_patient_list_indexes
+    from app.utils.patient_overview import ensure_patient_overview_indexes
+
+    try:
+        app.db.client.admin.command('ping')
+        if not app.extensions.get("mongodb_connected"):
+            ensure_event_indexes(app.db)
+            ensure_patient_list_indexes(app.db)
+            ensure_patient_overview_indexes(app.db)
+            print(f"✅ Connected to MongoDB successfully (pid {os.getpid()})")
+        app.extensions["mongodb_connected"] = True
+        return True
+    except Exception as e:
+        print(f"❌ MongoDB connection error: {e}")
+        return False
+
+
+def start_jobs(app):
+    if app.config.get("BACKGROUND_JOBS_ENABLED", True) and getattr(app, "job_runner", None) is None:
+        from app.tasks.background_tasks import start_background_tasks
+        start_background_tasks(app)
+        print("✅ Started background database update tasks")
+
+
+def warm_up(app):
+    """Bring up what the first requests need without blocking startup.
+
+    Confirms MongoDB, starts the job runner, then imports the OpenAI SDK,
+    builds the client and loads the prompts. Each step logs its own failure
+    and is retried on first use.
+    """
+    started = time.perf_counter()
+    with app.app_context():
+        if getattr(app, "db", None) is not None:
+            check_mongo(app)
+        if is_draining(app):
+            return
+        start_jobs(app)
+
+        from app.utils.openai_utils import get_openai_client, load_prompt, PROMPT_FILES
+        try:
+            for filename in PROMPT_FILES:
+                load_prompt(filename)
+            if app.config.get("OPENAI_API_KEY"):
+                get_openai_client()
+        except Exception as e:
+            logger.warning(f"LLM warm-up failed: {str(e)}")
+    app.extensions["warmed_up"] = True
+    logger.info(f"Process {os.getpid()} warmed up in {time.perf_counter() - started:.2f}s")
+
+
+def init_process(app):
+    """Per-process setup that must not be inherited across a fork.
+
+    Creates the MongoDB client, drops any LLM clients and schedulers created
+    by a parent process and, with ``STARTUP_WARMUP``, runs :func:`warm_up`
+    in a background thread; otherwise the job runner starts right away and
+    everything else comes up on first use. Runs once per pid: the WSGI
+    server calls it after forking a worker, and the first request in a
+    process that skipped that hook runs it lazily.
+    """
+    pid = os.getpid()
+    if app.extensions.get("process_pid") == pid:
+        return
+    with _init_lock:
+        if app.extensions.get("process_pid") == pid:
+            return
+        # Forked children inherit the parent's attributes but not its sockets or threads
+        app.__dict__.pop("db", None)
+        app.__dict__.pop("job_runner", None)
+        app.extensions["draining"] = False
+        app.extensions["mongodb_connected"] = False
+        app.extensions["warmed_up"] = False
+
+        from app.utils.openai_utils import reset_llm_clients
+        reset_llm_clients()
+
+        connect_mongo(app)
+
+        if app.config.get("STARTUP_WARMUP", True):
+            threading.Thread(target=warm_up, args=(app,), name="warm-up", daemon=True).start()
+        else:
+            start_jobs(app)
+
+        app.extensions["process_pid"] = pid
+
+
+def init_lifecycle(app):
+    """Initialize the process on its first request if the server didn't already."""
+
+    @app.before_request
+    def ensure_process_initialized():
+        init_process(app)
+
+
+def begin_drain(app):
+    """Stop taking new work in this process: fail readiness and hand off the job lease."""
+    if app.extensions.get("draining"):
+        return
+    app.extensions["draining"] = True
+    logger.info(f"Process {os.getpid()} draining")
+    runner = getattr(app, "job_runner", None)
+    if runner is not None:
+        runner.stop(timeout=app.config.get("JOB_STOP_TIMEOUT_SECONDS", 5))
+
+
+def is_draining(app):
+    return bool(app.extensions.get("draining"))
+
+
+def readiness(app):
+    """Whether this process should receive traffic, and why not.
+
+    Returns a ``(ready, checks)`` pair. Unlike ``/api/health`` this pings
+    MongoDB (bounded by ``READINESS_TIMEOUT_SECONDS``), and reports not
+    ready while draining or before the warm-up has finished.
+    """
+    checks = {
+        "initialized": app.extensions.get("process_pid") == os.getpid(),
+        "warmed_up": bool(app.extensions.get("warmed_up")) or not app.config.get("STARTUP_WARMUP", True),
+        "draining": is_draining(app),
+        "mongodb": "not connected"
+    }
+    if checks["draining"]:
+        return False, checks
+
+    if getattr(app, "db", None) is not None:
+        with pymongo.timeout(app.config.get("READINESS_TIMEOUT_SECONDS", 2)):
+            checks["mongodb"] = "connected" if check_mongo(app) else "unreachable"
+
+    ready = checks["initialized"] and checks["warmed_up"] and checks["mongodb"] == "connected"
+    return ready, checks
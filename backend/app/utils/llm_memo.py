@@ -0,0 +1,217 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from datetime import datetime, timedelta
+from pymongo import ASCENDING
+
+logger = logging.getLogger(__name__)
+
+# Memo modes
+OFF = "off"
+ON = "on"          # reuse results of deterministic (temperature 0) calls
+RECORD = "record"  # call OpenAI for every call, bypassing the memo, and write each result as a fixture
+REPLAY = "replay"  # answer every call from fixtures, never touching the network
+MODES = (OFF, ON, RECORD, REPLAY)
+
+# Parameters that change how a call is made but not what it returns
+TRANSPORT_PARAMS = {"stream", "stream_options", "timeout"}
+
+
+class LLMReplayMiss(Exception):
+    """Raised in replay mode when no fixture was recorded for a call."""
+
+
+def memo_key(model, messages, params):
+    """Content address of a call: a hash of the model, messages (including the prompt) and parameters."""
+    payload = {
+        "model": model,
+        "messages": messages,
+        "params": {name: value for name, value in params.items() if name not in TRANSPORT_PARAMS}
+    }
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def is_deterministic(params):
+    return params.get("temperature") == 0 and not params.get("stream")
+
+
+class MongoMemoStore:
+    """Memo entries in a Mongo collection, expired by a TTL index and capped at ``max_entries``."""
+
+    def __init__(self, collection, ttl_seconds, max_entries):
+        self.collection = collection
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._writes = 0
+
+    def ensure_indexes(self):
+        self.collection.create_index("expires_at", expireAfterSeconds=0)
+        self.collection.create_index([("last_used_at", ASCENDING)])
+
+    def get(self, key):
+        now = datetime.utcnow()
+        entry = self.collection.find_one_and_update(
+            {"_id": key, "expires_at": {"$gt": now}},
+            {"$set": {"last_used_at": now}}
+        )
+        return entry["response"] if entry else None
+
+    def put(self, key, response, meta):
+        now = datetime.utcnow()
+        self.collection.update_one(
+            {"_id": key},
+            {"$set": dict(
+                meta,
+                response=response,
+                created_at=now,
+                last_used_at=now,
+                expires_at=now + timedelta(seconds=self.ttl_seconds)
+            )},
+            upsert=True
+        )
+        self._writes += 1
+        # Counting on every write would cost more than the memo saves
+        if self._writes % 100 == 0:
+            self.evict()
+
+    def evict(self):
+        """Drop the least recently used entries beyond ``max_entries``."""
+        excess = self.collection.estimated_document_count() - self.max_entries
+        if excess <= 0:
+            return 0
+        stale = [entry["_id"] for entry in self.collection.find({}, {"_id": 1}).sort("last_used_at", ASCENDING).limit(excess)]
+        self.collection.delete_many({"_id": {"$in": stale}})
+        return len(stale)
+
+
+class DiskMemoStore:
+    """Memo entries as JSON files, one per key, under ``directory``.
+
+    Used for fixtures (no TTL, no size bound) and as a local memo when Mongo
+    isn't wanted. Expiry is checked on read from the file's mtime; once the
+    directory grows past ``max_bytes`` the least recently used files go.
+    """
+
+    def __init__(self, directory, ttl_seconds=None, max_bytes=None):
+        self.directory = Path(directory)
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        return self.directory / key[:2] / f"{key}.json"
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            if self.ttl_seconds is not None and time.time() - path.stat().st_mtime > self.ttl_seconds:
+                path.unlink()
+                return None
+            with open(path) as f:
+                entry = json.load(f)
+            # Track recency for eviction without rewriting the file
+            os.utime(path, (time.time(), path.stat().st_mtime))
+        except FileNotFoundError:
+            return None
+        return entry["response"]
+
+    def put(self, key, response, meta):
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "w") as f:
+            json.dump(dict(meta, key=key, response=response), f, indent=2, sort_keys=True)
+        os.replace(tmp, path)
+        with self._lock:
+            self._writes += 1
+            evict = self.max_bytes is not None and self._writes % 50 == 0
+        if evict:
+            self.evict()
+
+    def evict(self):
+        """Remove least recently used files until the directory fits in ``max_bytes``."""
+        files = []
+        for path in self.directory.glob("*/*.json"):
+            stat = path.stat()
+            files.append((stat.st_atime, stat.st_size, path))
+        total = sum(size for _, size, _ in files)
+        removed = 0
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+        return removed
+
+
+class LLMMemo:
+    """Memoization and record/replay for chat completions.
+
+    In ``on`` mode, deterministic calls are looked up in ``store`` before
+    calling OpenAI. ``record`` skips the lookup, so every call reaches
+    OpenAI and is written to ``fixtures`` (and the store), and
+    ``replay`` serves every call from ``fixtures`` so nothing reaches the
+    network. Entries are stored as the completion's JSON.
+    """
+
+    def __init__(self, mode=ON, store=None, fixtures=None):
+        if mode not in MODES:
+            raise ValueError(f"Unknown LLM memo mode {mode!r}; expected one of {', '.join(MODES)}")
+        self.mode = mode
+        self.store = store
+        self.fixtures = fixtures
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "writes": 0, "replayed": 0, "recorded": 0, "errors": 0}
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def lookup(self, key, params):
+        """A stored completion for ``key``, or None to make the call."""
+        if self.mode == REPLAY:
+            response = self.fixtures.get(key)
+            if response is None:
+                raise LLMReplayMiss(f"No recorded LLM response for call {key[:12]}")
+            self._count("replayed")
+            return response
+
+        # A recording must see every call, or replaying it misses the ones the store had
+        if self.mode in (OFF, RECORD) or self.store is None or not is_deterministic(params):
+            return None
+        try:
+            response = self.store.get(key)
+        except Exception as e:
+            # A broken memo must never break the call it's trying to save
+            logger.warning(f"LLM memo lookup failed: {str(e)}")
+            self._count("errors")
+            return None
+        self._count("hits" if response is not None else "misses")
+        return response
+
+    def save(self, key, params, response, meta):
+        if self.mode == RECORD:
+            self.fixtures.put(key, response, meta)
+            self._count("recorded")
+        if self.mode in (ON, RECORD) and self.store is not None and is_deterministic(params):
+            try:
+                self.store.put(key, response, meta)
+                self._count("writes")
+            except Exception as e:
+                logger.warning(f"LLM memo write failed: {str(e)}")
+                self._count("errors")
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self.stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["mode"] = self.mode
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
@@ -0,0 +1,337 @@
+import time
+import logging
+import itertools
+import threading
+from datetime import datetime
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+# Priority classes, most urgent first. Live Alexa turns come before the
+# dashboard, which comes before background analysis and batch work.
+INTERACTIVE = "interactive"
+SUMMARY = "summary"
+ANALYSIS = "analysis"
+BATCH = "batch"
+PRIORITIES = {INTERACTIVE: 0, SUMMARY: 1, ANALYSIS: 2, BATCH: 3}
+
+# Which class each chat_completion purpose is scheduled in
+PURPOSE_CLASSES = {
+    "conversation": INTERACTIVE,
+    "summary": SUMMARY,
+    "analysis": ANALYSIS
+}
+
+
+class LLMQueueTimeout(Exception):
+    """Raised when a call waited too long for a slot or for rate limit capacity."""
+
+
+def estimate_tokens(messages, max_tokens=None):
+    """Rough token cost of a request: about four characters per prompt token plus the completion limit."""
+    prompt_chars = sum(len(str(message.get("content") or "")) for message in messages)
+    return prompt_chars // 4 + (max_tokens or 1000)
+
+
+class MongoTokenBucket:
+    """Requests/min and tokens/min limits shared by every worker through one Mongo document.
+
+    Both buckets refill continuously from the time stored with them, and are
+    updated with compare-and-set on that document, so concurrent takers from
+    different processes never spend the same capacity twice.
+    """
+
+    def __init__(self, collection, name, requests_per_minute, tokens_per_minute):
+        self.collection = collection
+        self.name = name
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+
+    def _refilled(self, doc, now):
+        elapsed = max(0.0, (now - doc["updated_at"]).total_seconds())
+        requests = min(self.requests_per_minute, doc["requests"] + elapsed * self.requests_per_minute / 60)
+        tokens = min(self.tokens_per_minute, doc["tokens"] + elapsed * self.tokens_per_minute / 60)
+        return requests, tokens
+
+    def try_take(self, tokens, reserve=0.0):
+        """
+        Take one request and ``tokens`` tokens if available, leaving at least
+        ``reserve`` (a share of each bucket) untouched. Returns 0 on success,
+        otherwise the seconds to wait before enough capacity has refilled.
+        """
+        tokens = min(tokens, self.tokens_per_minute * (1 - reserve))
+        need_requests = 1 + reserve * self.requests_per_minute
+        need_tokens = tokens + reserve * self.tokens_per_minute
+
+        for _ in range(5):
+            now = datetime.utcnow()
+            doc = self.collection.find_one({"_id": self.name})
+            if doc is None:
+                try:
+                    self.collection.insert_one({
+                        "_id": self.name,
+                        "requests": float(self.requests_per_minute),
+                        "tokens": float(self.tokens_per_minute),
+                        "updated_at": now
+                    })
+                except DuplicateKeyError:
+                    pass
+                continue
+
+            available_requests, available_tokens = self._refilled(doc, now)
+            if available_requests < need_requests or available_tokens < need_tokens:
+                return max(
+                    (need_requests - available_requests) * 60 / self.requests_per_minute,
+                    (need_tokens - available_tokens) * 60 / self.tokens_per_minute
+                )
+
+            result = self.collection.update_one(
+                {
+                    "_id": self.name,
+                    "updated_at": doc["updated_at"],
+                    "requests": doc["requests"],
+                    "tokens": doc["tokens"]
+                },
+                {"$set": {
+                    "requests": available_requests - 1,
+                    "tokens": available_tokens - tokens,
+                    "updated_at": max(now, doc["updated_at"])
+                }}
+            )
+            if result.modified_count:
+                return 0
+        # Lost the race to other workers several times in a row
+        return 0.05
+
+    def adjust(self, requests=0, tokens=0):
+        """Give back (positive) or charge (negative) capacity after the fact."""
+        self.collection.update_one(
+            {"_id": self.name},
+            {"$inc": {"requests": requests, "tokens": tokens}}
+        )
+
+    def levels(self):
+        doc = self.collection.find_one({"_id": self.name})
+        if doc is None:
+            return {"requests": self.requests_per_minute, "tokens": self.tokens_per_minute}
+        requests, tokens = self._refilled(doc, datetime.utcnow())
+        return {"requests": round(requests, 1), "tokens": round(tokens)}
+
+
+class Ticket:
+    """A granted slot for one LLM call."""
+
+    def __init__(self, priority_class, estimated_tokens):
+        self.priority_class = priority_class
+        self.estimated_tokens = estimated_tokens
+        self.charged = False
+
+
+class LLMScheduler:
+    """Admits LLM calls by priority class.
+
+    Each class has its own concurrency limit and all classes share
+    ``max_concurrency``. When slots free up, waiters are admitted most
+    urgent class first, then first come first served. Admitted calls then
+    take from the shared rate limit bucket; every class except interactive
+    must leave ``interactive_reserve`` of the bucket for live conversations.
+    ``on_change(priority_class, queued, in_flight)`` is called whenever a
+    class's queue or in-flight count changes, e.g. to export them as metrics.
+    """
+
+    def __init__(self, limits, max_concurrency, bucket=None, interactive_reserve=0.2, on_change=None):
+        self.limits = limits
+        self.max_concurrency = max_concurrency
+        self.bucket = bucket
+        self.interactive_reserve = interactive_reserve
+        self.on_change = on_change
+
+        self._cond = threading.Condition()
+        self._order = itertools.count()
+        self._waiting = []
+        self._in_flight = {name: 0 for name in PRIORITIES}
+        self.stats = {
+            name: {
+                "admitted": 0,
+                "timed_out": 0,
+                "rate_limited": 0,
+                "wait_seconds_total": 0.0,
+                "wait_seconds_max": 0.0
+            }
+            for name in PRIORITIES
+        }
+
+    def _changed(self, priority_class):
+        """Report a class's counts to ``on_change``. Called with the condition held."""
+        if self.on_change is None:
+            return
+        queued = sum(1 for waiting in self._waiting if waiting[2] == priority_class)
+        try:
+            self.on_change(priority_class, queued, self._in_flight[priority_class])
+        except Exception as e:
+            logger.warning(f"LLM scheduler change callback failed: {str(e)}")
+
+    def _has_capacity(self, priority_class):
+        return (
+            sum(self._in_flight.values()) < self.max_concurrency
+            and self._in_flight[priority_class] < self.limits.get(priority_class, 1)
+        )
+
+    def _is_next(self, entry):
+        """True if no waiter ahead of ``entry`` could start now."""
+        for other in self._waiting:
+            if other >= entry:
+                continue
+            if self._has_capacity(other[2]):
+                return False
+        return True
+
+    def acquire(self, priority_class, estimated_tokens, timeout=None):
+        """Wait for a slot and rate limit capacity; raises LLMQueueTimeout after ``timeout`` seconds."""
+        if priority_class not in PRIORITIES:
+            priority_class = BATCH
+        started = time.monotonic()
+        expires = None if timeout is None else started + timeout
+        entry = (PRIORITIES[priority_class], next(self._order), priority_class)
+
+        with self._cond:
+            self._waiting.append(entry)
+            self._changed(priority_class)
+            try:
+                while not (self._has_capacity(priority_class) and self._is_next(entry)):
+                    remaining = None if expires is None else expires - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        self.stats[priority_class]["timed_out"] += 1
+                        raise LLMQueueTimeout(f"No {priority_class} LLM slot free after {timeout:.1f}s")
+                    self._cond.wait(remaining)
+            finally:
+                self._waiting.remove(entry)
+                self._changed(priority_class)
+            self._in_flight[priority_class] += 1
+            self._changed(priority_class)
+            # Others may be able to start now that the queue has moved
+            self._cond.notify_all()
+
+        ticket = Ticket(priority_class, estimated_tokens)
+        try:
+            self._take_rate(ticket, expires)
+        except BaseException:
+            self.release(ticket)
+            raise
+
+        waited = time.monotonic() - started
+        with self._cond:
+            stats = self.stats[priority_class]
+            stats["admitted"] += 1
+            stats["wait_seconds_total"] += waited
+            stats["wait_seconds_max"] = max(stats["wait_seconds_max"], waited)
+        return ticket
+
+    def try_acquire(self, priority_class, estimated_tokens):
+        """
+        A ticket if a slot and rate limit capacity are free right now, else None.
+
+        For optional calls such as hedges: it never waits and never goes
+        ahead of a waiter that could start.
+        """
+        if priority_class not in PRIORITIES:
+            priority_class = BATCH
+        with self._cond:
+            if not self._has_capacity(priority_class):
+                return None
+            if any(self._has_capacity(waiting[2]) for waiting in self._waiting):
+                return None
+            self._in_flight[priority_class] += 1
+            self._changed(priority_class)
+
+        ticket = Ticket(priority_class, estimated_tokens)
+        if self.bucket is not None:
+            reserve = 0.0 if priority_class == INTERACTIVE else self.interactive_reserve
+            try:
+                wait = self.bucket.try_take(estimated_tokens, reserve)
+            except Exception as e:
+                logger.warning(f"LLM rate limiter unavailable, admitting call: {str(e)}")
+                wait = 0
+            if wait > 0:
+                self.release(ticket)
+                return None
+            ticket.charged = True
+
+        with self._cond:
+            self.stats[priority_class]["admitted"] += 1
+        return ticket
+
+    def _take_rate(self, ticket, expires):
+        if self.bucket is None:
+            return
+        reserve = 0.0 if ticket.priority_class == INTERACTIVE else self.interactive_reserve
+        limited = False
+        while True:
+            try:
+                wait = self.bucket.try_take(ticket.estimated_tokens, reserve)
+            except Exception as e:
+                # The limiter must never take the LLM path down with it
+                logger.warning(f"LLM rate limiter unavailable, admitting call: {str(e)}")
+                return
+            if wait <= 0:
+                ticket.charged = True
+                return
+            if not limited:
+                limited = True
+                with self._cond:
+                    self.stats[ticket.priority_class]["rate_limited"] += 1
+            if expires is not None and time.monotonic() + wait > expires:
+                with self._cond:
+                    self.stats[ticket.priority_class]["timed_out"] += 1
+                raise LLMQueueTimeout(f"LLM rate limit: {ticket.priority_class} call would wait {wait:.1f}s")
+            time.sleep(min(wait, 1.0))
+
+    def settle(self, ticket, actual_tokens=None, called=True):
+        """Correct the bucket once a call's real cost is known, or refund it if it was never made."""
+        if self.bucket is None or not ticket.charged:
+            return
+        try:
+            if not called:
+                self.bucket.adjust(requests=1, tokens=ticket.estimated_tokens)
+            elif actual_tokens is not None:
+                self.bucket.adjust(tokens=ticket.estimated_tokens - actual_tokens)
+        except Exception as e:
+            logger.warning(f"Could not settle LLM rate limit usage: {str(e)}")
+        ticket.charged = False
+
+    def release(self, ticket):
+        with self._cond:
+            self._in_flight[ticket.priority_class] -= 1
+            self._changed(ticket.priority_class)
+            self._cond.notify_all()
+
+    def snapshot(self):
+        """Queue depth, in-flight calls and wait times per class, plus shared bucket levels."""
+        with self._cond:
+            queued = {name: 0 for name in PRIORITIES}
+            for _, _, name in self._waiting:
+                queued[name] += 1
+            classes = {
+                name: dict(
+                    self.stats[name],
+                    queued=queued[name],
+                    in_flight=self._in_flight[name],
+                    limit=self.limits.get(name, 1),
+                    wait_seconds_avg=(
+                        self.stats[name]["wait_seconds_total"] / self.stats[name]["admitted"]
+                        if self.stats[name]["admitted"] else 0.0
+                    )
+                )
+                for name in PRIORITIES
+            }
+        snapshot = {"max_concurrency": self.max_concurrency, "classes": classes}
+        if self.bucket is not None:
+            try:
+                snapshot["rate_limit"] = dict(
+                    self.bucket.levels(),
+                    requests_per_minute=self.bucket.requests_per_minute,
+                    tokens_per_minute=self.bucket.tokens_per_minute
+                )
+            except Exception as e:
+                snapshot["rate_limit"] = {"error": str(e)}
+        return snapshot
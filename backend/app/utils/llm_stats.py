@@ -0,0 +1,83 @@
+import logging
+import threading
+from collections import deque, defaultdict
+from app.utils.metrics import observe_llm_call
+
+logger = logging.getLogger(__name__)
+
+# Number of recent calls kept per model for latency statistics
+WINDOW_SIZE = 200
+
+_lock = threading.Lock()
+_recent = defaultdict(lambda: deque(maxlen=WINDOW_SIZE))
+
+
+def record_call(purpose, model, duration, ttft=None, usage=None, streamed=False, error=None):
+    """
+    Record the timing of one LLM call.
+
+    ``ttft`` is the time to the first content token; for non-streamed calls
+    the whole completion arrives at once, so it equals ``duration``.
+    """
+    if ttft is None and not error:
+        ttft = duration
+
+    call = {
+        "purpose": purpose,
+        "model": model,
+        "duration": duration,
+        "ttft": ttft,
+        "streamed": streamed,
+        "prompt_tokens": getattr(usage, "prompt_tokens", None),
+        "completion_tokens": getattr(usage, "completion_tokens", None),
+        "error": error
+    }
+    with _lock:
+        _recent[model].append(call)
+    observe_llm_call(purpose, model, duration, ttft=ttft, usage=usage, streamed=streamed, error=error)
+
+    logger.info(
+        f"LLM call purpose={purpose} model={model} streamed={streamed} "
+        f"ttft={ttft if ttft is None else round(ttft, 3)}s duration={round(duration, 3)}s"
+        + (f" error={error}" if error else "")
+    )
+    return call
+
+
+def recent_calls(model):
+    """Recent calls for a model, oldest first."""
+    with _lock:
+        return list(_recent[model])
+
+
+def latency_percentile(model, percentile, field="duration", min_samples=20):
+    """
+    The given percentile (0-100) of recent successful call latencies for a
+    model, or None if there aren't enough samples yet.
+    """
+    values = sorted(
+        call[field] for call in recent_calls(model)
+        if not call["error"] and call[field] is not None
+    )
+    if len(values) < min_samples:
+        return None
+    index = min(len(values) - 1, int(round(percentile / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def summary():
+    """Per-model call counts and latency percentiles for debugging endpoints."""
+    with _lock:
+        models = list(_recent.keys())
+
+    result = {}
+    for model in models:
+        calls = recent_calls(model)
+        result[model] = {
+            "calls": len(calls),
+            "errors": sum(1 for call in calls if call["error"]),
+            "p50_seconds": latency_percentile(model, 50, min_samples=1),
+            "p95_seconds": latency_percentile(model, 95, min_samples=1),
+            "ttft_p50_seconds": latency_percentile(model, 50, field="ttft", min_samples=1)
+        }
+    return result
@@ -0,0 +1,154 @@
+import os
+import time
+import threading
+from flask import request, g
+from pymongo import monitoring
+from prometheus_client import (
+    Counter, Gauge, Histogram, CollectorRegistry, generate_latest, CONTENT_TYPE_LATEST
+)
+from prometheus_client import multiprocess
+
+# Buckets sized for each kind of operation: LLM calls take seconds, Mongo
+# operations milliseconds
+LLM_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 3, 5, 7.5, 10, 15, 20, 30, 60)
+MONGO_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+JOB_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Time to produce an HTTP response",
+    ["method", "route", "status"]
+)
+LLM_CALL_SECONDS = Histogram(
+    "llm_call_duration_seconds", "Duration of LLM calls",
+    ["model", "purpose", "streamed", "outcome"], buckets=LLM_BUCKETS
+)
+LLM_TTFT_SECONDS = Histogram(
+    "llm_time_to_first_token_seconds", "Time until the first content token of an LLM call",
+    ["model", "purpose"], buckets=LLM_BUCKETS
+)
+LLM_TOKENS = Counter(
+    "llm_tokens_total", "Tokens used by LLM calls",
+    ["model", "purpose", "kind"]
+)
+MONGO_OPERATION_SECONDS = Histogram(
+    "mongo_operation_duration_seconds", "Duration of MongoDB commands",
+    ["collection", "command", "outcome"], buckets=MONGO_BUCKETS
+)
+JOB_SECONDS = Histogram(
+    "background_job_duration_seconds", "Duration of background job runs",
+    ["job", "outcome"], buckets=JOB_BUCKETS
+)
+# Each worker sets these whenever its breakers and scheduler change, so in
+# multiprocess mode they cover every live worker: the worst breaker state
+# and the total queued and in-flight calls. Dead workers' values are dropped.
+LLM_BREAKER_STATE = Gauge(
+    "llm_circuit_breaker_state", "Circuit breaker state (0 closed, 1 half open, 2 open)",
+    ["breaker"], multiprocess_mode="livemax"
+)
+LLM_QUEUE_DEPTH = Gauge(
+    "llm_scheduler_queued", "LLM calls waiting for a slot",
+    ["priority_class"], multiprocess_mode="livesum"
+)
+LLM_IN_FLIGHT = Gauge(
+    "llm_scheduler_in_flight", "LLM calls in progress",
+    ["priority_class"], multiprocess_mode="livesum"
+)
+
+BREAKER_STATES = {"closed": 0, "half_open": 1, "open": 2}
+
+
+def observe_llm_call(purpose, model, duration, ttft=None, usage=None, streamed=False, error=None):
+    LLM_CALL_SECONDS.labels(model, purpose, str(streamed).lower(), "error" if error else "ok").observe(duration)
+    if ttft is not None:
+        LLM_TTFT_SECONDS.labels(model, purpose).observe(ttft)
+    if usage is not None:
+        LLM_TOKENS.labels(model, purpose, "prompt").inc(getattr(usage, "prompt_tokens", 0) or 0)
+        LLM_TOKENS.labels(model, purpose, "completion").inc(getattr(usage, "completion_tokens", 0) or 0)
+
+
+def observe_job(name, duration, error=None):
+    JOB_SECONDS.labels(name, "error" if error else "ok").observe(duration)
+
+
+class MongoMetricsListener(monitoring.CommandListener):
+    """Times every MongoDB command by collection and command name."""
+
+    def __init__(self):
+        self._started = {}
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        collection = event.command.get(event.command_name)
+        if not isinstance(collection, str):
+            collection = event.command.get("collection", "")
+        with self._lock:
+            self._started[(event.connection_id, event.request_id)] = collection
+
+    def _finish(self, event, outcome):
+        with self._lock:
+            collection = self._started.pop((event.connection_id, event.request_id), "")
+        MONGO_OPERATION_SECONDS.labels(collection or "-", event.command_name, outcome).observe(
+            event.duration_micros / 1e6
+        )
+
+    def succeeded(self, event):
+        self._finish(event, "ok")
+
+    def failed(self, event):
+        self._finish(event, "error")
+
+
+_mongo_listener = None
+
+
+def register_mongo_metrics():
+    """Time commands of every MongoClient created from now on. Safe to call more than once."""
+    global _mongo_listener
+    if _mongo_listener is None:
+        _mongo_listener = MongoMetricsListener()
+        monitoring.register(_mongo_listener)
+
+
+def init_request_metrics(app):
+    """Record the duration of every request by route template and status."""
+
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def observe_request(response):
+        started = g.pop("request_started", None)
+        if started is not None:
+            # Label by route template, not path, so IDs don't blow up cardinality
+            route = request.url_rule.rule if request.url_rule else "unmatched"
+            HTTP_REQUEST_SECONDS.labels(request.method, route, str(response.status_code)).observe(
+                time.perf_counter() - started
+            )
+        return response
+
+
+def observe_breaker_state(name, state):
+    LLM_BREAKER_STATE.labels(name).set(BREAKER_STATES.get(state, 0))
+
+
+def observe_scheduler_class(name, queued, in_flight):
+    LLM_QUEUE_DEPTH.labels(name).set(queued)
+    LLM_IN_FLIGHT.labels(name).set(in_flight)
+
+
+def set_llm_gauges(breakers, scheduler):
+    """Refresh point-in-time LLM gauges from breaker and scheduler snapshots."""
+    for breaker in breakers:
+        observe_breaker_state(breaker["name"], breaker["state"])
+    for name, stats in scheduler["classes"].items():
+        observe_scheduler_class(name, stats["queued"], stats["in_flight"])
+
+
+def render_metrics():
+    """The exposition body and content type, aggregated across workers in multiprocess mode."""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -1,13 +1,30 @@
 import os
 import json
+import time
+from functools import lru_cache
 from pathlib import Path
-from openai import OpenAI
 from dotenv import load_dotenv
 from flask import current_app
+from app.models.conversation import ConversationHelper
+from app.utils.llm_stats import record_call, latency_percentile
+from app.utils.metrics import observe_breaker_state, observe_scheduler_class
+from app.utils.circuit_breaker import get_breaker, CircuitOpenError
+from app.utils.symptom_tagger import tag_conversation, record_tagging
+from app.utils.hedging import HedgePolicy, hedged_call
+from app.utils.deadline import DeadlineExceeded
+from app.utils.tracing import traced, LLM
+from app.utils.llm_memo import LLMMemo, MongoMemoStore, DiskMemoStore, memo_key, OFF, RECORD, REPLAY
+from app.utils.llm_scheduler import (
+    LLMScheduler, MongoTokenBucket, LLMQueueTimeout, PURPOSE_CLASSES, BATCH, estimate_tokens
+)
 
-# Load prompts from files
+# Load prompts from files on first use; the warm-up loads them after boot
 PROMPTS_DIR = Path(__file__).parent.parent / "prompts"
+CONVERSATION_SYSTEM_PROMPT = "system_prompt.txt"
+KEY_QUESTIONS_PROMPT = "key_questions_prompt.txt"
+PROMPT_FILES = (CONVERSATION_SYSTEM_PROMPT, KEY_QUESTIONS_PROMPT)
 
+@lru_cache(maxsize=None)
 def load_prompt(filename):
     try:
         with open(PROMPTS_DIR / filename, "r") as f:
@@ -16,108 +33,551 @@ def load_prompt(filename):
         print(f"Error loading prompt {filename}: {e}")
         raise
 
-# Load prompts
-try:
-    conversation_system_prompt = load_prompt("system_prompt.txt")
-    key_questions_prompt = load_prompt("key_questions_prompt.txt")
-except Exception as e:
-    print(f"Failed to load prompts: {e}")
-    raise
+_openai_clients = {}
 
-def get_openai_client():
-    """Get an instance of the OpenAI client."""
+def new_openai_client():
+    """Get a new instance of the OpenAI client with its own connection pool."""
     api_key = current_app.config.get('OPENAI_API_KEY')
     if not api_key:
         raise ValueError("OpenAI API key is not set")
     
-    return OpenAI(api_key=api_key)
+    # The SDK takes about half a second to import, so it stays out of startup
+    from openai import OpenAI
+    return OpenAI(api_key=api_key, base_url=current_app.config.get('OPENAI_BASE_URL'))
+
+def get_openai_client():
+    """Get this process's OpenAI client, reusing its connection pool across calls."""
+    key = (current_app.config.get('OPENAI_API_KEY'), current_app.config.get('OPENAI_BASE_URL'))
+    client = _openai_clients.get(key)
+    if client is None:
+        client = _openai_clients.setdefault(key, new_openai_client())
+    return client
+
+def reset_llm_clients():
+    """Forget the OpenAI clients, hedging policy, memo and scheduler of this process.
+
+    Called after a fork: the parent's HTTP connections, locks and worker
+    threads are not usable in the child, which builds its own on first use.
+    """
+    global _hedge_policy, _llm_memo, _llm_scheduler
+    _openai_clients.clear()
+    _hedge_policy = None
+    _llm_memo = None
+    _llm_scheduler = None
+
+def llm_breaker(purpose, model):
+    """The circuit breaker guarding calls to one model for one purpose."""
+    config = current_app.config
+    return get_breaker(
+        f"{purpose}:{model}",
+        failure_rate_threshold=config.get("LLM_BREAKER_FAILURE_RATE", 0.5),
+        slow_call_seconds=config.get("LLM_BREAKER_SLOW_CALL_SECONDS", 15.0),
+        slow_call_rate_threshold=config.get("LLM_BREAKER_SLOW_CALL_RATE", 0.5),
+        open_seconds=config.get("LLM_BREAKER_OPEN_SECONDS", 30.0),
+        on_transition=observe_breaker_state
+    )
+
+_hedge_policy = None
+
+def get_hedge_policy():
+    """The process-wide hedging policy, configured from the app on first use."""
+    global _hedge_policy
+    if _hedge_policy is None:
+        _hedge_policy = HedgePolicy(
+            percentile=current_app.config.get("LLM_HEDGE_PERCENTILE", 95),
+            budget_ratio=current_app.config.get("LLM_HEDGE_BUDGET_RATIO", 0.1)
+        )
+    return _hedge_policy
+
+_llm_memo = None
+
+def get_llm_memo():
+    """The process-wide LLM memo, configured from the app on first use."""
+    global _llm_memo
+    if _llm_memo is None:
+        config = current_app.config
+        mode = config.get("LLM_MEMO_MODE", "on")
+        ttl = config.get("LLM_MEMO_TTL_SECONDS", 7 * 24 * 3600)
+        db = getattr(current_app, "db", None)
+        if config.get("LLM_MEMO_STORE", "mongo") == "disk" or db is None:
+            store = DiskMemoStore(config.get("LLM_MEMO_DIR"), ttl, config.get("LLM_MEMO_MAX_BYTES"))
+        else:
+            store = MongoMemoStore(db.llm_memo, ttl, config.get("LLM_MEMO_MAX_ENTRIES", 10000))
+            try:
+                store.ensure_indexes()
+            except Exception as e:
+                print(f"Error creating LLM memo indexes: {str(e)}")
+        fixtures = DiskMemoStore(config.get("LLM_FIXTURES_DIR"))
+        _llm_memo = LLMMemo(mode, store, fixtures)
+    return _llm_memo
+
+def chat_completion_from_dict(data):
+    """A recorded chat completion as the SDK's response object."""
+    from openai.types.chat import ChatCompletion
+    return ChatCompletion.model_validate(data)
+
+def completion_from_stream(model, content, usage):
+    """A chat completion equivalent to a finished stream, for recording as a fixture."""
+    return {
+        "id": "recorded-stream",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop"
+        }],
+        "usage": usage.model_dump(mode="json") if usage else None
+    }
+
+_llm_scheduler = None
+
+def get_llm_scheduler():
+    """The process-wide LLM scheduler, configured from the app on first use."""
+    global _llm_scheduler
+    if _llm_scheduler is None:
+        config = current_app.config
+        db = getattr(current_app, "db", None)
+        bucket = None
+        if db is not None and config.get("LLM_REQUESTS_PER_MINUTE") and config.get("LLM_TOKENS_PER_MINUTE"):
+            bucket = MongoTokenBucket(
+                db.llm_rate_limits,
+                "openai",
+                config["LLM_REQUESTS_PER_MINUTE"],
+                config["LLM_TOKENS_PER_MINUTE"]
+            )
+        _llm_scheduler = LLMScheduler(
+            limits=config.get("LLM_CONCURRENCY_LIMITS", {}),
+            max_concurrency=config.get("LLM_MAX_CONCURRENCY", 16),
+            bucket=bucket,
+            interactive_reserve=config.get("LLM_RATE_INTERACTIVE_RESERVE", 0.2),
+            on_change=observe_scheduler_class
+        )
+    return _llm_scheduler
+
+def schedule_llm_call(messages, purpose, timeout, params):
+    """
+    Wait for the scheduler to admit a call for ``purpose``.
+    
+    Returns the ticket and what is left of ``timeout`` after queueing.
+    Without a timeout, the wait is bounded by LLM_QUEUE_TIMEOUT_SECONDS.
+    """
+    scheduler = get_llm_scheduler()
+    queued_at = time.perf_counter()
+    ticket = scheduler.acquire(
+        PURPOSE_CLASSES.get(purpose, BATCH),
+        estimate_tokens(messages, params.get("max_tokens")),
+        timeout=timeout if timeout is not None else current_app.config.get("LLM_QUEUE_TIMEOUT_SECONDS", 60)
+    )
+    if timeout is not None:
+        timeout -= time.perf_counter() - queued_at
+        if timeout <= 0:
+            scheduler.settle(ticket, called=False)
+            scheduler.release(ticket)
+            raise LLMQueueTimeout(f"No time left for {purpose} call after queueing")
+    return ticket, timeout
 
-def get_conversation_response(messages):
-    """Get a response from OpenAI for the conversation."""
+@traced("openai.chat_completion", LLM, attributes=("purpose", "model"))
+def chat_completion(messages, purpose, model, timeout=None, hedge=False, **params):
+    """
+    Run a chat completion and record its latency and token usage.
+    
+    A ``timeout`` (seconds) bounds the whole call: the SDK's automatic
+    retries are disabled so they can't run past it. Raises CircuitOpenError
+    without calling OpenAI while the model's circuit is open.
+    
+    With ``hedge=True`` (interactive calls only), a second identical request
+    is sent if the first is slower than the configured percentile of this
+    model's recent latency, within the hedge budget.
+    
+    Calls are admitted by the LLM scheduler first, so time spent queued for
+    a slot or for rate limit capacity counts against ``timeout``.
+    
+    Deterministic calls (``temperature=0``) are answered from the LLM memo
+    when the same model, messages and parameters were seen before.
+    """
+    memo = get_llm_memo()
+    key = memo_key(model, messages, params) if memo.mode != OFF else None
+    if key:
+        memoized = memo.lookup(key, params)
+        if memoized is not None:
+            return chat_completion_from_dict(memoized)
+    
+    breaker = llm_breaker(purpose, model)
+    probe = breaker.before_call()
+    
+    scheduler = get_llm_scheduler()
     try:
+        ticket, timeout = schedule_llm_call(messages, purpose, timeout, params)
+    except Exception:
+        breaker.release_probe(probe)
+        raise
+    
+    hedging = hedge and current_app.config.get("LLM_HEDGE_ENABLED")
+    
+    def make_client(timeout):
         client = get_openai_client()
-        
-        response = client.chat.completions.create(
-            model="gpt-4-turbo",  # or gpt-3.5-turbo if preferred
-            messages=messages,
-            temperature=0.7,
-            max_tokens=1000
+        if timeout is not None:
+            client = client.with_options(timeout=timeout, max_retries=0)
+        return client
+    
+    def admit_backup():
+        # A hedge is one more call: it needs its own slot and rate limit capacity
+        backup_ticket = scheduler.try_acquire(
+            PURPOSE_CLASSES.get(purpose, BATCH), estimate_tokens(messages, params.get("max_tokens"))
         )
+        if backup_ticket is None:
+            return None
         
-        # Extract the main response and any chain of thought
-        assistant_message = response.choices[0].message.content
-        
-        # No chain of thought in this implementation, but could be added
-        chain_of_thoughts = None
-        
-        return assistant_message, chain_of_thoughts
+        def finish(called, response):
+            scheduler.settle(backup_ticket, getattr(getattr(response, "usage", None), "total_tokens", None), called=called)
+            scheduler.release(backup_ticket)
+        return finish
     
+    def create(client):
+        return client.chat.completions.create(model=model, messages=messages, **params)
+    
+    started = time.perf_counter()
+    try:
+        if hedging:
+            policy = get_hedge_policy()
+            response = hedged_call(
+                policy,
+                make_client,
+                create,
+                delay=latency_percentile(model, policy.percentile),
+                timeout=timeout,
+                context=current_app._get_current_object().app_context,
+                admit=admit_backup
+            )
+        else:
+            response = create(make_client(timeout))
     except Exception as e:
-        print(f"Error getting OpenAI response: {str(e)}")
-        return "I'm sorry, I encountered an error processing your request.", None
+        breaker.record_failure(probe)
+        record_call(purpose, model, time.perf_counter() - started, error=str(e))
+        raise
+    finally:
+        scheduler.release(ticket)
+    
+    duration = time.perf_counter() - started
+    breaker.record_success(duration, probe)
+    record_call(purpose, model, duration, usage=response.usage)
+    scheduler.settle(ticket, getattr(response.usage, "total_tokens", None))
+    if key:
+        memo.save(key, params, response.model_dump(mode="json"), {"model": model, "purpose": purpose})
+    return response
 
-def analyze_symptoms(conversation_logs):
-    """Analyze symptom logs using OpenAI."""
+@traced("openai.stream_chat_completion", LLM, attributes=("purpose", "model"))
+def stream_chat_completion(messages, purpose, model, timeout=None, **params):
+    """
+    Run a streaming chat completion, yielding content deltas as they arrive.
+    
+    A ``timeout`` (seconds) bounds the whole call, queueing included: the
+    stream is abandoned with a TimeoutError once it runs past it.
+    
+    Time to first token, total duration and usage are recorded once the
+    stream finishes, fails or is closed by the consumer. In replay mode the
+    recorded response is yielded as one delta.
+    """
+    memo = get_llm_memo()
+    key = memo_key(model, messages, params) if memo.mode in (RECORD, REPLAY) else None
+    if memo.mode == REPLAY:
+        recorded = chat_completion_from_dict(memo.lookup(key, params))
+        if recorded.choices[0].message.content:
+            yield recorded.choices[0].message.content
+        return
+    
+    breaker = llm_breaker(purpose, model)
+    probe = breaker.before_call()
+    
+    scheduler = get_llm_scheduler()
     try:
-        client = get_openai_client()
-        
-        # Format conversation for analysis
-        formatted_conversation = []
-        for log in conversation_logs:
-            formatted_conversation.append({
-                "id": str(log.get("_id")),
-                "role": log.get("role"),
-                "content": log.get("content"),
-                "created_at": log.get("created_at").isoformat() if log.get("created_at") else None
-            })
-        
-        # Get the analysis prompt
-        with open("app/prompts/key_questions_prompt.txt", "r") as f:
-            system_prompt = f.read()
-        
-        # Prepare messages for OpenAI
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": f"Here is the conversation to analyze: {json.dumps(formatted_conversation)}"}
-        ]
-        
-        # Get OpenAI analysis
-        response = client.chat.completions.create(
-            model="gpt-4-turbo",  # or gpt-3.5-turbo if preferred
+        ticket, timeout = schedule_llm_call(messages, purpose, timeout, params)
+    except Exception:
+        breaker.release_probe(probe)
+        raise
+    
+    client = get_openai_client()
+    if timeout is not None:
+        client = client.with_options(timeout=timeout, max_retries=0)
+    started = time.perf_counter()
+    ttft = None
+    usage = None
+    parts = []
+    error = "cancelled"
+    try:
+        stream = client.chat.completions.create(
+            model=model,
             messages=messages,
-            temperature=0,
-            max_tokens=1000
+            stream=True,
+            stream_options={"include_usage": True},
+            **params
         )
-        
-        # Extract JSON from the response
-        response_text = response.choices[0].message.content
-        
-        # Find JSON in the response
-        import re
-        json_match = re.search(r'```json\n(.*?)\n```', response_text, re.DOTALL)
-        if json_match:
-            json_str = json_match.group(1)
+        for chunk in stream:
+            if timeout is not None and time.perf_counter() - started > timeout:
+                stream.close()
+                raise TimeoutError(f"{purpose} stream ran past its {timeout:.1f}s timeout")
+            if chunk.usage:
+                usage = chunk.usage
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                if ttft is None:
+                    ttft = time.perf_counter() - started
+                if key:
+                    parts.append(delta)
+                yield delta
+        error = None
+        if key:
+            memo.save(key, params, completion_from_stream(model, "".join(parts), usage), {"model": model, "purpose": purpose})
+    except Exception as e:
+        error = str(e)
+        raise
+    finally:
+        duration = time.perf_counter() - started
+        # A consumer hanging up isn't a failure of the dependency
+        if error in (None, "cancelled"):
+            breaker.record_success(duration, probe)
+        else:
+            breaker.record_failure(probe)
+        record_call(purpose, model, duration, ttft=ttft, usage=usage, streamed=True, error=error)
+        scheduler.settle(ticket, getattr(usage, "total_tokens", None))
+        scheduler.release(ticket)
+
+# Immediate reply for Alexa turns while the conversation models' circuits are open
+DEGRADED_CONVERSATION_REPLY = (
+    "I'm having some trouble right now. Let's continue your check-in in a few minutes."
+)
+
+def conversation_options():
+    """The primary conversation model and the faster fallback used under deadline pressure."""
+    config = current_app.config
+    primary = {
+        "model": config.get("OPENAI_CONVERSATION_MODEL", "gpt-4-turbo"),
+        "max_tokens": 1000
+    }
+    fallback = {
+        # Without a fast model configured, fall back to a shorter completion
+        "model": config.get("OPENAI_FAST_MODEL") or primary["model"],
+        "max_tokens": config.get("OPENAI_FALLBACK_MAX_TOKENS", 300)
+    }
+    return primary, fallback
+
+def get_conversation_response(messages, deadline=None):
+    """
+    Get a response from OpenAI for the conversation.
+    
+    Returns the response text, the chain of thoughts and a ``served_by``
+    record of which path produced it. With a deadline, the primary model is
+    skipped when its recent p90 latency won't fit in the remaining budget,
+    and is otherwise given the budget minus a reserve for the fallback.
+    """
+    primary, fallback = conversation_options()
+    
+    if deadline is None:
+        attempts = [("primary", primary)]
+        reserve = 0
+    else:
+        reserve = latency_percentile(fallback["model"], 90) or current_app.config.get("OPENAI_FALLBACK_RESERVE_SECONDS", 2.0)
+        expected = latency_percentile(primary["model"], 90)
+        if expected is not None and expected > deadline.remaining() - reserve:
+            attempts = [("fallback_over_budget", fallback)]
         else:
-            # Try to find JSON without markdown code blocks
-            json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
-            if json_match:
-                json_str = json_match.group(0)
-            else:
-                raise ValueError("Could not extract JSON from OpenAI response")
+            attempts = [("primary", primary), ("fallback_after_primary_failed", fallback)]
+    
+    circuit_open = False
+    for path, option in attempts:
+        timeout = None
+        if deadline is not None:
+            timeout = deadline.remaining() - (reserve if path == "primary" else 0)
+            if timeout <= 0:
+                continue
         
-        # Parse the JSON
-        symptom_analysis = json.loads(json_str)
+        try:
+            response = chat_completion(
+                messages,
+                purpose="conversation",
+                model=option["model"],
+                timeout=timeout,
+                hedge=True,
+                temperature=0.7,
+                max_tokens=option["max_tokens"]
+            )
+            
+            # Extract the main response and any chain of thought
+            assistant_message = response.choices[0].message.content
+            
+            # No chain of thought in this implementation, but could be added
+            chain_of_thoughts = None
+            
+            served_by = {"path": path, "model": option["model"], "max_tokens": option["max_tokens"]}
+            return assistant_message, chain_of_thoughts, served_by
         
-        return symptom_analysis
+        except CircuitOpenError as e:
+            circuit_open = True
+            print(f"Skipping OpenAI call ({path}): {str(e)}")
+        except Exception as e:
+            print(f"Error getting OpenAI response ({path}): {str(e)}")
+    
+    if circuit_open:
+        # OpenAI is known to be degraded: answer at once rather than queueing
+        # the patient behind calls that are going to fail
+        served_by = {"path": "circuit_open", "model": None, "max_tokens": None}
+        return DEGRADED_CONVERSATION_REPLY, None, served_by
     
+    served_by = {"path": "error_reply", "model": None, "max_tokens": None}
+    return "I'm sorry, I encountered an error processing your request.", None, served_by
+
+def stream_conversation_response(messages, deadline=None):
+    """Stream a response from OpenAI for the conversation, chunk by chunk, within ``deadline``."""
+    primary, _ = conversation_options()
+    timeout = None
+    if deadline is not None:
+        if deadline.expired():
+            raise DeadlineExceeded("Request deadline exceeded before the conversation model was called")
+        timeout = deadline.remaining()
+    return stream_chat_completion(
+        messages,
+        purpose="conversation",
+        model=primary["model"],
+        timeout=timeout,
+        temperature=0.7,
+        max_tokens=1000
+    )
+
+# Speaker codes used in the compact analysis transcript
+ANALYSIS_SPEAKERS = {"user": "P", "bot": "A", "assistant": "A"}
+
+def analysis_response_format(symptoms=None):
+    """Structured output schema for symptom analysis: per symptom, a flag and message numbers."""
+    symptoms = list(symptoms or ConversationHelper.SYMPTOM_CATEGORIES)
+    symptom_schema = {
+        "type": "object",
+        "properties": {
+            "experienced": {"type": "boolean"},
+            "logs": {"type": "array", "items": {"type": "integer"}}
+        },
+        "required": ["experienced", "logs"],
+        "additionalProperties": False
+    }
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": "symptom_analysis",
+            "strict": True,
+            "schema": {
+                "type": "object",
+                "properties": {symptom: symptom_schema for symptom in symptoms},
+                "required": symptoms,
+                "additionalProperties": False
+            }
+        }
+    }
+
+def format_conversation_for_analysis(conversation_logs):
+    """
+    Render messages as numbered lines ("3 P: text") for the analysis prompt.
+    
+    Returns the transcript and the message IDs in order, so the numbers the
+    model answers with can be mapped back to database IDs.
+    """
+    lines = []
+    message_ids = []
+    for log in conversation_logs:
+        message_ids.append(str(log.get("_id")))
+        speaker = ANALYSIS_SPEAKERS.get(log.get("role"), "A")
+        content = " ".join(str(log.get("content") or "").split())
+        lines.append(f"{len(message_ids)} {speaker}: {content}")
+    return "\n".join(lines), message_ids
+
+def build_analysis_messages(conversation_logs, symptoms=None):
+    """
+    The analysis request for a conversation, plus the message IDs its numbers refer to.
+    
+    With ``symptoms``, the model is asked about those symptoms only.
+    """
+    transcript, message_ids = format_conversation_for_analysis(conversation_logs)
+    if symptoms:
+        transcript = f"Only analyze: {', '.join(symptoms)}\n\n{transcript}"
+    messages = [
+        {"role": "system", "content": load_prompt(KEY_QUESTIONS_PROMPT)},
+        {"role": "user", "content": transcript}
+    ]
+    return messages, message_ids
+
+def parse_symptom_analysis(response_text, message_ids, symptoms=None):
+    """Map the model's message numbers back to IDs; raises ValueError if the output is unusable."""
+    try:
+        raw = json.loads(response_text)
+    except (TypeError, json.JSONDecodeError) as e:
+        raise ValueError(f"Symptom analysis is not valid JSON: {str(e)}")
+    if not isinstance(raw, dict):
+        raise ValueError("Symptom analysis is not a JSON object")
+    
+    symptom_analysis = {}
+    for symptom in symptoms or ConversationHelper.SYMPTOM_CATEGORIES:
+        entry = raw.get(symptom) or {}
+        logs = []
+        for number in entry.get("logs") or []:
+            # Ignore numbers that don't refer to a message in the transcript
+            if isinstance(number, int) and 1 <= number <= len(message_ids):
+                message_id = message_ids[number - 1]
+                if message_id not in logs:
+                    logs.append(message_id)
+        symptom_analysis[symptom] = {
+            "experienced": bool(entry.get("experienced", False)),
+            "logs": logs
+        }
+    return symptom_analysis
+
+def analyze_symptoms_with_llm(conversation_logs, symptoms=None):
+    """
+    Ask the LLM about ``symptoms`` (default: all six) in these messages.
+    
+    Messages are sent as numbered lines and the model answers with message
+    numbers under a strict JSON schema, which are mapped back to message
+    IDs here. Failures to reach OpenAI are raised; an unusable response
+    gives the default state for each symptom.
+    """
+    messages, message_ids = build_analysis_messages(conversation_logs, symptoms)
+    
+    response = chat_completion(
+        messages,
+        purpose="analysis",
+        model=current_app.config.get("OPENAI_ANALYSIS_MODEL", "gpt-4o"),
+        temperature=0,
+        max_tokens=500,
+        response_format=analysis_response_format(symptoms)
+    )
+    
+    try:
+        return parse_symptom_analysis(response.choices[0].message.content, message_ids, symptoms)
     except Exception as e:
         print(f"Error analyzing symptoms: {str(e)}")
-        # Return default structure with all symptoms set to false
-        return {
-            "Shortness of Breath": {"experienced": False, "logs": []},
-            "Palpitation": {"experienced": False, "logs": []},
-            "Chest Discomfort": {"experienced": False, "logs": []},
-            "Swelling": {"experienced": False, "logs": []},
-            "Fatigue": {"experienced": False, "logs": []},
-            "Syncope": {"experienced": False, "logs": []}
-        } 
\ No newline at end of file
+        defaults = ConversationHelper.get_initial_symptom_states()
+        return {symptom: defaults[symptom] for symptom in symptoms or defaults}
+
+def analyze_symptoms(conversation_logs):
+    """
+    Analyze symptom logs, using OpenAI only where the local tagger can't decide.
+    
+    The symptom tagger settles symptoms with clear evidence (or none at all);
+    the rest are sent to the LLM with only the messages that discuss them.
+    Failures to reach OpenAI (including an open circuit) are raised so the
+    caller can queue the analysis for later.
+    """
+    config = current_app.config
+    symptom_analysis = ConversationHelper.get_initial_symptom_states()
+    
+    if not config.get("SYMPTOM_TAGGER_ENABLED", True):
+        symptom_analysis.update(analyze_symptoms_with_llm(conversation_logs))
+        return symptom_analysis
+    
+    tagging = tag_conversation(conversation_logs, config.get("SYMPTOM_TAGGER_MIN_CONFIDENCE", 0.8))
+    record_tagging(tagging)
+    symptom_analysis.update(tagging.resolved)
+    if tagging.uncertain:
+        symptom_analysis.update(analyze_symptoms_with_llm(tagging.messages, tagging.uncertain))
+    return symptom_analysis
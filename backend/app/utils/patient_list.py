@@ -0,0 +1,352 @@
+import re
+import base64
+import unicodedata
+from datetime import datetime, timedelta
+from bson import json_util
+from pymongo import ASCENDING, DESCENDING, UpdateOne, ReplaceOne
+from app.utils.patient_overview import refresh_patient_overview
+from app.utils.symptom_history import history_document
+
+# Bump when the derived fields below (or the symptom history) change so the
+# backfill job recomputes them
+LIST_FIELDS_VERSION = 2
+
+# Fields returned for each patient in the list
+LIST_PROJECTION = {
+    "_id": 1,
+    "id": 1,
+    "name": 1,
+    "age": 1,
+    "gender": 1,
+    "riskLevel": 1,
+    "aiRiskPrediction.riskScore": 1,
+    "last_conversation_date": 1,
+    "reported_symptoms": 1
+}
+
+# Sort keys: the indexed field and its default direction
+SORTS = {
+    "name": ("name_lower", ASCENDING),
+    "age": ("age", ASCENDING),
+    "risk": ("aiRiskPrediction.riskScore", DESCENDING),
+    "last_conversation": ("last_conversation_date", DESCENDING)
+}
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+# Typo-tolerant search ranks at most this many trigram matches
+SEARCH_CANDIDATES = 200
+# Share of the query's trigrams a name must contain to count as a fuzzy match
+MIN_TRIGRAM_SIMILARITY = 0.4
+
+
+class InvalidListQuery(ValueError):
+    """A patient list parameter that can't be used."""
+
+
+def normalize_name(name):
+    """Lowercase ``name`` and strip accents and punctuation, for searching and sorting."""
+    decomposed = unicodedata.normalize("NFKD", name or "")
+    plain = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return " ".join(re.findall(r"[a-z0-9]+", plain.lower()))
+
+
+def trigrams(token):
+    padded = f"^{token}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def name_search_fields(name):
+    """Derived fields backing name search and sorting."""
+    normalized = normalize_name(name)
+    tokens = normalized.split()
+    grams = set()
+    for token in tokens:
+        grams |= trigrams(token)
+    return {
+        "name_lower": normalized,
+        "name_tokens": tokens,
+        "name_trigrams": sorted(grams)
+    }
+
+
+def latest_symptom_states(symptom_states):
+    """The most recent check-in's symptoms from either stored shape.
+
+    ``symptom_states`` is either keyed by date (YYYY-MM-DD) or, for older
+    patients, the symptoms of a single check-in.
+    """
+    if not symptom_states:
+        return {}
+    if any(isinstance(value, dict) and "experienced" in value for value in symptom_states.values()):
+        return symptom_states
+    return symptom_states[max(symptom_states)] or {}
+
+
+def reported_symptoms(states):
+    """Names of the symptoms experienced in one check-in's symptom states."""
+    return sorted(name for name, state in (states or {}).items() if isinstance(state, dict) and state.get("experienced"))
+
+
+def list_fields(patient):
+    """All derived list fields for a patient document."""
+    fields = name_search_fields(patient.get("name"))
+    fields["reported_symptoms"] = reported_symptoms(latest_symptom_states(patient.get("symptom_states")))
+    fields["list_fields_version"] = LIST_FIELDS_VERSION
+    return fields
+
+
+def ensure_patient_list_indexes(db):
+    """Indexes for the patient list's sorts, filters and name search."""
+    for field, _ in SORTS.values():
+        db.patients.create_index([(field, ASCENDING), ("_id", ASCENDING)])
+    # Risk filter with the default sort
+    db.patients.create_index([("riskLevel", ASCENDING), ("name_lower", ASCENDING), ("_id", ASCENDING)])
+    db.patients.create_index([("name_tokens", ASCENDING)])
+    db.patients.create_index([("name_trigrams", ASCENDING)])
+    db.patients.create_index([("reported_symptoms", ASCENDING)])
+    db.patients.create_index([("list_fields_version", ASCENDING)])
+
+
+def backfill_list_fields(db, batch_size=500):
+    """Compute the derived list fields and symptom history for patients missing or with outdated ones.
+
+    Returns the number of patients updated.
+    """
+    stale = {"$or": [
+        {"list_fields_version": {"$exists": False}},
+        {"list_fields_version": {"$lt": LIST_FIELDS_VERSION}}
+    ]}
+    projection = {"name": 1, "symptom_states": 1, "last_conversation_date": 1}
+    patients = list(db.patients.find(stale, projection).limit(batch_size))
+    if not patients:
+        return 0
+    db.patients.bulk_write(
+        [UpdateOne({"_id": patient["_id"]}, {"$set": list_fields(patient)}) for patient in patients],
+        ordered=False
+    )
+    db.symptom_history.bulk_write(
+        [ReplaceOne({"_id": patient["_id"]}, history_document(patient), upsert=True) for patient in patients],
+        ordered=False
+    )
+    refresh_patient_overview(db, *[patient["_id"] for patient in patients])
+    return len(patients)
+
+
+def get_path(document, path):
+    for part in path.split("."):
+        if not isinstance(document, dict):
+            return None
+        document = document.get(part)
+    return document
+
+
+def encode_cursor(sort, value, last_id):
+    data = json_util.dumps({"s": sort, "v": value, "i": last_id})
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor, sort):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json_util.loads(base64.urlsafe_b64decode(padded.encode()))
+        if data["s"] != sort:
+            raise InvalidListQuery("cursor belongs to a different sort order")
+        return data["v"], data["i"]
+    except InvalidListQuery:
+        raise
+    except Exception:
+        raise InvalidListQuery("invalid cursor")
+
+
+def after_cursor(field, direction, value, last_id):
+    """Query for the documents after (``value``, ``last_id``) in the given order.
+
+    Missing values sort before every other value, so they come first going
+    up and last going down.
+    """
+    op = "$gt" if direction == ASCENDING else "$lt"
+    if value is None:
+        if direction == ASCENDING:
+            return {"$or": [{field: None, "_id": {op: last_id}}, {field: {"$ne": None}}]}
+        return {field: None, "_id": {op: last_id}}
+    branches = [{field: {op: value}}, {field: value, "_id": {op: last_id}}]
+    if direction == DESCENDING:
+        branches.append({field: None})
+    return {"$or": branches}
+
+
+def split_values(value):
+    return [part.strip() for part in value.split(",") if part.strip()] if value else []
+
+
+def parse_int(args, name):
+    value = args.get(name)
+    if value in (None, ""):
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise InvalidListQuery(f"{name} must be an integer")
+
+
+def parse_date(args, name):
+    value = args.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, "%Y-%m-%d")
+    except ValueError:
+        raise InvalidListQuery(f"{name} must be a date (YYYY-MM-DD)")
+
+
+def build_filter(args):
+    """MongoDB conditions for the list's filter parameters."""
+    conditions = []
+    risk_levels = split_values(args.get("risk_level"))
+    if risk_levels:
+        conditions.append({"riskLevel": {"$in": risk_levels}})
+    genders = split_values(args.get("gender"))
+    if genders:
+        conditions.append({"gender": {"$in": genders}})
+
+    age = {}
+    min_age, max_age = parse_int(args, "min_age"), parse_int(args, "max_age")
+    if min_age is not None:
+        age["$gte"] = min_age
+    if max_age is not None:
+        age["$lte"] = max_age
+    if age:
+        conditions.append({"age": age})
+
+    conversation = {}
+    after, before = parse_date(args, "last_conversation_after"), parse_date(args, "last_conversation_before")
+    if after:
+        conversation["$gte"] = after
+    if before:
+        # Inclusive of the whole day
+        conversation["$lt"] = before + timedelta(days=1)
+    if conversation:
+        conditions.append({"last_conversation_date": conversation})
+
+    symptoms = split_values(args.get("symptoms"))
+    if symptoms:
+        conditions.append({"reported_symptoms": {"$all": symptoms}})
+    return conditions
+
+
+def combine(conditions):
+    if not conditions:
+        return {}
+    return conditions[0] if len(conditions) == 1 else {"$and": conditions}
+
+
+def public_patient(patient):
+    patient.pop("name_lower", None)
+    return patient
+
+
+def count_patients(db, conditions, count_limit):
+    """Total for the list: the collection estimate, or a count capped at ``count_limit``.
+
+    Returns ``(total, is_estimate)``.
+    """
+    if not conditions:
+        return db.patients.estimated_document_count(), True
+    total = db.patients.count_documents(combine(conditions), limit=count_limit)
+    return total, total >= count_limit
+
+
+def list_patients(db, args, count_limit=1000):
+    """One page of the patient list, or the best name matches when ``q`` is given."""
+    limit = parse_int(args, "limit")
+    if limit is None:
+        limit = DEFAULT_LIMIT
+    if not 1 <= limit <= MAX_LIMIT:
+        raise InvalidListQuery(f"limit must be between 1 and {MAX_LIMIT}")
+    conditions = build_filter(args)
+
+    query = normalize_name(args.get("q"))
+    if query:
+        return {
+            "patients": search_patients(db, query, conditions, limit),
+            "next_cursor": None,
+            "total": None,
+            "total_is_estimate": False
+        }
+
+    sort = args.get("sort") or "name"
+    if sort not in SORTS:
+        raise InvalidListQuery(f"sort must be one of {', '.join(SORTS)}")
+    field, direction = SORTS[sort]
+    order = args.get("order")
+    if order:
+        if order not in ("asc", "desc"):
+            raise InvalidListQuery("order must be asc or desc")
+        direction = ASCENDING if order == "asc" else DESCENDING
+    sort_key = f"{sort}:{'asc' if direction == ASCENDING else 'desc'}"
+
+    page_conditions = list(conditions)
+    if args.get("cursor"):
+        value, last_id = decode_cursor(args["cursor"], sort_key)
+        page_conditions.append(after_cursor(field, direction, value, last_id))
+
+    projection = dict(LIST_PROJECTION, **{field: 1})
+    patients = list(
+        db.patients.find(combine(page_conditions), projection)
+        .sort([(field, direction), ("_id", direction)])
+        .limit(limit + 1)
+    )
+    next_cursor = None
+    if len(patients) > limit:
+        patients = patients[:limit]
+        last = patients[-1]
+        next_cursor = encode_cursor(sort_key, get_path(last, field), last["_id"])
+
+    total, is_estimate = count_patients(db, conditions, count_limit)
+    return {
+        "patients": [public_patient(patient) for patient in patients],
+        "next_cursor": next_cursor,
+        "total": total,
+        "total_is_estimate": is_estimate
+    }
+
+
+def search_patients(db, query, conditions, limit):
+    """Patients whose name matches ``query``: word prefixes first, then close spellings.
+
+    Every query word must start a word of the name ("jo smi" finds "John
+    Smith"). If that gives fewer than ``limit`` patients, names sharing
+    enough trigrams with the query fill the rest, best match first.
+    """
+    tokens = query.split()
+    prefix = [{"name_tokens": {"$regex": f"^{re.escape(token)}"}} for token in tokens]
+    patients = list(
+        db.patients.find(combine(conditions + prefix), LIST_PROJECTION)
+        .sort([("name_lower", ASCENDING), ("_id", ASCENDING)])
+        .limit(limit)
+    )
+    if len(patients) >= limit or len(query.replace(" ", "")) < 3:
+        return patients
+
+    grams = set()
+    for token in tokens:
+        grams |= trigrams(token)
+    grams = sorted(grams)
+    found = [patient["_id"] for patient in patients]
+    match = combine(conditions + [{"name_trigrams": {"$in": grams}}, {"_id": {"$nin": found}}])
+    candidates = db.patients.aggregate([
+        {"$match": match},
+        {"$addFields": {"_overlap": {"$size": {
+            "$filter": {"input": "$name_trigrams", "cond": {"$in": ["$$this", grams]}}
+        }}}},
+        {"$sort": {"_overlap": DESCENDING, "name_lower": ASCENDING}},
+        {"$limit": SEARCH_CANDIDATES},
+        {"$project": dict(LIST_PROJECTION, _overlap=1)}
+    ])
+    for candidate in candidates:
+        if len(patients) >= limit:
+            break
+        if candidate.pop("_overlap") / len(grams) >= MIN_TRIGRAM_SIMILARITY:
+            patients.append(candidate)
+    return patients
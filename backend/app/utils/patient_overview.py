@@ -0,0 +1,92 @@
+import logging
+from datetime import datetime
+from pymongo import ASCENDING, DESCENDING
+
+logger = logging.getLogger(__name__)
+
+# Wearable series summarized in the overview
+VITALS = ["heartRate", "respiration", "spo2", "skinTemperature"]
+
+# Risk first for triage, then by name
+OVERVIEW_SORT = [("riskScore", DESCENDING), ("name_lower", ASCENDING), ("_id", ASCENDING)]
+
+
+def latest_vital(sensor):
+    """Expression for the most recent daily reading ({date, value}) of a wearable series."""
+    series = {"$ifNull": [f"$wearableSensorData.{sensor}.10days", []]}
+    return {"$let": {
+        "vars": {"series": series},
+        "in": {"$arrayElemAt": [
+            "$$series",
+            {"$indexOfArray": ["$$series.date", {"$max": "$$series.date"}]}
+        ]}
+    }}
+
+
+def overview_pipeline(refreshed_at):
+    """Aggregation stages that turn patient documents into overview rows and merge them.
+
+    The row keeps the patient's ``_id``, so rerunning the pipeline for a
+    patient replaces its row. Everything is computed on the server; nothing
+    but the command goes over the wire.
+    """
+    latest_checkin = {"$max": {"$map": {
+        "input": {"$filter": {
+            "input": {"$objectToArray": {"$ifNull": ["$symptom_states", {}]}},
+            "cond": {"$regexMatch": {"input": "$$this.k", "regex": r"^\d{4}-\d{2}-\d{2}$"}}
+        }},
+        "in": "$$this.k"
+    }}}
+    return [
+        {"$project": {
+            "id": 1,
+            "name": 1,
+            "name_lower": 1,
+            "age": 1,
+            "gender": 1,
+            "riskLevel": 1,
+            "riskScore": "$aiRiskPrediction.riskScore",
+            "vitals": {sensor: latest_vital(sensor) for sensor in VITALS},
+            "reported_symptoms": {"$ifNull": ["$reported_symptoms", []]},
+            "symptoms_date": latest_checkin,
+            "last_conversation_date": 1,
+            "refreshed_at": {"$literal": refreshed_at}
+        }},
+        {"$merge": {"into": "patient_overview", "on": "_id", "whenMatched": "replace", "whenNotMatched": "insert"}}
+    ]
+
+
+def ensure_patient_overview_indexes(db):
+    db.patient_overview.create_index(OVERVIEW_SORT)
+
+
+def refresh_patient_overview(db, *patient_ids):
+    """Recompute the overview rows of patients after a write to them.
+
+    Failures are logged rather than raised so they never fail the write
+    that triggered them; the periodic rebuild repairs any row left stale.
+    """
+    try:
+        match = {"$match": {"_id": {"$in": list(patient_ids)}}}
+        db.patients.aggregate([match] + overview_pipeline(datetime.utcnow()))
+    except Exception as e:
+        logger.warning(f"Could not refresh the overview of patients {patient_ids}: {str(e)}")
+
+
+def rebuild_patient_overview(db):
+    """Recompute every overview row and drop rows of patients that no longer exist.
+
+    Rows refreshed by a write while the rebuild runs carry a later
+    ``refreshed_at`` and are kept. Returns the number of rows.
+    """
+    started = datetime.utcnow()
+    db.patients.aggregate(overview_pipeline(started))
+    removed = db.patient_overview.delete_many({"refreshed_at": {"$lt": started}}).deleted_count
+    if removed:
+        logger.info(f"Removed {removed} overview rows of deleted patients")
+    return db.patient_overview.estimated_document_count()
+
+
+def cohort_overview(db):
+    """Every patient's overview row, highest risk first."""
+    return list(db.patient_overview.find({}, {"name_lower": 0, "refreshed_at": 0}).sort(OVERVIEW_SORT))
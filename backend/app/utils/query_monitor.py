@@ -0,0 +1,379 @@
+import json
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import bson
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+# Commands whose filter and sort describe the query shape
+READ_COMMANDS = {"find", "aggregate", "count", "distinct", "findAndModify"}
+WRITE_COMMANDS = {"update", "delete"}
+# Commands explain() accepts
+EXPLAINABLE = READ_COMMANDS | WRITE_COMMANDS
+# Driver and monitoring chatter that says nothing about the app's queries
+IGNORED_COMMANDS = {
+    "explain", "hello", "ismaster", "isMaster", "ping", "saslStart", "saslContinue",
+    "endSessions", "buildInfo", "getLastError", "listIndexes", "createIndexes"
+}
+
+# Query shapes kept before new ones are counted but no longer tracked
+MAX_SHAPES = 500
+
+# Open cursors idle this long are forgotten; the server times them out
+# after 10 minutes unless they were opened with noCursorTimeout
+CURSOR_IDLE_SECONDS = 600
+
+
+def value_shape(value):
+    """The structure of a filter with literal values replaced by "?"."""
+    if isinstance(value, dict):
+        return {key: value_shape(item) for key, item in value.items()}
+    if isinstance(value, list) and value and all(isinstance(item, dict) for item in value):
+        return [value_shape(item) for item in value]
+    return "?"
+
+
+def _shape_string(value):
+    return json.dumps(value_shape(value), sort_keys=True) if value else "{}"
+
+
+def query_shape(command_name, command):
+    """
+    A stable description of what a command asks for, without its values.
+
+    Two ``find`` calls for different patients share a shape; adding a sort
+    or a filter field makes a new one.
+    """
+    collection = command.get(command_name)
+    if not isinstance(collection, str):
+        collection = command.get("collection", "")
+
+    if command_name == "find":
+        detail = f"filter={_shape_string(command.get('filter'))}"
+        if command.get("sort"):
+            detail += f" sort={list(command['sort'])}"
+    elif command_name == "aggregate":
+        stages = []
+        for stage in command.get("pipeline", []):
+            name = next(iter(stage), "")
+            stages.append(f"{name}{_shape_string(stage[name])}" if name in ("$match", "$sort") else name)
+        detail = " | ".join(stages)
+    elif command_name in ("count", "distinct"):
+        detail = f"filter={_shape_string(command.get('query'))}"
+    elif command_name == "findAndModify":
+        detail = f"filter={_shape_string(command.get('query'))}"
+        if command.get("sort"):
+            detail += f" sort={list(command['sort'])}"
+    elif command_name == "update":
+        detail = f"filter={_shape_string((command.get('updates') or [{}])[0].get('q'))}"
+    elif command_name == "delete":
+        detail = f"filter={_shape_string((command.get('deletes') or [{}])[0].get('q'))}"
+    else:
+        detail = ""
+    return f"{collection}.{command_name} {detail}".strip()
+
+
+def plan_summary(explain):
+    """Stages of interest in an explain() result: collection scans, in-memory sorts and indexes used."""
+    stages = set()
+    indexes = set()
+
+    def walk(node):
+        if isinstance(node, dict):
+            stage = node.get("stage")
+            if isinstance(stage, str):
+                stages.add(stage)
+                if node.get("indexName"):
+                    indexes.add(node["indexName"])
+            for key, item in node.items():
+                # Rejected plans were not run
+                if key != "rejectedPlans":
+                    walk(item)
+        elif isinstance(node, list):
+            for item in node:
+                walk(item)
+
+    walk(explain)
+    return {
+        "collscan": "COLLSCAN" in stages,
+        "in_memory_sort": bool(stages & {"SORT", "SORT_KEY_GENERATOR"}),
+        "indexes": sorted(indexes),
+        "stages": sorted(stages)
+    }
+
+
+def reply_documents(command_name, reply):
+    cursor = reply.get("cursor")
+    if cursor:
+        return len(cursor.get("firstBatch") or cursor.get("nextBatch") or [])
+    if command_name == "findAndModify":
+        return 1 if reply.get("value") else 0
+    if command_name == "distinct":
+        return len(reply.get("values") or [])
+    return reply.get("n", 0) if command_name in ("count",) else 0
+
+
+def reply_bytes(command_name, reply, documents):
+    """
+    Estimated size of the documents in a reply.
+
+    Encoding the whole reply again would cost about as much as decoding it,
+    on every operation; one document of the batch times the number returned
+    is close enough to spot large results.
+    """
+    cursor = reply.get("cursor")
+    if cursor:
+        batch = cursor.get("firstBatch") or cursor.get("nextBatch")
+        return len(bson.encode(batch[0])) * documents if batch and isinstance(batch[0], dict) else 0
+    if command_name == "findAndModify" and isinstance(reply.get("value"), dict):
+        return len(bson.encode(reply["value"]))
+    return 0
+
+
+class ShapeStats:
+    __slots__ = (
+        "shape", "collection", "command", "calls", "total_ms", "max_ms", "documents", "max_documents",
+        "bytes", "slow", "large", "plan", "last_seen"
+    )
+
+    def __init__(self, shape, collection, command):
+        self.shape = shape
+        self.collection = collection
+        self.command = command
+        self.calls = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.documents = 0
+        self.max_documents = 0
+        self.bytes = 0
+        self.slow = 0
+        self.large = 0
+        self.plan = None
+        self.last_seen = None
+
+    def flags(self):
+        flags = []
+        if self.slow:
+            flags.append("slow")
+        if self.large:
+            flags.append("large_result")
+        if self.plan and self.plan.get("collscan"):
+            flags.append("collscan")
+        if self.plan and self.plan.get("in_memory_sort"):
+            flags.append("in_memory_sort")
+        return flags
+
+    def to_dict(self):
+        return {
+            "shape": self.shape,
+            "collection": self.collection,
+            "command": self.command,
+            "calls": self.calls,
+            "total_ms": round(self.total_ms, 3),
+            "avg_ms": round(self.total_ms / self.calls, 3) if self.calls else 0.0,
+            "max_ms": round(self.max_ms, 3),
+            "documents": self.documents,
+            "avg_documents": round(self.documents / self.calls, 1) if self.calls else 0.0,
+            "max_documents": self.max_documents,
+            "bytes": self.bytes,
+            "slow": self.slow,
+            "large": self.large,
+            "plan": self.plan,
+            "flags": self.flags(),
+            "last_seen": self.last_seen
+        }
+
+
+class QueryMonitor(monitoring.CommandListener):
+    """
+    Per-query-shape statistics from pymongo command monitoring.
+
+    Each command is attributed to its shape (see ``query_shape``), including
+    the ``getMore`` batches of its cursor. Operations slower than
+    ``slow_ms`` or returning more than ``max_documents`` are logged and
+    counted. The first time a shape is seen, its plan is explained in the
+    background to catch collection scans and in-memory sorts.
+    """
+
+    def __init__(self, slow_ms=100, max_documents=500, explain=True, max_shapes=MAX_SHAPES):
+        self.slow_ms = slow_ms
+        self.max_documents = max_documents
+        self.explain = explain
+        self.max_shapes = max_shapes
+        self.client = None
+        self.shapes = {}
+        self.untracked = 0
+        self._pending = {}
+        # Cursor ID -> (shape, documents returned so far, time of last batch)
+        self._cursors = {}
+        self._cursors_swept = time.monotonic()
+        self._lock = threading.Lock()
+        self._explainer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="query-explain")
+
+    def attach(self, client):
+        """The client used to explain new query shapes."""
+        self.client = client
+
+    def started(self, event):
+        command_name = event.command_name
+        if command_name in IGNORED_COMMANDS:
+            return
+        cursor_id = None
+        if command_name == "killCursors":
+            with self._lock:
+                for killed in event.command.get("cursors", []):
+                    self._cursors.pop(killed, None)
+            return
+        if command_name == "getMore":
+            cursor_id = event.command.get("getMore")
+            with self._lock:
+                shape = self._cursors.get(cursor_id, (None,))[0]
+            if shape is None:
+                return
+            new_shape = False
+        else:
+            shape = query_shape(command_name, event.command)
+            with self._lock:
+                new_shape = shape not in self.shapes
+                if new_shape:
+                    if len(self.shapes) >= self.max_shapes:
+                        self.untracked += 1
+                        return
+                    collection = shape.split(".", 1)[0]
+                    self.shapes[shape] = ShapeStats(shape, collection, command_name)
+
+        if new_shape and self.explain and command_name in EXPLAINABLE and self.client is not None:
+            command = {key: value for key, value in event.command.items() if not key.startswith("$") and key != "lsid"}
+            self._explainer.submit(self._explain, shape, event.database_name, command)
+
+        with self._lock:
+            self._pending[(event.connection_id, event.request_id)] = (shape, cursor_id)
+
+    def succeeded(self, event):
+        with self._lock:
+            shape, previous_cursor = self._pending.pop((event.connection_id, event.request_id), (None, None))
+        if shape is None:
+            return
+
+        reply = event.reply or {}
+        documents = reply_documents(event.command_name, reply)
+        size = reply_bytes(event.command_name, reply, documents)
+        duration_ms = event.duration_micros / 1000
+        cursor_id = (reply.get("cursor") or {}).get("id")
+
+        with self._lock:
+            stats = self.shapes.get(shape)
+            if stats is None:
+                return
+            stats.total_ms += duration_ms
+            stats.max_ms = max(stats.max_ms, duration_ms)
+            stats.documents += documents
+            stats.bytes += size
+            stats.last_seen = time.time()
+            # A getMore continues the call that opened the cursor
+            if event.command_name != "getMore":
+                stats.calls += 1
+            # Documents are counted across all batches of a cursor; ID 0 means it's exhausted
+            returned = documents
+            if previous_cursor:
+                returned += self._cursors.pop(previous_cursor, (None, 0))[1]
+            if cursor_id:
+                self._cursors[cursor_id] = (shape, returned, time.monotonic())
+                self._sweep_cursors()
+            stats.max_documents = max(stats.max_documents, returned)
+            slow = duration_ms > self.slow_ms
+            # Flag a large result once, when its cursor first goes past the limit
+            large = returned > self.max_documents >= returned - documents
+            if slow:
+                stats.slow += 1
+            if large:
+                stats.large += 1
+
+        if slow or large:
+            logger.warning(
+                f"{'Slow' if slow else 'Large'} MongoDB operation {shape}: "
+                f"{duration_ms:.1f} ms, {returned} documents, ~{size} bytes"
+            )
+
+    def _sweep_cursors(self):
+        """Forget cursors left open and never exhausted or killed. Called with the lock held."""
+        now = time.monotonic()
+        if now - self._cursors_swept < 60:
+            return
+        self._cursors_swept = now
+        idle = [cursor_id for cursor_id, (_, _, used) in self._cursors.items() if now - used > CURSOR_IDLE_SECONDS]
+        for cursor_id in idle:
+            del self._cursors[cursor_id]
+
+    def failed(self, event):
+        with self._lock:
+            self._pending.pop((event.connection_id, event.request_id), None)
+
+    def _explain(self, shape, database, command):
+        try:
+            explain = self.client[database].command({"explain": command, "verbosity": "queryPlanner"})
+        except Exception as e:
+            logger.info(f"Could not explain {shape}: {str(e)}")
+            return
+        plan = plan_summary(explain)
+        with self._lock:
+            if shape in self.shapes:
+                self.shapes[shape].plan = plan
+        if plan["collscan"] or plan["in_memory_sort"]:
+            problems = " and ".join(
+                name for name, found in (("collection scan", plan["collscan"]), ("in-memory sort", plan["in_memory_sort"])) if found
+            )
+            logger.warning(f"MongoDB query {shape} uses a {problems}")
+
+    def report(self, limit=50, flagged_only=False):
+        """Query shapes ranked by total time."""
+        with self._lock:
+            shapes = [stats.to_dict() for stats in self.shapes.values()]
+            untracked = self.untracked
+        flagged = [stats for stats in shapes if stats["flags"]]
+        ranked = flagged if flagged_only else shapes
+        ranked.sort(key=lambda stats: stats["total_ms"], reverse=True)
+        return {
+            "slow_ms": self.slow_ms,
+            "max_documents": self.max_documents,
+            "tracked_shapes": len(shapes),
+            "flagged_shapes": len(flagged),
+            "untracked_commands": untracked,
+            "queries": ranked[:limit]
+        }
+
+    def reset(self):
+        with self._lock:
+            self.shapes.clear()
+            self._cursors.clear()
+            self.untracked = 0
+
+
+_query_monitor = None
+
+
+def register_query_monitor(config):
+    """
+    Monitor commands of every MongoClient created from now on, if enabled.
+
+    Returns the process-wide monitor (or None), to be attached to the
+    client once it exists. Safe to call more than once.
+    """
+    global _query_monitor
+    if not config.get("QUERY_MONITOR_ENABLED", True):
+        return None
+    if _query_monitor is None:
+        _query_monitor = QueryMonitor(
+            slow_ms=config.get("QUERY_SLOW_MS", 100),
+            max_documents=config.get("QUERY_MAX_DOCUMENTS", 500),
+            explain=config.get("QUERY_EXPLAIN_NEW_SHAPES", True)
+        )
+        monitoring.register(_query_monitor)
+    return _query_monitor
+
+
+def get_query_monitor():
+    return _query_monitor
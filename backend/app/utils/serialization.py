@@ -0,0 +1,91 @@
+import json
+import logging
+from datetime import date, datetime, timezone
+from bson import ObjectId, Decimal128
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional: the stdlib encoder produces the same JSON, slower
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+if orjson is not None:
+    # PyMongo returns naive datetimes in UTC
+    ORJSON_OPTIONS = orjson.OPT_NAIVE_UTC | orjson.OPT_NON_STR_KEYS
+
+
+def mongo_default(obj):
+    """Encode the BSON and Python types JSON doesn't have.
+
+    ObjectIds become strings, datetimes ISO 8601 in UTC (naive ones are
+    taken as UTC, as PyMongo returns them) and Decimal128 a decimal string.
+    Anything else gets Flask's default handling.
+    """
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, datetime):
+        if obj.tzinfo is None:
+            obj = obj.replace(tzinfo=timezone.utc)
+        return obj.isoformat()
+    if isinstance(obj, date):
+        return obj.isoformat()
+    if isinstance(obj, Decimal128):
+        return str(obj.to_decimal())
+    return DefaultJSONProvider.default(obj)
+
+
+class MongoJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider that encodes MongoDB documents directly.
+
+    Routes can return documents with ObjectIds and datetimes as they come
+    from PyMongo. Uses orjson when it is installed and falls back to the
+    standard library for anything orjson refuses (e.g. integers over 64
+    bits). Keys keep their document order.
+    """
+
+    default = staticmethod(mongo_default)
+    sort_keys = False
+
+    def _pretty(self):
+        return self.compact is False or (self.compact is None and self._app.debug)
+
+    def encode(self, obj, pretty=False):
+        """Serialize ``obj`` to UTF-8 JSON bytes."""
+        if orjson is not None:
+            options = ORJSON_OPTIONS | (orjson.OPT_INDENT_2 if pretty else 0)
+            try:
+                return orjson.dumps(obj, default=mongo_default, option=options)
+            except (orjson.JSONEncodeError, TypeError) as e:
+                logger.debug(f"orjson could not encode the response, using json: {str(e)}")
+        return json.dumps(
+            obj,
+            default=mongo_default,
+            ensure_ascii=False,
+            sort_keys=self.sort_keys,
+            indent=2 if pretty else None,
+            separators=(",", ": ") if pretty else (",", ":")
+        ).encode("utf-8")
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            kwargs.setdefault("default", mongo_default)
+            kwargs.setdefault("ensure_ascii", self.ensure_ascii)
+            kwargs.setdefault("sort_keys", self.sort_keys)
+            return json.dumps(obj, **kwargs)
+        return self.encode(obj).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return json.loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.encode(obj, pretty=self._pretty()) + b"\n", mimetype=self.mimetype)
+
+
+def init_json(app):
+    """Serve JSON through :class:`MongoJSONProvider`."""
+    app.json = MongoJSONProvider(app)
@@ -0,0 +1,84 @@
+import re
+import logging
+from datetime import date, datetime
+from bson import Binary
+from app.models.conversation import ConversationHelper
+
+logger = logging.getLogger(__name__)
+
+# Bit of each symptom in a day's mask
+SYMPTOM_BITS = {name: 1 << bit for bit, name in enumerate(ConversationHelper.SYMPTOM_CATEGORIES)}
+# Set on every day with a check-in, so a day without symptoms differs from a day without a check-in
+CHECKED_IN = 0x80
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+DATE_KEY = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+
+def day_number(value):
+    """Days since 1970-01-01 of a date, datetime or YYYY-MM-DD string."""
+    if isinstance(value, str):
+        value = datetime.strptime(value, "%Y-%m-%d")
+    if isinstance(value, datetime):
+        value = value.date()
+    return value.toordinal() - EPOCH_ORDINAL
+
+
+def day_date(number):
+    return date.fromordinal(number + EPOCH_ORDINAL)
+
+
+def symptom_mask(states):
+    """One check-in's symptom states as a day mask."""
+    mask = CHECKED_IN
+    for name, state in (states or {}).items():
+        if isinstance(state, dict) and state.get("experienced"):
+            mask |= SYMPTOM_BITS.get(name, 0)
+    return mask
+
+
+def daily_masks(patient):
+    """``{day number: mask}`` for every check-in in a patient's symptom states.
+
+    Older patients store a single undated check-in, which is placed on the
+    day of their last conversation.
+    """
+    symptom_states = patient.get("symptom_states") or {}
+    dated = {key: states for key, states in symptom_states.items() if DATE_KEY.match(key)}
+    if dated:
+        return {day_number(key): symptom_mask(states) for key, states in dated.items()}
+    if symptom_states and patient.get("last_conversation_date"):
+        return {day_number(patient["last_conversation_date"]): symptom_mask(symptom_states)}
+    return {}
+
+
+def history_document(patient):
+    """A patient's symptom history: one mask byte per day from ``first_day`` on."""
+    masks = daily_masks(patient)
+    document = {"_id": patient["_id"], "first_day": None, "days": Binary(b""), "updated_at": datetime.utcnow()}
+    if masks:
+        first_day = min(masks)
+        days = bytearray(max(masks) - first_day + 1)
+        for day, mask in masks.items():
+            days[day - first_day] = mask
+        document["first_day"] = first_day
+        document["days"] = Binary(bytes(days))
+    return document
+
+
+def refresh_symptom_history(db, *patient_ids):
+    """Rewrite the symptom histories of patients after a write to their symptom states.
+
+    Failures are logged rather than raised so they never fail the write
+    that triggered them; the history catches up at the patient's next
+    check-in.
+    """
+    try:
+        patients = db.patients.find(
+            {"_id": {"$in": list(patient_ids)}},
+            {"symptom_states": 1, "last_conversation_date": 1}
+        )
+        for patient in patients:
+            db.symptom_history.replace_one({"_id": patient["_id"]}, history_document(patient), upsert=True)
+    except Exception as e:
+        logger.warning(f"Could not refresh the symptom history of patients {patient_ids}: {str(e)}")
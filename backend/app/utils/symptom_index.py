@@ -0,0 +1,124 @@
+import time
+import threading
+from datetime import datetime
+import numpy as np
+from app.utils.symptom_history import SYMPTOM_BITS, day_number, day_date
+
+MODES = ("any", "all", "count")
+MATCHES = ("any", "all")
+
+
+class InvalidSymptomQuery(ValueError):
+    """A symptom query parameter that can't be used."""
+
+
+class SymptomCohortIndex:
+    """Daily symptom masks of the whole cohort as one NumPy matrix.
+
+    Row ``j`` is the day ``first_day + j``, column ``i`` patient
+    ``patient_ids[i]``; each cell is the day's mask from the symptom history
+    (0 when there was no check-in). Days are rows so a window of days is a
+    contiguous block, and a query is a few vectorized operations over it.
+    """
+
+    def __init__(self, patient_ids, masks, first_day):
+        self.patient_ids = patient_ids
+        self.masks = masks
+        self.first_day = first_day
+        self.last_day = first_day + masks.shape[0] - 1
+        self.loaded_at = time.monotonic()
+
+    @classmethod
+    def from_histories(cls, histories, last_day, days):
+        """Build the index of the ``days`` days up to ``last_day`` from symptom history documents."""
+        histories = list(histories)
+        first_day = last_day - days + 1
+        masks = np.zeros((len(histories), days), dtype=np.uint8)
+        patient_ids = []
+        for row, history in enumerate(histories):
+            patient_ids.append(str(history["_id"]))
+            start = history.get("first_day")
+            if start is None:
+                continue
+            data = np.frombuffer(history["days"], dtype=np.uint8)
+            low, high = max(start, first_day), min(start + len(data), last_day + 1)
+            if low < high:
+                masks[row, low - first_day:high - first_day] = data[low - start:high - start]
+        return cls(np.array(patient_ids), np.ascontiguousarray(masks.T), first_day)
+
+    @classmethod
+    def load(cls, db, days=365):
+        """Index every patient's history for the ``days`` days up to today (UTC)."""
+        histories = db.symptom_history.find({"first_day": {"$ne": None}}, {"first_day": 1, "days": 1})
+        return cls.from_histories(histories, day_number(datetime.utcnow()), days)
+
+    def is_fresh(self, max_age):
+        return time.monotonic() - self.loaded_at < max_age and self.last_day == day_number(datetime.utcnow())
+
+    @property
+    def nbytes(self):
+        return self.masks.nbytes + self.patient_ids.nbytes
+
+    def query(self, symptoms, window=7, mode="count", min_days=1, match="any", end_day=None):
+        """Patients whose check-ins report ``symptoms`` on enough days of a window.
+
+        The window is the ``window`` days ending on ``end_day`` (default the
+        index's last day). A day counts when it reports any of
+        ``symptoms`` (``match="any"``) or all of them (``match="all"``).
+        ``mode`` selects patients with at least one such day (``any``),
+        every day of the window (``all``) or at least ``min_days``
+        (``count``). Returns the matching patient IDs and their day counts.
+        """
+        if not symptoms:
+            raise InvalidSymptomQuery("at least one symptom is required")
+        unknown = [symptom for symptom in symptoms if symptom not in SYMPTOM_BITS]
+        if unknown:
+            raise InvalidSymptomQuery(f"unknown symptoms {', '.join(unknown)}; expected {', '.join(SYMPTOM_BITS)}")
+        if mode not in MODES:
+            raise InvalidSymptomQuery(f"mode must be one of {', '.join(MODES)}")
+        if match not in MATCHES:
+            raise InvalidSymptomQuery(f"match must be one of {', '.join(MATCHES)}")
+        if window < 1:
+            raise InvalidSymptomQuery("window must be at least 1 day")
+        end_day = self.last_day if end_day is None else end_day
+        if end_day - window + 1 < self.first_day or end_day > self.last_day:
+            raise InvalidSymptomQuery(
+                f"the window must fall between {day_date(self.first_day)} and {day_date(self.last_day)}"
+            )
+        if mode == "count" and min_days < 1:
+            raise InvalidSymptomQuery("min_days must be at least 1")
+
+        mask = np.uint8(sum(SYMPTOM_BITS[symptom] for symptom in set(symptoms)))
+        end = end_day - self.first_day + 1
+        selected = self.masks[end - window:end] & mask
+        hits = selected == mask if match == "all" else selected != 0
+        days = hits.sum(axis=0, dtype=np.uint16)
+
+        required = {"any": 1, "all": window, "count": min_days}[mode]
+        rows = np.flatnonzero(days >= required)
+        return self.patient_ids[rows].tolist(), days[rows].tolist()
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_symptom_index(db, days=365, max_age=300):
+    """This process's cohort index, reloaded from MongoDB once it is ``max_age`` seconds old.
+
+    While one request reloads a stale index, others keep answering from the
+    previous one instead of waiting.
+    """
+    global _index
+    index = _index
+    if index is not None and index.is_fresh(max_age) and index.masks.shape[0] == days:
+        return index
+    if not _index_lock.acquire(blocking=index is None):
+        return index
+    try:
+        if _index is not None and _index is not index:
+            return _index
+        _index = SymptomCohortIndex.load(db, days)
+        return _index
+    finally:
+        _index_lock.release()
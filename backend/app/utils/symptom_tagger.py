@@ -0,0 +1,258 @@
+import re
+import threading
+from app.models.conversation import ConversationHelper
+
+# Phrases that mean the patient is talking about a symptom
+SYMPTOM_TERMS = {
+    "Shortness of Breath": [
+        r"short(ness)? of breath", r"breathless", r"out of breath", r"winded",
+        r"(hard|difficult|trouble|struggl\w*) (to )?breath\w*", r"can'?t (catch my )?breath\w*"
+    ],
+    "Palpitation": [
+        r"palpitation\w*", r"heart (is |was |been )?(racing|pounding|fluttering|skipping|flutter\w*)",
+        r"racing heart\w*", r"skipp?(ed|ing) (a )?beats?", r"irregular heart\s?beat", r"flutter\w*"
+    ],
+    "Chest Discomfort": [
+        r"chest (pain|pressure|tightness|discomfort|hurts?|ache\w*)", r"tight(ness)? (in )?(my )?chest",
+        r"pain in (my )?chest", r"pressure (in|on) (my )?chest", r"angina"
+    ],
+    "Swelling": [
+        r"swell\w*", r"swollen", r"puff(y|iness)", r"edema", r"oedema", r"fluid retention"
+    ],
+    "Fatigue": [
+        r"tired\w*", r"fatigue\w*", r"exhaust\w*", r"worn out", r"no energy", r"low energy",
+        r"lack of energy", r"drained", r"weary"
+    ],
+    "Syncope": [
+        r"faint\w*", r"pass(ed)? out", r"black(ed)? out", r"light-?headed\w*", r"dizz\w*", r"syncope"
+    ]
+}
+
+# Broader cues for recognising which symptoms the assistant is asking about
+QUESTION_TERMS = {
+    "Shortness of Breath": [r"breath\w*"],
+    "Palpitation": [r"heart\s?beat", r"heart rate", r"racing", r"palpitation\w*", r"flutter\w*"],
+    "Chest Discomfort": [r"chest"],
+    "Swelling": [r"swell\w*", r"swollen", r"ankles?", r"feet", r"legs?"],
+    "Fatigue": [r"tired\w*", r"fatigue\w*", r"energy", r"exhaust\w*"],
+    "Syncope": [r"faint\w*", r"dizz\w*", r"light-?headed\w*", r"pass(ed)? out"]
+}
+
+NEGATION_CUES = re.compile(
+    r"\b(no|not|never|without|none|neither|nor|denies|haven'?t|hasn'?t|didn'?t|don'?t|doesn'?t|"
+    r"isn'?t|wasn'?t|aren'?t|weren'?t|can'?t say)\b"
+)
+HEDGE_CUES = re.compile(
+    r"\b(maybe|might|not sure|unsure|i guess|sort of|kind of|sometimes|perhaps|possibly|"
+    r"i don'?t know|hard to say|i think|not really sure|on and off)\b"
+)
+AFFIRMATIVE_ANSWER = re.compile(
+    r"^(yes|yeah|yep|yup|i have|i did|i do|i am|i was|a little|a bit|some|definitely|sure|unfortunately)\b"
+)
+NEGATIVE_ANSWER = re.compile(
+    r"^(no|nope|nah|not really|not at all|none|never|i haven'?t|i have not|i don'?t|i didn'?t|i'?m not|nothing)\b"
+)
+CLAUSE_BREAK = re.compile(r"[.;!?,]|\bbut\b|\bthough\b|\bhowever\b")
+QUESTION_SENTENCE = re.compile(r"[^.!?]*\?")
+
+# The conversation prompt has the model open every reply with a status line
+# per symptom, ended by this separator; only the text after it is the reply
+STATUS_HEADER_SEPARATOR = "=============="
+STATUS_HEADER_START = f"{ConversationHelper.SYMPTOM_CATEGORIES[0]}:"
+
+# Confidence of each kind of evidence
+EXPLICIT_CONFIDENCE = 0.9
+ANSWER_CONFIDENCE = 0.85
+HEDGED_CONFIDENCE = 0.5
+UNCLEAR_CONFIDENCE = 0.3
+
+# Words before a symptom term that can negate it
+NEGATION_WINDOW = 4
+
+_compiled_terms = {
+    symptom: re.compile(r"\b(" + "|".join(terms) + r")\b") for symptom, terms in SYMPTOM_TERMS.items()
+}
+_compiled_questions = {
+    symptom: re.compile(r"\b(" + "|".join(SYMPTOM_TERMS[symptom] + terms) + r")\b")
+    for symptom, terms in QUESTION_TERMS.items()
+}
+
+
+def normalize(text):
+    return " ".join(str(text or "").lower().replace("’", "'").split())
+
+
+def tag_message(text):
+    """
+    Tag a patient message with the symptoms it mentions.
+
+    Returns ``{symptom: (experienced, confidence)}``. A mention is negated
+    when a negation cue comes shortly before it in the same clause, and
+    gets a low confidence when the clause hedges.
+    """
+    tags = {}
+    for clause in CLAUSE_BREAK.split(normalize(text)):
+        for symptom, pattern in _compiled_terms.items():
+            match = pattern.search(clause)
+            if not match:
+                continue
+            before = clause[:match.start()].split()[-NEGATION_WINDOW:]
+            negated = bool(NEGATION_CUES.search(" ".join(before)))
+            confidence = HEDGED_CONFIDENCE if HEDGE_CUES.search(clause) else EXPLICIT_CONFIDENCE
+            previous = tags.get(symptom)
+            if previous and previous[0] != (not negated):
+                # Said both ways in one message: leave it to the LLM
+                tags[symptom] = (previous[0], UNCLEAR_CONFIDENCE)
+            elif not previous or confidence > previous[1]:
+                tags[symptom] = (not negated, confidence)
+    return tags
+
+
+def strip_status_header(text):
+    """An assistant reply without the symptom status header the model puts before it."""
+    text = str(text or "")
+    _, separator, reply = text.partition(STATUS_HEADER_SEPARATOR)
+    return reply.lstrip("=").strip() if separator else text
+
+
+def asked_symptoms(text):
+    """Symptoms an assistant message asks about: those named in one of its questions."""
+    questions = " ".join(QUESTION_SENTENCE.findall(normalize(strip_status_header(text))))
+    return {symptom for symptom, pattern in _compiled_questions.items() if pattern.search(questions)}
+
+
+def classify_answer(text):
+    """True/False for a plain yes or no answer, None otherwise."""
+    text = normalize(text)
+    if HEDGE_CUES.search(text):
+        return None
+    if NEGATIVE_ANSWER.match(text):
+        return False
+    if AFFIRMATIVE_ANSWER.match(text):
+        return True
+    return None
+
+
+class TaggingResult:
+    """Outcome of tagging one conversation.
+
+    ``resolved`` holds the symptom states settled locally, in the same shape
+    as the LLM analysis; ``uncertain`` lists the symptoms still to be
+    analyzed and ``messages`` the only conversation logs the LLM needs for them.
+    ``related`` has the IDs of the messages that bear on each symptom.
+    """
+
+    def __init__(self, resolved, uncertain, messages, related=None):
+        self.resolved = resolved
+        self.uncertain = uncertain
+        self.messages = messages
+        self.related = related or {}
+
+
+def tag_conversation(conversation_logs, min_confidence=0.8):
+    """
+    Settle each symptom locally where the evidence is clear.
+
+    A symptom is resolved only when the patient mentioned or denied it, or
+    answered a question about it, and every piece of that evidence agrees
+    with at least ``min_confidence``. Symptoms without evidence are left
+    uncertain along with conflicting, hedged or unrecognised answers, since
+    the rules may simply have missed how the patient put it; the LLM then
+    sees every patient turn, and turns the rules couldn't match go to the
+    LLM for every uncertain symptom. Only a conversation without patient
+    turns settles symptoms as not discussed.
+    """
+    evidence = {symptom: [] for symptom in ConversationHelper.SYMPTOM_CATEGORIES}
+    related = {symptom: set() for symptom in ConversationHelper.SYMPTOM_CATEGORIES}
+    # Patient turns, each with the assistant message before it
+    patient_turns = set()
+    unmatched = set()
+    last_question = None
+    last_assistant = None
+
+    for i, log in enumerate(conversation_logs):
+        content = log.get("content") or ""
+        if log.get("role") != "user":
+            topics = asked_symptoms(content)
+            last_question = (i, topics) if topics else None
+            last_assistant = i
+            continue
+
+        turn = {i} if last_assistant is None else {last_assistant, i}
+        patient_turns.update(turn)
+
+        tags = tag_message(content)
+        for symptom, (experienced, confidence) in tags.items():
+            evidence[symptom].append((experienced, confidence))
+            related[symptom].add(i)
+
+        answer = None
+        if last_question:
+            question_index, topics = last_question
+            answer = classify_answer(content)
+            for symptom in topics:
+                related[symptom].update((question_index, i))
+                if symptom in tags:
+                    continue
+                if answer is None:
+                    evidence[symptom].append((None, UNCLEAR_CONFIDENCE))
+                else:
+                    evidence[symptom].append((answer, ANSWER_CONFIDENCE))
+        if not tags and answer is None:
+            unmatched.update(turn)
+        last_question = None
+        last_assistant = None
+
+    resolved = {}
+    uncertain = []
+    for symptom in ConversationHelper.SYMPTOM_CATEGORIES:
+        found = evidence[symptom]
+        if not found:
+            if patient_turns:
+                uncertain.append(symptom)
+                related[symptom] |= patient_turns
+            else:
+                resolved[symptom] = {"experienced": False, "logs": []}
+            continue
+        verdicts = {experienced for experienced, _ in found}
+        if len(verdicts) == 1 and None not in verdicts and min(c for _, c in found) >= min_confidence:
+            logs = [str(conversation_logs[i].get("_id")) for i in sorted(related[symptom])]
+            resolved[symptom] = {"experienced": verdicts.pop(), "logs": logs}
+        else:
+            uncertain.append(symptom)
+            related[symptom] |= unmatched
+
+    related_ids = {
+        symptom: [str(conversation_logs[i].get("_id")) for i in sorted(indices)]
+        for symptom, indices in related.items()
+    }
+    needed = sorted(set().union(*(related[symptom] for symptom in uncertain))) if uncertain else []
+    return TaggingResult(resolved, uncertain, [conversation_logs[i] for i in needed], related_ids)
+
+
+_stats = {
+    "analyses": 0,
+    "resolved_locally": 0,
+    "symptoms_resolved": 0,
+    "symptoms_sent": 0
+}
+_stats_lock = threading.Lock()
+
+
+def record_tagging(result):
+    with _stats_lock:
+        _stats["analyses"] += 1
+        _stats["symptoms_resolved"] += len(result.resolved)
+        _stats["symptoms_sent"] += len(result.uncertain)
+        if not result.uncertain:
+            _stats["resolved_locally"] += 1
+
+
+def tagger_stats():
+    """How much analysis work the tagger has kept away from the LLM in this process."""
+    with _stats_lock:
+        stats = dict(_stats)
+    total_symptoms = stats["symptoms_resolved"] + stats["symptoms_sent"]
+    stats["resolved_locally_fraction"] = stats["resolved_locally"] / stats["analyses"] if stats["analyses"] else 0.0
+    stats["symptoms_resolved_fraction"] = stats["symptoms_resolved"] / total_symptoms if total_symptoms else 0.0
+    return stats
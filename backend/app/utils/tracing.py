@@ -0,0 +1,390 @@
+import os
+import re
+import json
+import time
+import queue
+import random
+import secrets
+import inspect
+import logging
+import functools
+import threading
+import urllib.request
+from contextlib import contextmanager
+from flask import request, g, has_app_context
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+# Span categories, each summarized as one Server-Timing metric
+REQUEST = "total"
+MONGO = "db"
+LLM = "llm"
+SERIALIZE = "serialize"
+APP = "app"
+
+TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+# Finished traces waiting for the exporter thread; dropped when it falls behind
+EXPORT_QUEUE_SIZE = 1000
+
+
+class Span:
+    __slots__ = ("name", "category", "span_id", "parent_id", "start_time", "started", "duration", "attributes", "error")
+
+    def __init__(self, name, category, parent_id=None, attributes=None):
+        self.name = name
+        self.category = category
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.start_time = time.time()
+        self.started = time.perf_counter()
+        self.duration = None
+        self.attributes = attributes or {}
+        self.error = None
+
+    def finish(self, duration=None, error=None):
+        self.duration = time.perf_counter() - self.started if duration is None else duration
+        self.error = error
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "category": self.category,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_time": self.start_time,
+            "duration_ms": round((self.duration or 0) * 1000, 3),
+            "attributes": self.attributes,
+            "error": self.error
+        }
+
+
+class Trace:
+    """The spans of one request, parented under the caller's span when a traceparent came in."""
+
+    def __init__(self, trace_id=None, parent_id=None, sampled=False):
+        self.trace_id = trace_id or secrets.token_hex(16)
+        self.parent_id = parent_id
+        self.sampled = sampled
+        self.spans = []
+        self.stack = []
+
+    @classmethod
+    def from_traceparent(cls, header, sample_rate):
+        """Continue the caller's trace, honoring its sampling decision, or start a new one."""
+        match = TRACEPARENT.match((header or "").strip().lower())
+        if match and match.group(1) != "0" * 32:
+            trace_id, parent_id, flags = match.groups()
+            return cls(trace_id, parent_id, sampled=bool(int(flags, 16) & 1))
+        return cls(sampled=random.random() < sample_rate)
+
+    def current_span_id(self):
+        return self.stack[-1].span_id if self.stack else self.parent_id
+
+    def start_span(self, name, category, **attributes):
+        span = Span(name, category, self.current_span_id(), attributes)
+        self.spans.append(span)
+        return span
+
+    def server_timing(self, total):
+        """Server-Timing header value: time per category (outermost spans only) and the total."""
+        totals = {}
+        counts = {}
+        ids = {span.span_id: span for span in self.spans}
+        for span in self.spans:
+            if span.category == REQUEST or span.duration is None:
+                continue
+            # A span inside one of the same category is already counted
+            parent = ids.get(span.parent_id)
+            while parent is not None and parent.category != span.category:
+                parent = ids.get(parent.parent_id)
+            if parent is not None:
+                continue
+            totals[span.category] = totals.get(span.category, 0.0) + span.duration
+            counts[span.category] = counts.get(span.category, 0) + 1
+
+        metrics = [
+            f'{category};dur={totals[category] * 1000:.1f};desc="n={counts[category]}"'
+            for category in (MONGO, LLM, SERIALIZE, APP) if category in totals
+        ]
+        metrics.append(f"{REQUEST};dur={total * 1000:.1f}")
+        metrics.append(f'trace;desc="{self.trace_id}"')
+        return ", ".join(metrics)
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace_id,
+            "parent_id": self.parent_id,
+            "spans": [span.to_dict() for span in self.spans]
+        }
+
+
+def current_trace():
+    if not has_app_context():
+        return None
+    return g.get("trace")
+
+
+@contextmanager
+def span(name, category=APP, **attributes):
+    """Time a block as a span of the current request's trace; a no-op outside one."""
+    trace = current_trace()
+    if trace is None:
+        yield None
+        return
+
+    current = trace.start_span(name, category, **attributes)
+    trace.stack.append(current)
+    error = None
+    try:
+        yield current
+    except Exception as e:
+        error = str(e)
+        raise
+    finally:
+        current.finish(error=error)
+        # Generators finish in whatever order their consumers close them
+        if current in trace.stack:
+            trace.stack.remove(current)
+
+
+def traced(name, category=APP, attributes=()):
+    """Decorator recording each call as a span, with the named arguments as attributes.
+
+    Generator functions are timed from the first item until they're
+    exhausted or closed.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        def span_attributes(args, kwargs):
+            if not attributes:
+                return {}
+            bound = signature.bind_partial(*args, **kwargs).arguments
+            return {attribute: bound.get(attribute) for attribute in attributes}
+
+        if inspect.isgeneratorfunction(func):
+            @functools.wraps(func)
+            def generator(*args, **kwargs):
+                with span(name, category, **span_attributes(args, kwargs)):
+                    yield from func(*args, **kwargs)
+            return generator
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name, category, **span_attributes(args, kwargs)):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class MongoTracingListener(monitoring.CommandListener):
+    """Adds a span for every MongoDB command run while a request is being traced."""
+
+    def __init__(self):
+        self._spans = {}
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        trace = current_trace()
+        if trace is None:
+            return
+        collection = event.command.get(event.command_name)
+        if not isinstance(collection, str):
+            collection = event.command.get("collection", "")
+        current = trace.start_span(
+            f"mongo.{event.command_name}", MONGO,
+            collection=collection, database=event.database_name
+        )
+        with self._lock:
+            self._spans[(event.connection_id, event.request_id)] = current
+
+    def _finish(self, event, error=None):
+        with self._lock:
+            current = self._spans.pop((event.connection_id, event.request_id), None)
+        if current is not None:
+            current.finish(event.duration_micros / 1e6, error)
+
+    def succeeded(self, event):
+        self._finish(event)
+
+    def failed(self, event):
+        self._finish(event, str(event.failure))
+
+
+class JsonLinesExporter:
+    """Appends each sampled trace as one JSON line."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def export(self, trace):
+        with open(self.path, "a") as f:
+            f.write(json.dumps(trace.to_dict(), default=str) + "\n")
+
+
+class OTLPExporter:
+    """Posts traces as OTLP/HTTP JSON to a collector."""
+
+    def __init__(self, endpoint, service_name, timeout=2.0):
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.timeout = timeout
+
+    def _span(self, trace, span):
+        start = int(span.start_time * 1e9)
+        otlp = {
+            "traceId": trace.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            "kind": 2 if span.category == REQUEST else 3,
+            "startTimeUnixNano": str(start),
+            "endTimeUnixNano": str(start + int((span.duration or 0) * 1e9)),
+            "attributes": [
+                {"key": key, "value": {"stringValue": str(value)}}
+                for key, value in dict(span.attributes, category=span.category).items()
+            ],
+            "status": {"code": 2, "message": span.error} if span.error else {"code": 1}
+        }
+        if span.parent_id:
+            otlp["parentSpanId"] = span.parent_id
+        return otlp
+
+    def export(self, trace):
+        body = {"resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": self.service_name}}]},
+            "scopeSpans": [{
+                "scope": {"name": __name__},
+                "spans": [self._span(trace, span) for span in trace.spans]
+            }]
+        }]}
+        req = urllib.request.Request(
+            self.endpoint,
+            data=json.dumps(body).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+            method="POST"
+        )
+        with urllib.request.urlopen(req, timeout=self.timeout):
+            pass
+
+
+class TraceExportWorker:
+    """Exports finished traces from a background thread so requests never wait on it.
+
+    The thread is started by the first trace each process submits: the app
+    may be built in a preforking master, and threads don't survive the fork.
+    """
+
+    def __init__(self, exporter):
+        self.exporter = exporter
+        self.queue = None
+        self.dropped = 0
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _start(self):
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._lock:
+            if self._pid != pid:
+                self.queue = queue.Queue(maxsize=EXPORT_QUEUE_SIZE)
+                threading.Thread(target=self._run, args=(self.queue,), name="trace-export", daemon=True).start()
+                self._pid = pid
+
+    def submit(self, trace):
+        self._start()
+        try:
+            self.queue.put_nowait(trace)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self, traces):
+        while True:
+            trace = traces.get()
+            try:
+                self.exporter.export(trace)
+            except Exception as e:
+                logger.warning(f"Trace export failed: {str(e)}")
+
+
+def create_exporter(config):
+    kind = config.get("TRACE_EXPORTER", "jsonl")
+    if kind == "jsonl":
+        return JsonLinesExporter(config.get("TRACE_JSONL_PATH", "traces.jsonl"))
+    if kind == "otlp":
+        return OTLPExporter(
+            config.get("TRACE_OTLP_ENDPOINT", "http://localhost:4318/v1/traces"),
+            config.get("TRACE_SERVICE_NAME", "clinical-backend")
+        )
+    if kind != "none":
+        logger.warning(f"Unknown TRACE_EXPORTER {kind!r}; traces won't be exported")
+    return None
+
+
+_mongo_listener = None
+
+
+def register_mongo_tracing():
+    """Trace commands of every MongoClient created from now on. Safe to call more than once."""
+    global _mongo_listener
+    if _mongo_listener is None:
+        _mongo_listener = MongoTracingListener()
+        monitoring.register(_mongo_listener)
+
+
+def init_tracing(app):
+    """
+    Trace every request and report its time breakdown in a Server-Timing header.
+
+    Incoming ``traceparent`` headers are continued; otherwise a trace is
+    sampled for export at ``TRACE_SAMPLE_RATE``. The header is set on every
+    response either way. Streamed responses carry the breakdown up to the
+    first byte; spans after that are still exported.
+    """
+    if not app.config.get("TRACING_ENABLED", True):
+        return
+
+    exporter = create_exporter(app.config)
+    worker = TraceExportWorker(exporter) if exporter else None
+    sample_rate = app.config.get("TRACE_SAMPLE_RATE", 0.05)
+
+    # Time JSON serialization whichever provider the app uses
+    respond = app.json.response
+
+    def traced_response(*args, **kwargs):
+        with span("json.response", SERIALIZE):
+            return respond(*args, **kwargs)
+    app.json.response = traced_response
+
+    @app.before_request
+    def start_trace():
+        trace = Trace.from_traceparent(request.headers.get("traceparent"), sample_rate)
+        root = trace.start_span(
+            f"{request.method} {request.path}", REQUEST,
+            method=request.method, path=request.path
+        )
+        trace.stack.append(root)
+        g.trace = trace
+
+    @app.after_request
+    def add_server_timing(response):
+        trace = g.get("trace")
+        if trace is not None and trace.stack:
+            root = trace.stack[0]
+            if request.url_rule:
+                root.name = f"{request.method} {request.url_rule.rule}"
+            root.attributes["status"] = response.status_code
+            response.headers["Server-Timing"] = trace.server_timing(time.perf_counter() - root.started)
+            response.headers["traceparent"] = f"00-{trace.trace_id}-{root.span_id}-{'01' if trace.sampled else '00'}"
+        return response
+
+    @app.teardown_request
+    def finish_trace(error=None):
+        trace = g.pop("trace", None)
+        if trace is None or not trace.stack:
+            return
+        trace.stack[0].finish(error=str(error) if error else None)
+        if trace.sampled and worker is not None:
+            worker.submit(trace)
@@ -0,0 +1,89 @@
+"""
+Gunicorn settings for production serving.
+
+Usage: gunicorn -c gunicorn.conf.py wsgi:application
+
+Workers are forked from the master and each opens its own MongoDB and
+OpenAI clients in ``post_worker_init``. On SIGTERM a worker fails
+``/api/ready``, hands the job runner lease to another process and finishes
+its in-flight requests within ``graceful_timeout`` before exiting.
+
+Set ``PROMETHEUS_MULTIPROC_DIR`` to aggregate ``/metrics`` across workers.
+"""
+import os
+import shutil
+import signal
+from dotenv import load_dotenv
+
+load_dotenv()
+
+bind = os.getenv("WEB_BIND", f"0.0.0.0:{os.getenv('PORT', 5002)}")
+workers = int(os.getenv("WEB_WORKERS", 2 * (os.cpu_count() or 1) + 1))
+# Threads per worker; requests mostly wait on OpenAI and MongoDB
+threads = int(os.getenv("WEB_THREADS", 8))
+worker_class = "gthread"
+timeout = int(os.getenv("WEB_TIMEOUT", 120))
+graceful_timeout = int(os.getenv("WEB_GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.getenv("WEB_KEEPALIVE", 5))
+# Recycle workers now and then to bound memory growth
+max_requests = int(os.getenv("WEB_MAX_REQUESTS", 0))
+max_requests_jitter = int(os.getenv("WEB_MAX_REQUESTS_JITTER", 0))
+# Import the app once in the master so workers fork with it already loaded
+preload_app = os.getenv("WEB_PRELOAD", "true").lower() == "true"
+accesslog = os.getenv("WEB_ACCESS_LOG", "-")
+errorlog = "-"
+
+
+def on_starting(server):
+    # Stale metric files from a previous run would be summed into /metrics
+    multiproc_dir = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+    if multiproc_dir:
+        shutil.rmtree(multiproc_dir, ignore_errors=True)
+        os.makedirs(multiproc_dir, exist_ok=True)
+
+
+def _flask_app(worker):
+    """The worker's Flask app, or None if it failed to load."""
+    from flask import Flask
+    app = getattr(worker, "wsgi", None)
+    return app if isinstance(app, Flask) else None
+
+
+def post_worker_init(worker):
+    from app.utils.lifecycle import init_process, begin_drain
+
+    app = _flask_app(worker)
+    if app is None:
+        return
+    init_process(app)
+
+    handle_exit = worker.handle_exit
+
+    def drain_and_exit(sig, frame):
+        begin_drain(app)
+        handle_exit(sig, frame)
+
+    signal.signal(signal.SIGTERM, drain_and_exit)
+
+
+def worker_int(worker):
+    from app.utils.lifecycle import begin_drain
+    app = _flask_app(worker)
+    if app is not None:
+        begin_drain(app)
+
+
+def worker_exit(server, worker):
+    from app.utils.lifecycle import begin_drain
+    from app.utils.events import flush_events
+    app = _flask_app(worker)
+    if app is not None:
+        begin_drain(app)
+        # Events are written from a background thread; don't lose the last ones
+        flush_events()
+
+
+def child_exit(server, worker):
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
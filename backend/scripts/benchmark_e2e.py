@@ -0,0 +1,434 @@
+#!/usr/bin/env python
+"""
+Offline end-to-end benchmark of the backend.
+
+Starts the real app from ``create_app`` on a local port with in-process
+storage (mongomock, or a local mongod when one is running) and a fake
+OpenAI server with a configurable latency distribution, then runs a
+scripted scenario with concurrent clients over HTTP:
+
+  checkin      full Alexa check-ins: conversation turns, then session_end
+  dashboard    dashboard patient switches: list, details, charts, summary
+  session_end  session_end for patients with long conversation histories
+
+Reports throughput and p50/p95/p99 latency per endpoint, and saves the
+results under ``benchmark_results/`` so runs can be compared with --compare.
+
+Usage: python scripts/benchmark_e2e.py checkin --concurrency 8 --iterations 40
+"""
+import os
+import sys
+import json
+import math
+import time
+import random
+import argparse
+import threading
+import subprocess
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+import requests
+
+# Get the parent directory
+script_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(script_dir)
+# Add the parent directory to sys.path
+sys.path.insert(0, parent_dir)
+
+from scripts.fake_openai_server import add_latency_arguments, server_from_arguments
+
+RESULTS_DIR = os.path.join(parent_dir, "benchmark_results")
+PATIENTS_JSON = os.path.join(parent_dir, "..", "frontend", "src", "assets", "patients.json")
+API_KEY = "benchmark-key"
+
+# What a patient says through a check-in: a mix of turns the interview engine
+# answers locally and turns that need the LLM
+CHECKIN_MESSAGES = [
+    "I'm doing okay",
+    "No",
+    "Yes, I get a little short of breath when I climb the stairs",
+    "About three days now",
+    "No swelling",
+    "I'm a bit more tired than usual",
+    "No, not dizzy",
+    "No"
+]
+
+HISTORY_MESSAGES = [
+    ("bot", "How have you been feeling since we last spoke?"),
+    ("user", "Pretty good overall, a bit tired in the evenings."),
+    ("bot", "Have you had any trouble breathing?"),
+    ("user", "No, my breathing has been fine."),
+    ("bot", "Have you noticed any swelling in your legs or ankles?"),
+    ("user", "Maybe a little around my ankles at night.")
+]
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    # Nearest-rank percentile
+    index = min(len(sorted_values) - 1, max(0, math.ceil(p / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class Recorder:
+    """Latencies and errors per endpoint label, collected from all client threads."""
+
+    def __init__(self):
+        self.timings = {}
+        self.errors = {}
+        self.client_errors = {}
+        self._lock = threading.Lock()
+
+    def request(self, session, label, method, url, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = session.request(method, url, timeout=60, **kwargs)
+            # Include the body for streamed responses
+            response.content
+            status = response.status_code
+        except requests.RequestException:
+            response, status = None, None
+        self.record(label, time.perf_counter() - started, status)
+        return response
+
+    def record(self, label, seconds, status=200):
+        with self._lock:
+            self.timings.setdefault(label, []).append(seconds)
+            # Sample patients without charts get 404s, as they do in the dashboard
+            if status is None or status >= 500:
+                self.errors[label] = self.errors.get(label, 0) + 1
+            elif status >= 400:
+                self.client_errors[label] = self.client_errors.get(label, 0) + 1
+
+    def summary(self, wall_seconds):
+        endpoints = {}
+        for label, values in sorted(self.timings.items()):
+            values = sorted(values)
+            endpoints[label] = {
+                "count": len(values),
+                "errors": self.errors.get(label, 0),
+                "client_errors": self.client_errors.get(label, 0),
+                "throughput_rps": round(len(values) / wall_seconds, 2),
+                "mean_ms": round(sum(values) / len(values) * 1000, 2),
+                "p50_ms": round(percentile(values, 50) * 1000, 2),
+                "p95_ms": round(percentile(values, 95) * 1000, 2),
+                "p99_ms": round(percentile(values, 99) * 1000, 2),
+                "max_ms": round(values[-1] * 1000, 2)
+            }
+        return endpoints
+
+
+def local_mongod_uri(uri="mongodb://localhost:27017"):
+    """The URI of a local mongod if one answers quickly, else None."""
+    try:
+        from pymongo import MongoClient
+        client = MongoClient(uri, serverSelectionTimeoutMS=300)
+        client.admin.command("ping")
+        client.close()
+        return uri
+    except Exception:
+        return None
+
+
+def start_backend(args, openai_base_url):
+    """Create the real app against the chosen storage and serve it on a free local port."""
+    storage = args.storage
+    database = f"benchmark_{os.getpid()}"
+    mongo_uri = args.mongo_uri or (local_mongod_uri() if storage in ("auto", "mongod") else None)
+    if storage == "mongod" and not mongo_uri:
+        print("❌ No local mongod is running; use --storage mongomock or --mongo-uri")
+        sys.exit(1)
+    if storage == "auto":
+        storage = "mongod" if mongo_uri else "mongomock"
+
+    # The app reads its configuration from the environment at import time
+    os.environ["MONGO_URI"] = f"{(mongo_uri or 'mongodb://localhost:27017').rstrip('/')}/{database}"
+    os.environ["OPENAI_API_KEY"] = "benchmark"
+    os.environ["OPENAI_BASE_URL"] = openai_base_url
+    os.environ["ALEXA_API_KEY"] = API_KEY
+    os.environ["LLM_MEMO_MODE"] = "on" if args.memo else "off"
+    os.environ.setdefault("TRACE_EXPORTER", "none")
+
+    import app as app_package
+    from app.utils import lifecycle
+    if storage == "mongomock":
+        try:
+            import mongomock
+        except ImportError:
+            print("❌ mongomock is not installed (pip install mongomock) and no local mongod is running")
+            sys.exit(1)
+        lifecycle.MongoClient = mongomock.MongoClient
+
+    from werkzeug.serving import make_server
+    app = app_package.create_app()
+    app.debug = False
+    if not hasattr(app, "db"):
+        print("❌ The app could not connect to storage")
+        sys.exit(1)
+
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, name="benchmark-backend", daemon=True).start()
+    return app, server, f"http://127.0.0.1:{server.server_port}", storage
+
+
+def seed_dashboard(db, count):
+    """Dashboard patients cloned from the frontend's sample data."""
+    with open(PATIENTS_JSON) as f:
+        samples = json.load(f)
+    patients = []
+    for i in range(count):
+        patient = dict(samples[i % len(samples)])
+        patient["id"] = str(1000 + i)
+        patient["name"] = f"{patient['name']} {i}"
+        patients.append(patient)
+    db.patients.insert_many(patients)
+    return [patient["id"] for patient in patients]
+
+
+def seed_checkin_patients(db, count):
+    patients = [{
+        "name": f"Benchmark Patient {i}",
+        "alexa_user_id": f"benchmark-checkin-{i}",
+        "conversation_ended": False,
+        "symptom_states": {}
+    } for i in range(count)]
+    db.patients.insert_many(patients)
+    return [patient["alexa_user_id"] for patient in patients]
+
+
+def seed_long_histories(db, count, history):
+    """Patients with ``history`` conversation messages spread over past days."""
+    alexa_ids = []
+    now = datetime.utcnow()
+    for i in range(count):
+        patient = {
+            "name": f"Benchmark History {i}",
+            "alexa_user_id": f"benchmark-history-{i}",
+            "conversation_ended": False,
+            "symptom_states": {}
+        }
+        patient_id = str(db.patients.insert_one(patient).inserted_id)
+        logs = []
+        for j in range(history):
+            role, content = HISTORY_MESSAGES[j % len(HISTORY_MESSAGES)]
+            logs.append({
+                "patient_id": patient_id,
+                "role": role,
+                "content": content,
+                "created_at": now - timedelta(minutes=history - j)
+            })
+        db.conversation_logs.insert_many(logs)
+        alexa_ids.append(patient["alexa_user_id"])
+    return alexa_ids
+
+
+def run_checkin(session, base_url, recorder, alexa_id, stream=False):
+    url = f"{base_url}/api/alexa/user/{alexa_id}"
+    for message in CHECKIN_MESSAGES:
+        response = recorder.request(
+            session, "POST conversation", "POST",
+            f"{url}/conversation" + ("?stream=1" if stream else ""),
+            json={"content": message}
+        )
+        if response is None or response.status_code >= 400:
+            break
+        body = json.loads(response.text.strip().splitlines()[-1]) if stream else response.json()
+        if body.get("should_end"):
+            break
+    recorder.request(session, "POST session_end", "POST", f"{url}/session_end")
+
+
+def run_dashboard_switch(session, base_url, recorder, patient_id):
+    """What the dashboard loads when a clinician selects a patient."""
+    started = time.perf_counter()
+    response = recorder.request(session, "GET patient", "GET", f"{base_url}/api/patients/{patient_id}")
+    date = None
+    if response is not None and response.ok:
+        log_date = (response.json().get("conversationLog") or {}).get("date", "")
+        if "/" in log_date:
+            month, day, year = log_date.split("/")
+            date = f"{year}-{month.zfill(2)}-{day.zfill(2)}"
+    recorder.request(session, "GET wearable-data", "GET", f"{base_url}/api/patients/{patient_id}/wearable-data")
+    recorder.request(session, "GET risk-prediction", "GET", f"{base_url}/api/patients/{patient_id}/risk-prediction")
+    recorder.request(session, "GET available-dates", "GET", f"{base_url}/api/patients/{patient_id}/available-dates")
+    recorder.request(
+        session, "GET daily-summary", "GET", f"{base_url}/api/daily-summary/{patient_id}",
+        params={"date": date} if date else None
+    )
+    recorder.record("patient switch (total)", time.perf_counter() - started)
+
+
+def run_session_end(session, base_url, recorder, alexa_id):
+    recorder.request(session, "POST session_end", "POST", f"{base_url}/api/alexa/user/{alexa_id}/session_end")
+
+
+def run_scenario(args, app, base_url):
+    """Seed the scenario's data and run its iterations across ``concurrency`` clients."""
+    db = app.db
+    total = args.iterations + args.warmup
+    if args.scenario == "checkin":
+        targets = seed_checkin_patients(db, total)
+        step = lambda session, recorder, target: run_checkin(session, base_url, recorder, target, args.stream)
+    elif args.scenario == "dashboard":
+        patient_ids = seed_dashboard(db, args.patients)
+        # Every client loads the patient list once, then switches between patients
+        rng = random.Random(args.seed)
+        targets = [rng.choice(patient_ids) for _ in range(total)]
+        step = lambda session, recorder, target: run_dashboard_switch(session, base_url, recorder, target)
+    else:
+        print(f"Seeding {total} patients with {args.history} messages each...")
+        targets = seed_long_histories(db, total, args.history)
+        step = lambda session, recorder, target: run_session_end(session, base_url, recorder, target)
+
+    local = threading.local()
+
+    def client():
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+            local.session.headers.update({"X-API-Key": API_KEY, "Content-Type": "application/json"})
+            if args.scenario == "dashboard":
+                recorder.request(local.session, "GET patients", "GET", f"{base_url}/api/patients")
+        return local.session
+
+    if args.warmup:
+        recorder = Recorder()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            list(pool.map(lambda target: step(client(), recorder, target), targets[:args.warmup]))
+
+    recorder = Recorder()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(lambda target: step(client(), recorder, target), targets[args.warmup:]))
+    wall_seconds = time.perf_counter() - started
+
+    requests_made = sum(len(values) for label, values in recorder.timings.items() if "(total)" not in label)
+    return {
+        "wall_seconds": round(wall_seconds, 3),
+        "iterations_per_second": round(args.iterations / wall_seconds, 2),
+        "requests_per_second": round(requests_made / wall_seconds, 2),
+        "endpoints": recorder.summary(wall_seconds)
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=parent_dir, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return None
+
+
+def print_results(results):
+    print(f"\n📊 {results['scenario']} on {results['storage']}: "
+          f"{results['iterations_per_second']} iterations/s, {results['requests_per_second']} requests/s "
+          f"({results['settings']['concurrency']} clients, {results['wall_seconds']} s)")
+    print(f"{'endpoint':<26}{'count':>7}{'5xx':>6}{'4xx':>6}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for label, stats in results["endpoints"].items():
+        print(f"{label:<26}{stats['count']:>7}{stats['errors']:>6}{stats['client_errors']:>6}{stats['throughput_rps']:>9}"
+              f"{stats['p50_ms']:>10}{stats['p95_ms']:>10}{stats['p99_ms']:>10}")
+
+
+def latest_results(scenario, exclude=None):
+    if not os.path.isdir(RESULTS_DIR):
+        return None
+    candidates = sorted(
+        name for name in os.listdir(RESULTS_DIR)
+        if name.startswith(f"{scenario}-") and name.endswith(".json") and name != exclude
+    )
+    return os.path.join(RESULTS_DIR, candidates[-1]) if candidates else None
+
+
+def print_comparison(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\n🔁 Compared with {os.path.basename(baseline_path)} (commit {baseline.get('commit')}):")
+    print(f"{'endpoint':<26}{'p50 ms':>18}{'p95 ms':>18}{'p99 ms':>18}")
+    for label, stats in results["endpoints"].items():
+        before = baseline["endpoints"].get(label)
+        if not before:
+            continue
+        cells = []
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            change = (stats[key] - before[key]) / before[key] * 100 if before[key] else 0.0
+            cells.append(f"{before[key]:.0f}→{stats[key]:.0f} ({change:+.0f}%)")
+        print(f"{label:<26}" + "".join(f"{cell:>18}" for cell in cells))
+    change = (results["requests_per_second"] / baseline["requests_per_second"] - 1) * 100 if baseline["requests_per_second"] else 0.0
+    print(f"Throughput: {baseline['requests_per_second']} → {results['requests_per_second']} requests/s ({change:+.0f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline end-to-end benchmark with fake OpenAI and local storage')
+    parser.add_argument('scenario', choices=["checkin", "dashboard", "session_end"], help='Scenario to run')
+    parser.add_argument('--concurrency', type=int, default=4, help='Concurrent clients')
+    parser.add_argument('--iterations', type=int, default=20, help='Check-ins, patient switches or session ends to time')
+    parser.add_argument('--warmup', type=int, default=2, help='Untimed iterations first')
+    parser.add_argument('--patients', type=int, default=50, help='Dashboard patients to seed')
+    parser.add_argument('--history', type=int, default=2000, help='Conversation messages per patient for session_end')
+    parser.add_argument('--stream', action='store_true', help='Use streamed conversation turns')
+    parser.add_argument('--memo', action='store_true', help='Leave the LLM memo on')
+    parser.add_argument('--storage', choices=["auto", "mongomock", "mongod"], default="auto",
+                        help='mongomock, a local mongod, or whichever is available')
+    parser.add_argument('--mongo-uri', type=str, default=None, help='MongoDB server to use (a scratch database is created)')
+    parser.add_argument('--compare', nargs='?', const='latest', default=None,
+                        help='Compare with a saved result file (default: the previous run of this scenario)')
+    parser.add_argument('--no-save', action='store_true', help="Don't save the results")
+    add_latency_arguments(parser)
+    args = parser.parse_args()
+
+    fake_openai = server_from_arguments(args).start()
+    print(f"✅ Fake OpenAI at {fake_openai.base_url} (median {args.latency_ms} ms, sigma {args.latency_sigma})")
+    app, server, base_url, storage = start_backend(args, fake_openai.base_url)
+    print(f"✅ Backend at {base_url} using {storage}")
+
+    try:
+        outcome = run_scenario(args, app, base_url)
+    finally:
+        server.shutdown()
+        fake_openai.stop()
+        if storage == "mongod":
+            app.db.client.drop_database(app.db.name)
+
+    results = dict(
+        outcome,
+        scenario=args.scenario,
+        storage=storage,
+        commit=git_commit(),
+        timestamp=datetime.utcnow().isoformat(),
+        openai_requests=fake_openai.requests,
+        settings={
+            "concurrency": args.concurrency,
+            "iterations": args.iterations,
+            "warmup": args.warmup,
+            "patients": args.patients,
+            "history": args.history,
+            "stream": args.stream,
+            "memo": args.memo,
+            "latency_ms": args.latency_ms,
+            "latency_sigma": args.latency_sigma,
+            "ttft_fraction": args.ttft_fraction,
+            "error_rate": args.error_rate
+        }
+    )
+    print_results(results)
+
+    saved = None
+    if not args.no_save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        saved = f"{args.scenario}-{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}.json"
+        with open(os.path.join(RESULTS_DIR, saved), "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n💾 Saved to {os.path.join(RESULTS_DIR, saved)}")
+
+    if args.compare:
+        baseline = latest_results(args.scenario, exclude=saved) if args.compare == "latest" else args.compare
+        if baseline:
+            print_comparison(results, baseline)
+        else:
+            print("No earlier results to compare with")
+
+
+if __name__ == "__main__":
+    main()
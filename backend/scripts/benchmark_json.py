@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+"""
+Microbenchmark of JSON responses for patient documents.
+
+Compares the previous path (convert ``_id`` by hand, then Flask's default
+``jsonify``) with ``MongoJSONProvider`` using orjson and its standard
+library fallback, then measures gzip and brotli on the encoded bodies.
+
+Documents come from MongoDB with --mongo-uri (the ``patients``
+collection); otherwise the sample patients from the frontend plus
+synthetic cohort patients shaped like the stored documents.
+
+Usage: python scripts/benchmark_json.py --patients 200 --repeat 5
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+from datetime import datetime
+from bson import ObjectId
+from flask import Flask
+
+# Get the parent directory
+script_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(script_dir)
+# Add the parent directory to sys.path
+sys.path.insert(0, parent_dir)
+
+from app.utils import serialization, compression
+from app.utils.serialization import MongoJSONProvider
+
+SAMPLE_PATIENTS = os.path.join(parent_dir, "..", "frontend", "src", "assets", "patients.json")
+
+
+def load_documents(args):
+    if args.mongo_uri:
+        from pymongo import MongoClient
+        client = MongoClient(args.mongo_uri)
+        db = client.get_default_database(default="patient_data")
+        documents = list(db.patients.find().limit(args.patients))
+        print(f"📥 Loaded {len(documents)} patients from MongoDB")
+        return documents
+
+    from scripts.generate_cohort import generate_patient
+    with open(SAMPLE_PATIENTS) as f:
+        documents = json.load(f)
+    for document in documents:
+        # As stored by seed_database.py
+        document["_id"] = ObjectId()
+    end = datetime(2025, 1, 1)
+    documents += [generate_patient(args.seed, index, end, 2, args.checkins)[0] for index in range(args.patients)]
+    print(f"🧪 {len(documents)} patients: sample data plus generated cohort documents")
+    return documents
+
+
+def jsonify_by_hand(app, document):
+    """What the routes did before: copy, stringify ``_id``, then Flask's jsonify."""
+    document = dict(document)
+    if "_id" in document:
+        document["_id"] = str(document["_id"])
+    return app.json.response(document).get_data()
+
+
+def time_per_document(func, documents, repeat):
+    """Median over ``repeat`` passes of the mean time per document, in microseconds."""
+    # One untimed pass to warm caches
+    for document in documents:
+        func(document)
+    passes = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for document in documents:
+            func(document)
+        passes.append((time.perf_counter() - started) / len(documents))
+    return statistics.median(passes) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark JSON encoding and compression of patient documents')
+    parser.add_argument('--patients', type=int, default=200, help='Generated (or loaded) patients')
+    parser.add_argument('--checkins', type=float, default=20, help='Mean check-ins per generated patient')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed for generated patients')
+    parser.add_argument('--repeat', type=int, default=5, help='Timed passes over the documents')
+    parser.add_argument('--mongo-uri', type=str, default=None, help='Benchmark real documents from this MongoDB')
+    args = parser.parse_args()
+
+    documents = load_documents(args)
+
+    default_app = Flask("jsonify")
+    mongo_app = Flask("mongo_json")
+    mongo_app.json = MongoJSONProvider(mongo_app)
+
+    paths = [("jsonify + manual _id (before)", lambda document: jsonify_by_hand(default_app, document))]
+    if serialization.orjson is not None:
+        paths.append(("MongoJSONProvider (orjson)", lambda document: mongo_app.json.response(document).get_data()))
+    else:
+        print("⚠️  orjson is not installed; only the standard library path is measured")
+
+    def stdlib_response(document):
+        orjson, serialization.orjson = serialization.orjson, None
+        try:
+            return mongo_app.json.response(document).get_data()
+        finally:
+            serialization.orjson = orjson
+    paths.append(("MongoJSONProvider (json)", stdlib_response))
+
+    bodies = [mongo_app.json.response(document).get_data() for document in documents]
+    sizes = sorted(len(body) for body in bodies)
+    print(f"📏 Body size: median {sizes[len(sizes) // 2] / 1024:.1f} KiB, max {sizes[-1] / 1024:.1f} KiB")
+
+    print(f"\n{'encoder':<34}{'µs/doc':>10}{'MB/s':>10}{'speedup':>10}")
+    total_bytes = sum(len(body) for body in bodies)
+    baseline = None
+    with default_app.app_context(), mongo_app.app_context():
+        for name, func in paths:
+            per_document = time_per_document(func, documents, args.repeat)
+            baseline = baseline or per_document
+            throughput = total_bytes / len(documents) / per_document
+            print(f"{name:<34}{per_document:>10.1f}{throughput:>10.1f}{baseline / per_document:>9.2f}x")
+
+    encodings = [("gzip level 1", "gzip", {"gzip_level": 1}), ("gzip level 6", "gzip", {"gzip_level": 6})]
+    if compression.brotli is not None:
+        encodings += [("brotli quality 4", "br", {"brotli_quality": 4}), ("brotli quality 9", "br", {"brotli_quality": 9})]
+    else:
+        print("\n⚠️  brotli is not installed; only gzip is measured")
+
+    print(f"\n{'compression':<34}{'µs/doc':>10}{'ratio':>10}")
+    for name, encoding, options in encodings:
+        per_document = time_per_document(lambda body: compression.compress(body, encoding, **options), bodies, args.repeat)
+        compressed = sum(len(compression.compress(body, encoding, **options)) for body in bodies)
+        print(f"{name:<34}{per_document:>10.1f}{total_bytes / compressed:>9.2f}x")
+
+
+if __name__ == "__main__":
+    main()
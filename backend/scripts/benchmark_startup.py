@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+"""
+Startup benchmark and budget check for the backend.
+
+Starts the app in fresh interpreters and measures, per run:
+
+  import         importing the app package
+  create_app     building the app (blueprints, hooks, per-process clients)
+  first_request  the first GET /api/health
+  serving        from spawning the interpreter to the first response
+  ready          from the import until /api/ready answers 200 (warm-up done)
+
+Storage is mongomock unless a local mongod answers; --mongo-down points the
+app at a closed port to check that an outage doesn't stall boot. With
+--check the script exits with status 1 when a median exceeds its budget,
+so it can run in CI.
+
+Usage: python scripts/benchmark_startup.py --runs 5 --check
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+
+# Get the parent directory
+script_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(script_dir)
+# Add the parent directory to sys.path
+sys.path.insert(0, parent_dir)
+
+PHASES = ["import", "create_app", "first_request", "serving", "ready"]
+
+# Default budgets in ms, checked against the median of the runs
+BUDGETS = {
+    "import": 600,
+    "create_app": 300,
+    "first_request": 100,
+    "serving": 1500,
+    "ready": 5000
+}
+
+
+def measure(args):
+    """Run inside the child interpreter: time each startup phase and print them as JSON."""
+    storage = args.storage
+    if storage == "down":
+        os.environ["MONGO_URI"] = "mongodb://127.0.0.1:9/startup_benchmark"
+        os.environ["MONGO_SERVER_SELECTION_TIMEOUT_MS"] = "2000"
+    else:
+        os.environ["MONGO_URI"] = "mongodb://localhost:27017/startup_benchmark"
+    os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+    os.environ["TRACE_EXPORTER"] = "none"
+    os.environ["BACKGROUND_JOBS_ENABLED"] = "false"
+
+    timings = {}
+    started = time.perf_counter()
+    import app as app_package
+    timings["import"] = time.perf_counter() - started
+
+    if storage == "mongomock":
+        import mongomock
+        from app.utils import lifecycle
+        lifecycle.MongoClient = mongomock.MongoClient
+
+    phase_started = time.perf_counter()
+    app = app_package.create_app()
+    timings["create_app"] = time.perf_counter() - phase_started
+
+    client = app.test_client()
+    phase_started = time.perf_counter()
+    response = client.get("/api/health")
+    timings["first_request"] = time.perf_counter() - phase_started
+    if response.status_code != 200:
+        raise SystemExit(f"/api/health answered {response.status_code}")
+    print("serving", flush=True)
+
+    deadline = time.perf_counter() + args.ready_timeout
+    while time.perf_counter() < deadline:
+        if client.get("/api/ready").status_code == 200:
+            timings["ready"] = time.perf_counter() - started
+            break
+        time.sleep(0.01)
+
+    print(json.dumps({"timings": timings}))
+
+
+def run_child(args, storage):
+    command = [
+        sys.executable, os.path.abspath(__file__), "--child",
+        "--storage", storage, "--ready-timeout", str(args.ready_timeout)
+    ]
+    started = time.perf_counter()
+    child = subprocess.Popen(command, cwd=parent_dir, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    serving = None
+    lines = []
+    for line in child.stdout:
+        if line.strip() == "serving" and serving is None:
+            serving = time.perf_counter() - started
+        lines.append(line)
+    stderr = child.stderr.read()
+    if child.wait() != 0 or serving is None:
+        print("".join(lines) + stderr)
+        raise SystemExit("❌ Startup run failed")
+    run = json.loads(lines[-1])
+    run["timings"]["serving"] = serving
+    return run
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure backend startup time and check it against a budget')
+    parser.add_argument('--runs', type=int, default=5, help='Number of fresh interpreters to start')
+    parser.add_argument('--mongo-down', action='store_true', help='Point the app at a MongoDB that is not running')
+    parser.add_argument('--ready-timeout', type=float, default=10, help='Seconds to wait for /api/ready')
+    parser.add_argument('--check', action='store_true', help='Exit with status 1 if a median exceeds its budget')
+    for phase, budget in BUDGETS.items():
+        parser.add_argument(f'--budget-{phase.replace("_", "-")}-ms', type=float, default=budget,
+                            help=f'Budget for {phase} in ms (default {budget})')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--storage', choices=['mongod', 'mongomock', 'down'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        measure(args)
+        return
+
+    from scripts.benchmark_e2e import local_mongod_uri
+    if args.mongo_down:
+        storage = "down"
+    else:
+        storage = "mongod" if local_mongod_uri() else "mongomock"
+
+    runs = [run_child(args, storage) for _ in range(args.runs)]
+    print(f"\n🚀 Startup over {args.runs} runs ({storage} storage)")
+    print(f"{'phase':<16}{'median ms':>12}{'max ms':>10}{'budget ms':>12}")
+
+    over_budget = []
+    for phase in PHASES:
+        values = [run["timings"][phase] * 1000 for run in runs if phase in run["timings"]]
+        budget = getattr(args, f"budget_{phase}_ms", None)
+        if not values:
+            print(f"{phase:<16}{'-':>12}{'-':>10}{'':>12}   (never reached)")
+            continue
+        median = statistics.median(values)
+        flag = ""
+        if budget is not None and median > budget:
+            over_budget.append(phase)
+            flag = "  ❌ over budget"
+        print(f"{phase:<16}{median:>12.1f}{max(values):>10.1f}{budget if budget is not None else '':>12}{flag}")
+
+    if args.check:
+        if over_budget:
+            print(f"\n❌ Startup over budget: {', '.join(over_budget)}")
+            sys.exit(1)
+        print("\n✅ Startup within budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+import os
+import sys
+import json
+import time
+import argparse
+from collections import defaultdict
+from statistics import median
+from bson import ObjectId
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+
+# Get the parent directory
+script_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(script_dir)
+# Add the parent directory to sys.path
+sys.path.insert(0, parent_dir)
+
+# Load environment variables from .env file
+load_dotenv(os.path.join(parent_dir, '.env'))
+
+from app.models.conversation import ConversationHelper
+from app.utils.openai_utils import build_analysis_messages, analysis_response_format, parse_symptom_analysis
+
+parser = argparse.ArgumentParser(
+    description='Compare prompt/completion size and latency of the legacy and compact symptom analysis formats'
+)
+parser.add_argument('--file', help='JSON file with a list of transcripts, each a list of {"role", "content"} messages')
+parser.add_argument('--from-db', type=int, default=0, metavar='N',
+                    help='Use the N most recent patient-days of conversation_logs from MONGO_URI')
+parser.add_argument('--live', action='store_true', help='Also call OpenAI with both formats and compare real usage and latency')
+parser.add_argument('--model', default='gpt-4o', help='Model used for both formats in --live mode')
+args = parser.parse_args()
+
+with open(os.path.join(script_dir, 'legacy_key_questions_prompt.txt')) as f:
+    LEGACY_PROMPT = f.read()
+
+SAMPLE_TRANSCRIPT = [
+    {"role": "bot", "content": "Good morning! How are you feeling today?"},
+    {"role": "user", "content": "Not too bad, a bit tired though."},
+    {"role": "bot", "content": "I'm sorry to hear you're tired. Has the fatigue been worse than usual?"},
+    {"role": "user", "content": "Yes, I had to sit down after walking to the mailbox."},
+    {"role": "bot", "content": "Did you feel short of breath when that happened?"},
+    {"role": "user", "content": "A little, yes. It passed after a few minutes."},
+    {"role": "bot", "content": "Have you noticed any swelling in your ankles or feet?"},
+    {"role": "user", "content": "No, no swelling."},
+    {"role": "bot", "content": "Any chest pain, pressure or racing heartbeat?"},
+    {"role": "user", "content": "No chest pain. My heart felt fine."},
+    {"role": "bot", "content": "Have you felt dizzy or like you might faint?"},
+    {"role": "user", "content": "No, nothing like that."},
+    {"role": "bot", "content": "Thank you for checking in today. Please rest and call your care team if the breathlessness gets worse."}
+]
+
+def count_tokens(text):
+    """Token count with tiktoken if it's installed, otherwise about four characters per token."""
+    try:
+        import tiktoken
+        return len(tiktoken.get_encoding("o200k_base").encode(text))
+    except ImportError:
+        return len(text) // 4
+
+def as_logs(transcript):
+    """Give recorded messages the IDs and timestamps stored conversation logs have."""
+    started = datetime.utcnow()
+    return [
+        {
+            "_id": message.get("_id") or ObjectId(),
+            "role": message["role"],
+            "content": message["content"],
+            "created_at": message.get("created_at") or started + timedelta(seconds=10 * i)
+        }
+        for i, message in enumerate(transcript)
+    ]
+
+def legacy_messages(conversation_logs):
+    """The analysis request as it was sent before the compact format."""
+    formatted_conversation = [
+        {
+            "id": str(log.get("_id")),
+            "role": log.get("role"),
+            "content": log.get("content"),
+            "created_at": log.get("created_at").isoformat() if log.get("created_at") else None
+        }
+        for log in conversation_logs
+    ]
+    return [
+        {"role": "system", "content": LEGACY_PROMPT},
+        {"role": "user", "content": f"Here is the conversation to analyze: {json.dumps(formatted_conversation)}"}
+    ]
+
+def legacy_output(symptom_analysis):
+    """What the legacy format asks the model to write back: full ObjectIds in every list."""
+    return json.dumps(symptom_analysis, indent=2)
+
+def compact_output(symptom_analysis, message_ids):
+    numbers = {message_id: i + 1 for i, message_id in enumerate(message_ids)}
+    return json.dumps({
+        symptom: {"experienced": state["experienced"], "logs": [numbers[log] for log in state["logs"]]}
+        for symptom, state in symptom_analysis.items()
+    })
+
+def load_transcripts():
+    if args.file:
+        with open(args.file) as f:
+            return json.load(f)
+    if args.from_db:
+        from pymongo import MongoClient, DESCENDING
+        client = MongoClient(os.getenv("MONGO_URI"))
+        db = client.get_default_database()
+        days = defaultdict(list)
+        for log in db.conversation_logs.find().sort("created_at", DESCENDING).limit(args.from_db * 50):
+            key = (log["patient_id"], log["created_at"].strftime('%Y-%m-%d'))
+            if key in days or len(days) < args.from_db:
+                days[key].append(log)
+        return [sorted(logs, key=lambda log: log["created_at"]) for logs in days.values()]
+    return [SAMPLE_TRANSCRIPT]
+
+def run_live(client, messages, **params):
+    started = time.perf_counter()
+    response = client.chat.completions.create(model=args.model, messages=messages, temperature=0, **params)
+    return time.perf_counter() - started, response
+
+def main():
+    transcripts = load_transcripts()
+    print(f"Benchmarking {len(transcripts)} transcript(s)")
+
+    totals = defaultdict(int)
+    latencies = defaultdict(list)
+    client = None
+    if args.live:
+        from openai import OpenAI
+        client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+    for transcript in transcripts:
+        conversation_logs = as_logs(transcript)
+        compact, message_ids = build_analysis_messages(conversation_logs)
+        legacy = legacy_messages(conversation_logs)
+
+        # Estimate output size from the same answer written in each format
+        expected = {symptom: {"experienced": False, "logs": message_ids[:3]}
+                    for symptom in ConversationHelper.SYMPTOM_CATEGORIES}
+        totals["legacy_prompt"] += sum(count_tokens(m["content"]) for m in legacy)
+        totals["compact_prompt"] += sum(count_tokens(m["content"]) for m in compact)
+        totals["legacy_completion"] += count_tokens(legacy_output(expected))
+        totals["compact_completion"] += count_tokens(compact_output(expected, message_ids))
+
+        if client:
+            duration, response = run_live(client, legacy, max_tokens=1000)
+            latencies["legacy"].append(duration)
+            totals["legacy_prompt_actual"] += response.usage.prompt_tokens
+            totals["legacy_completion_actual"] += response.usage.completion_tokens
+
+            duration, response = run_live(client, compact, max_tokens=500, response_format=analysis_response_format())
+            latencies["compact"].append(duration)
+            totals["compact_prompt_actual"] += response.usage.prompt_tokens
+            totals["compact_completion_actual"] += response.usage.completion_tokens
+            # Make sure the answer maps back cleanly
+            parse_symptom_analysis(response.choices[0].message.content, message_ids)
+
+    def report(label, legacy_key, compact_key):
+        legacy_tokens, compact_tokens = totals[legacy_key], totals[compact_key]
+        saved = 1 - compact_tokens / legacy_tokens if legacy_tokens else 0
+        print(f"  {label:<28} legacy {legacy_tokens:>8}  compact {compact_tokens:>8}  saved {saved:6.1%}")
+
+    print("\nEstimated tokens:")
+    report("prompt", "legacy_prompt", "compact_prompt")
+    report("completion", "legacy_completion", "compact_completion")
+
+    if client:
+        print("\nActual usage reported by OpenAI:")
+        report("prompt", "legacy_prompt_actual", "compact_prompt_actual")
+        report("completion", "legacy_completion_actual", "compact_completion_actual")
+        print("\nLatency (seconds):")
+        for name in ("legacy", "compact"):
+            values = sorted(latencies[name])
+            print(f"  {name:<8} median {median(values):.2f}  max {values[-1]:.2f}")
+
+if __name__ == "__main__":
+    main()
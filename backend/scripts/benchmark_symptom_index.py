@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+"""
+Benchmark of cohort symptom queries over the per-day symptom bitmasks.
+
+Generates a cohort of --patients patients with --days days of check-ins
+(each day checked in with --checkin-rate, each symptom reported with
+--symptom-rate) and measures:
+
+  storage    BSON size per patient of the nested ``symptom_states`` map
+             against the packed history (one mask byte per day)
+  baseline   answering a query by walking every patient's nested map, as a
+             query over ``patients`` had to; timed on --baseline-patients
+             and scaled to the cohort
+  build      building the in-memory index from the history documents
+  queries    windowed count/any/all queries on the index
+
+The baseline and the index are checked to select the same patients. With
+--mongo-uri the index is also loaded from that MongoDB's
+``symptom_history`` collection.
+
+Usage: python scripts/benchmark_symptom_index.py --patients 100000 --days 365
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+from datetime import datetime
+import numpy as np
+import bson
+from bson import ObjectId, Binary
+
+# Get the parent directory
+script_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(script_dir)
+# Add the parent directory to sys.path
+sys.path.insert(0, parent_dir)
+
+from app.utils.symptom_history import SYMPTOM_BITS, CHECKED_IN, day_number, day_date
+from app.utils.symptom_index import SymptomCohortIndex
+
+QUERIES = [
+    ("Palpitation on >= 3 of the last 7 days", {"symptoms": ["Palpitation"], "window": 7, "min_days": 3}),
+    ("any Syncope in the last 30 days", {"symptoms": ["Syncope"], "window": 30, "mode": "any"}),
+    ("Fatigue every day of the last 7", {"symptoms": ["Fatigue"], "window": 7, "mode": "all"}),
+    ("Palpitation with Chest Discomfort >= 2 of 30", {
+        "symptoms": ["Palpitation", "Chest Discomfort"], "window": 30, "min_days": 2, "match": "all"
+    }),
+    ("Shortness of Breath on >= 60 of 365 days", {"symptoms": ["Shortness of Breath"], "window": 365, "min_days": 60})
+]
+
+
+def generate_masks(args):
+    """Random day masks, one row per patient."""
+    rng = np.random.default_rng(args.seed)
+    checked_in = rng.random((args.patients, args.days)) < args.checkin_rate
+    masks = np.where(checked_in, CHECKED_IN, 0).astype(np.uint8)
+    for bit in SYMPTOM_BITS.values():
+        reported = rng.random((args.patients, args.days)) < args.symptom_rate
+        masks |= np.where(checked_in & reported, bit, 0).astype(np.uint8)
+    return masks
+
+
+def symptom_states(row, first_day):
+    """The nested ``symptom_states`` map a row of masks stands for."""
+    states = {}
+    for offset in np.flatnonzero(row):
+        states[day_date(first_day + int(offset)).isoformat()] = {
+            name: {"experienced": bool(row[offset] & bit), "logs": []} for name, bit in SYMPTOM_BITS.items()
+        }
+    return states
+
+
+def query_nested(patients, symptoms, window, last_day, min_days):
+    """What a query over the patient documents does: walk each patient's dated map."""
+    first = day_date(last_day - window + 1).isoformat()
+    last = day_date(last_day).isoformat()
+    selected = []
+    for patient in patients:
+        days = 0
+        for date, states in patient["symptom_states"].items():
+            if first <= date <= last and any(states.get(symptom, {}).get("experienced") for symptom in symptoms):
+                days += 1
+        if days >= min_days:
+            selected.append(str(patient["_id"]))
+    return selected
+
+
+def median_time(func, repeat):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - started)
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark cohort symptom queries on the bitmask index')
+    parser.add_argument('--patients', type=int, default=100000, help='Patients in the cohort')
+    parser.add_argument('--days', type=int, default=365, help='Days of history per patient')
+    parser.add_argument('--checkin-rate', type=float, default=0.7, help='Share of days with a check-in')
+    parser.add_argument('--symptom-rate', type=float, default=0.15, help='Chance a symptom is reported at a check-in')
+    parser.add_argument('--baseline-patients', type=int, default=2000, help='Patients the nested-map baseline walks')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed')
+    parser.add_argument('--repeat', type=int, default=7, help='Timed runs per query')
+    parser.add_argument('--mongo-uri', type=str, default=None, help='Also time loading the index from this MongoDB')
+    args = parser.parse_args()
+
+    last_day = day_number(datetime.utcnow())
+    first_day = last_day - args.days + 1
+
+    started = time.perf_counter()
+    masks = generate_masks(args)
+    histories = [
+        {"_id": ObjectId(), "first_day": first_day, "days": Binary(row.tobytes())}
+        for row in masks
+    ]
+    print(f"🧪 {args.patients} patients x {args.days} days generated in {time.perf_counter() - started:.1f} s")
+
+    sample = [
+        {"_id": history["_id"], "symptom_states": symptom_states(masks[row], first_day)}
+        for row, history in enumerate(histories[:args.baseline_patients])
+    ]
+    nested_bytes = statistics.mean(len(bson.encode({"symptom_states": patient["symptom_states"]})) for patient in sample)
+    packed_bytes = statistics.mean(len(bson.encode(history)) for history in histories[:args.baseline_patients])
+    print(f"\n💾 Per patient: nested map {nested_bytes / 1024:.1f} KiB, packed history {packed_bytes / 1024:.2f} KiB "
+          f"({nested_bytes / packed_bytes:.0f}x smaller)")
+
+    build_time = median_time(lambda: SymptomCohortIndex.from_histories(histories, last_day, args.days), 3)
+    index = SymptomCohortIndex.from_histories(histories, last_day, args.days)
+    print(f"🏗️  Index built in {build_time * 1000:.0f} ms, {index.nbytes / 2**20:.1f} MiB in memory")
+
+    if args.mongo_uri:
+        from pymongo import MongoClient
+        db = MongoClient(args.mongo_uri).get_default_database(default="patient_data")
+        load_time = median_time(lambda: SymptomCohortIndex.load(db, args.days), 3)
+        print(f"📥 Loaded {len(SymptomCohortIndex.load(db, args.days).patient_ids)} histories from MongoDB in {load_time * 1000:.0f} ms")
+
+    # Baseline against the index over the same patients
+    name, query = QUERIES[0]
+    sample_index = SymptomCohortIndex.from_histories(histories[:args.baseline_patients], last_day, args.days)
+    expected, _ = sample_index.query(**query)
+    found = query_nested(sample, query["symptoms"], query["window"], last_day, query["min_days"])
+    if sorted(found) != sorted(expected):
+        raise SystemExit("❌ The index and the nested maps disagree")
+    nested_time = median_time(
+        lambda: query_nested(sample, query["symptoms"], query["window"], last_day, query["min_days"]), 3
+    )
+    scaled = nested_time * args.patients / len(sample)
+    print(f"\n🐢 Nested maps, '{name}': {nested_time * 1000:.0f} ms for {len(sample)} patients, "
+          f"~{scaled * 1000:.0f} ms for {args.patients} (excluding loading them from MongoDB)")
+
+    print(f"\n{'query':<48}{'median ms':>11}{'matches':>10}")
+    for name, query in QUERIES:
+        elapsed = median_time(lambda: index.query(**query), args.repeat)
+        matches = len(index.query(**query)[0])
+        print(f"{name:<48}{elapsed * 1000:>11.2f}{matches:>10}")
+
+    elapsed = median_time(lambda: index.query(**QUERIES[0][1]), args.repeat)
+    print(f"\n✅ '{QUERIES[0][0]}' is ~{scaled / elapsed:.0f}x faster on the index than walking the nested maps")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+import os
+import sys
+import argparse
+from collections import defaultdict
+from datetime import datetime, timedelta
+from pymongo import MongoClient, ASCENDING
+from dotenv import load_dotenv
+
+# Get the parent directory
+script_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(script_dir)
+# Add the parent directory to sys.path
+sys.path.insert(0, parent_dir)
+
+# Load environment variables from .env file
+load_dotenv(os.path.join(parent_dir, '.env'))
+
+from app.utils.symptom_tagger import tag_conversation
+
+parser = argparse.ArgumentParser(
+    description='Measure how often the local symptom tagger settles an analysis and how well it agrees with the LLM'
+)
+parser.add_argument('--days', type=int, default=90, help='How many days of recorded conversations to evaluate')
+parser.add_argument('--min-confidence', type=float, default=0.8, help='Tagger confidence threshold to evaluate')
+parser.add_argument('--llm', action='store_true',
+                    help='Re-run the LLM on each conversation as the reference instead of the stored symptom_states')
+args = parser.parse_args()
+
+def conversation_days(db, since):
+    """Yield (patient, date, logs) for each patient-day with stored symptom states."""
+    for patient in db.patients.find({"symptom_states": {"$exists": True}}, {"symptom_states": 1}):
+        for date, states in (patient.get("symptom_states") or {}).items():
+            try:
+                day = datetime.strptime(date, "%Y-%m-%d")
+            except ValueError:
+                continue
+            if day < since or not states:
+                continue
+            logs = list(db.conversation_logs.find({
+                "patient_id": str(patient["_id"]),
+                "created_at": {"$gte": day, "$lt": day + timedelta(days=1)}
+            }).sort("created_at", ASCENDING))
+            if logs:
+                yield patient, date, states, logs
+
+def main():
+    client = MongoClient(os.getenv("MONGO_URI"))
+    db = client.get_default_database()
+    since = datetime.utcnow() - timedelta(days=args.days)
+
+    analyze = None
+    app = None
+    if args.llm:
+        from app import create_app
+        from app.utils.openai_utils import analyze_symptoms_with_llm
+        app = create_app()
+        analyze = analyze_symptoms_with_llm
+
+    # Per ISO week: analyses, settled entirely locally, locally settled symptoms, agreeing symptoms
+    weeks = defaultdict(lambda: defaultdict(int))
+    disagreements = defaultdict(int)
+
+    for patient, date, stored, logs in conversation_days(db, since):
+        reference = stored
+        if analyze:
+            with app.app_context():
+                reference = analyze(logs)
+
+        result = tag_conversation(logs, args.min_confidence)
+        year, week, _ = datetime.strptime(date, "%Y-%m-%d").isocalendar()
+        counts = weeks[f"{year}-W{week:02d}"]
+        counts["analyses"] += 1
+        if not result.uncertain:
+            counts["local"] += 1
+        for symptom, state in result.resolved.items():
+            counts["symptoms"] += 1
+            if state["experienced"] == bool(reference.get(symptom, {}).get("experienced", False)):
+                counts["agree"] += 1
+            else:
+                disagreements[symptom] += 1
+
+    if not weeks:
+        print("No recorded conversations with symptom states found")
+        return
+
+    print(f"{'week':<10} {'analyses':>8} {'local':>7} {'agreement':>10}")
+    total = defaultdict(int)
+    for week in sorted(weeks):
+        counts = weeks[week]
+        for key, value in counts.items():
+            total[key] += value
+        agreement = counts["agree"] / counts["symptoms"] if counts["symptoms"] else 0
+        print(f"{week:<10} {counts['analyses']:>8} {counts['local'] / counts['analyses']:>7.1%} {agreement:>10.1%}")
+
+    print(f"\nResolved locally: {total['local']}/{total['analyses']} analyses ({total['local'] / total['analyses']:.1%})")
+    print(f"Agreement on locally settled symptoms: {total['agree'] / total['symptoms']:.1%}" if total["symptoms"] else "")
+    if disagreements:
+        print("Disagreements by symptom:")
+        for symptom, count in sorted(disagreements.items(), key=lambda item: -item[1]):
+            print(f"  {symptom}: {count}")
+
+if __name__ == "__main__":
+    main()
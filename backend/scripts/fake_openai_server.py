@@ -0,0 +1,235 @@
+#!/usr/bin/env python
+"""
+A local stand-in for the OpenAI chat completions API, for benchmarks.
+
+Answers ``POST /v1/chat/completions`` (plain and streamed) after a latency
+drawn from a log-normal distribution, with plausible token counts.
+Structured symptom analysis requests get a schema-valid answer, and
+conversation turns walk through the check-in questions before ending the
+conversation. Point the backend at it with ``OPENAI_BASE_URL``.
+
+Usage: python scripts/fake_openai_server.py --port 8099 --latency-ms 800
+"""
+import json
+import math
+import time
+import uuid
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CHECKIN_REPLIES = [
+    "I'm sorry to hear that. How long has that been going on?",
+    "Thank you for telling me. Have you noticed any swelling in your legs or ankles?",
+    "Okay. Are you feeling more tired than usual?",
+    "Have you felt lightheaded or dizzy recently?",
+    "Have you noticed your heart racing or beating irregularly?",
+    "Thank you for sharing how you've been feeling today. That's all my questions for now. Take care! CONVERSATION_END"
+]
+
+# Conversation replies start with a status header, as the system prompt asks
+STATUS_HEADER = "".join(
+    f"{symptom}: not discussed\n"
+    for symptom in ["Shortness of Breath", "Palpitation", "Chest Discomfort", "Swelling", "Fatigue", "Syncope"]
+) + "==============\n"
+
+SUMMARY_REPLY = (
+    "Vital signs were stable over the day with resting heart rate and oxygen saturation in the usual range. "
+    "The patient reported mild fatigue but no chest discomfort, swelling or dizziness. No action needed."
+)
+
+
+class LatencyModel:
+    """Log-normal latency with the given median (ms) and shape; ``sigma=0`` gives a fixed latency."""
+
+    def __init__(self, median_ms=800, sigma=0.4, ttft_fraction=0.3, seed=None):
+        self.median_ms = median_ms
+        self.sigma = sigma
+        self.ttft_fraction = ttft_fraction
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self):
+        with self._lock:
+            factor = math.exp(self._random.gauss(0, self.sigma)) if self.sigma else 1.0
+        return self.median_ms * factor / 1000
+
+
+def estimate_prompt_tokens(messages):
+    return sum(len(str(message.get("content") or "")) for message in messages) // 4 + 3 * len(messages)
+
+
+def fake_content(body):
+    """A reply shaped like what the backend expects for this kind of request."""
+    response_format = body.get("response_format") or {}
+    if response_format.get("type") == "json_schema":
+        properties = response_format["json_schema"]["schema"].get("properties", {})
+        return json.dumps({name: {"experienced": False, "logs": []} for name in properties})
+
+    messages = body.get("messages") or []
+    system = str(messages[0].get("content") or "") if messages else ""
+    if "summar" in system.lower():
+        return SUMMARY_REPLY
+    turns = sum(1 for message in messages if message.get("role") == "assistant")
+    return STATUS_HEADER + CHECKIN_REPLIES[min(turns, len(CHECKIN_REPLIES) - 1)]
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self.send_error(404)
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}")
+        server = self.server
+        server.count_request()
+
+        latency = server.latency.sample()
+        content = fake_content(body)
+        prompt_tokens = estimate_prompt_tokens(body.get("messages") or [])
+        completion_tokens = max(1, len(content) // 4)
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens
+        }
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        created = int(time.time())
+        model = body.get("model", "gpt-4o")
+
+        if server.error_rate and random.random() < server.error_rate:
+            time.sleep(latency)
+            self._send_json(500, {"error": {"message": "Injected failure", "type": "server_error"}})
+            return
+
+        if not body.get("stream"):
+            time.sleep(latency)
+            self._send_json(200, {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop"
+                }],
+                "usage": usage
+            })
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        words = content.split(" ")
+        ttft = latency * server.latency.ttft_fraction
+        per_word = (latency - ttft) / max(len(words), 1)
+        time.sleep(ttft)
+        for i, word in enumerate(words):
+            if i:
+                time.sleep(per_word)
+            self._send_event({
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": {"content": word if i == 0 else " " + word}, "finish_reason": None}]
+            })
+        self._send_event({
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]
+        })
+        if (body.get("stream_options") or {}).get("include_usage"):
+            self._send_event({
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [],
+                "usage": usage
+            })
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+    def _send_json(self, status, payload):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_event(self, payload):
+        self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode("utf-8"))
+        self.wfile.flush()
+
+
+class FakeOpenAIServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0, latency=None, error_rate=0.0):
+        super().__init__((host, port), FakeOpenAIHandler)
+        self.latency = latency or LatencyModel()
+        self.error_rate = error_rate
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def count_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, name="fake-openai", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def add_latency_arguments(parser):
+    parser.add_argument('--latency-ms', type=float, default=800, help='Median fake OpenAI latency in ms')
+    parser.add_argument('--latency-sigma', type=float, default=0.4, help='Log-normal shape of the latency (0 for fixed)')
+    parser.add_argument('--ttft-fraction', type=float, default=0.3, help='Share of the latency before the first streamed token')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Share of fake OpenAI calls that fail')
+    parser.add_argument('--seed', type=int, default=None, help='Random seed for latencies')
+
+
+def server_from_arguments(args, port=0):
+    latency = LatencyModel(args.latency_ms, args.latency_sigma, args.ttft_fraction, seed=args.seed)
+    return FakeOpenAIServer(port=port, latency=latency, error_rate=args.error_rate)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Run a fake OpenAI chat completions server')
+    parser.add_argument('--port', type=int, default=8099, help='Port to listen on')
+    add_latency_arguments(parser)
+    args = parser.parse_args()
+
+    server = server_from_arguments(args, port=args.port)
+    print(f"Fake OpenAI listening at {server.base_url} (median {args.latency_ms} ms, sigma {args.latency_sigma})")
+    print(f"Start the backend with OPENAI_BASE_URL={server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,344 @@
+#!/usr/bin/env python
+"""
+Generate a synthetic patient cohort for scale testing.
+
+Produces patients in the same document shape as the app writes them
+(dashboard fields, wearable series, risk history, Alexa ID, dated symptom
+states) along with their multi-year check-in histories in
+``conversation_logs``. Every patient is generated from its own random
+stream derived from ``--seed`` and its index, so a cohort is identical
+regardless of how many workers build it.
+
+Workers generate and insert chunks of patients in parallel with unordered
+bulk inserts; indexes are built once loading is done.
+
+Usage: python scripts/generate_cohort.py --patients 100000 --workers 8
+"""
+import os
+import sys
+import time
+import math
+import random
+import argparse
+from datetime import datetime, timedelta
+from multiprocessing import Pool
+from bson import ObjectId
+from pymongo import MongoClient, ASCENDING
+from dotenv import load_dotenv
+
+# Get the parent directory
+script_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(script_dir)
+# Add the parent directory to sys.path
+sys.path.insert(0, parent_dir)
+
+# Load environment variables from .env file
+load_dotenv(os.path.join(parent_dir, '.env'))
+
+from app.models.conversation import ConversationHelper
+from app.utils.interview import SYMPTOM_QUESTIONS, OPENING, CLOSING
+from app.utils.patient_list import list_fields, ensure_patient_list_indexes
+from app.utils.patient_overview import ensure_patient_overview_indexes, rebuild_patient_overview
+from app.utils.symptom_history import history_document
+
+SYMPTOMS = ConversationHelper.SYMPTOM_CATEGORIES
+
+FIRST_NAMES = [
+    "Emily", "James", "Maria", "Robert", "Linda", "Michael", "Patricia", "David", "Barbara", "William",
+    "Susan", "Richard", "Jessica", "Joseph", "Sarah", "Thomas", "Karen", "Charles", "Nancy", "Daniel",
+    "Lisa", "Matthew", "Betty", "Anthony", "Sandra", "Mark", "Ashley", "Steven", "Dorothy", "Paul"
+]
+LAST_NAMES = [
+    "Johnson", "Smith", "Garcia", "Brown", "Davis", "Miller", "Wilson", "Moore", "Taylor", "Anderson",
+    "Thomas", "Jackson", "White", "Harris", "Martin", "Thompson", "Martinez", "Robinson", "Clark", "Lewis",
+    "Lee", "Walker", "Hall", "Allen", "Young", "Hernandez", "King", "Wright", "Lopez", "Hill"
+]
+CANCER_TYPES = ["Breast Cancer", "Lymphoma", "Leukemia"]
+STAGES = ["IIA", "IIB", "IIIA", "IV"]
+TREATMENTS = ["Doxorubicin Chemotherapy", "Immunotherapy", "Tyrosine Kinase Inhibitors", "Radiation Therapy"]
+HOSPITALIZATION_REASONS = [
+    "Arrhythmia Episode", "Cardiologist Referral for EF Monitoring", "Cardiotoxicity Symptoms (Dyspnea, Edema)",
+    "Echocardiogram (EF drop detected)", "Heart Failure Management", "Chest Pain Evaluation"
+]
+FEATURES = ["Heart Rate", "Respiration Rate", "SpO2", "Skin Temperature", "Chest Discomfort"]
+
+# Baseline and day-to-day spread of each wearable series
+VITALS = {
+    "heartRate": (76, 6, 0),
+    "respiration": (16, 1.5, 0),
+    "spo2": (97, 1.2, 0),
+    "skinTemperature": (36.6, 0.25, 1)
+}
+
+GREETINGS = ["I'm doing okay", "Hi, I'm fine today", "Good morning", "Not too bad", "Hello", "I'm alright"]
+DENIALS = ["No", "No, not at all", "Nope", "No, I haven't", "Not really"]
+REPORTS = {
+    "Shortness of Breath": ["Yes, I get short of breath on the stairs", "A little out of breath when I walk"],
+    "Palpitation": ["Yes, my heart was racing last night", "I felt my heart skip a few beats"],
+    "Chest Discomfort": ["Some tightness in my chest this morning", "Yes, a bit of chest pressure"],
+    "Swelling": ["My ankles are swollen in the evening", "Yes, my feet look puffy"],
+    "Fatigue": ["Yes, I've been really tired", "I feel exhausted most afternoons"],
+    "Syncope": ["I felt lightheaded when I stood up", "Yes, I got dizzy yesterday"]
+}
+FOLLOW_UPS = ["How long has that been going on?", "Has it been getting worse?", "Does it go away with rest?"]
+FOLLOW_UP_ANSWERS = ["A couple of days", "About the same as before", "It eases off if I sit down"]
+DASHBOARD_QUESTIONS = {
+    "Shortness of Breath": "Are you experiencing shortness of breath?",
+    "Palpitation": "Are you experiencing palpitations?",
+    "Chest Discomfort": "Are you experiencing any chest discomfort?",
+    "Swelling": "Are you experiencing any swelling?",
+    "Fatigue": "Are you feeling more fatigued than usual?",
+    "Syncope": "Have you experienced any episodes of fainting?"
+}
+
+CLOSING_TEXT = CLOSING.replace("CONVERSATION_END", "").strip()
+LOCAL_SERVED_BY = {"path": "interview", "model": None, "max_tokens": None}
+LLM_SERVED_BY = {"path": "primary", "model": "gpt-4-turbo", "max_tokens": 1000}
+
+
+def object_id(rng, at):
+    """A reproducible ObjectId whose timestamp is ``at``."""
+    return ObjectId(int(at.timestamp()).to_bytes(4, "big") + rng.getrandbits(64).to_bytes(8, "big"))
+
+
+def us_date(day):
+    return day.strftime("%m/%d/%Y")
+
+
+def vital_series(rng, days, end):
+    series = {}
+    for name, (baseline, spread, digits) in VITALS.items():
+        personal = baseline + rng.gauss(0, spread / 2)
+        value = lambda: round(personal + rng.gauss(0, spread), digits) if digits else int(round(personal + rng.gauss(0, spread)))
+        series[name] = {
+            "24hrs": [value() for _ in range(10)],
+            "10days": [{"date": (end - timedelta(days=days - 1 - i)).strftime("%Y-%m-%d"), "value": value()} for i in range(days)]
+        }
+    return series
+
+
+def risk_prediction(rng, end, base_score):
+    history = []
+    score = base_score
+    for i in range(30):
+        score = min(99, max(1, score + rng.gauss(0, 3)))
+        history.append({"date": (end - timedelta(days=29 - i)).strftime("%Y-%m-%d"), "value": int(round(score))})
+    weights = sorted((rng.randint(5, 35) for _ in FEATURES), reverse=True)
+    return {
+        "lastUpdated": us_date(end),
+        "riskScore": history[-1]["value"],
+        "featureImportance": [{"label": label, "value": weight} for label, weight in zip(FEATURES, weights)],
+        "historicalData": history
+    }
+
+
+def checkin(rng, patient_id, started, symptom_rates):
+    """One check-in conversation: its log documents and the day's symptom states."""
+    logs = []
+    at = started
+
+    def add(role, content, served_by=None):
+        nonlocal at
+        at += timedelta(seconds=rng.randint(4, 40))
+        log = {"_id": object_id(rng, at), "patient_id": patient_id, "role": role, "content": content, "created_at": at}
+        if served_by:
+            log["served_by"] = served_by
+        logs.append(log)
+        return str(log["_id"])
+
+    add("user", rng.choice(GREETINGS))
+    states = {}
+    first = True
+    for symptom in SYMPTOMS:
+        question = SYMPTOM_QUESTIONS[symptom]
+        add("bot", f"{OPENING} {question}" if first else question, LOCAL_SERVED_BY if first else LLM_SERVED_BY)
+        first = False
+        if rng.random() < symptom_rates[symptom]:
+            ids = [add("user", rng.choice(REPORTS[symptom]))]
+            add("bot", rng.choice(FOLLOW_UPS), LLM_SERVED_BY)
+            ids.append(add("user", rng.choice(FOLLOW_UP_ANSWERS)))
+            states[symptom] = {"experienced": True, "logs": ids}
+        else:
+            states[symptom] = {"experienced": False, "logs": [add("user", rng.choice(DENIALS))]}
+    add("bot", CLOSING_TEXT, LOCAL_SERVED_BY)
+    return logs, states
+
+
+def dashboard_conversation(states):
+    """The dashboard's summary of the latest check-in, per symptom."""
+    conversations = {}
+    for symptom in SYMPTOMS:
+        experienced = states[symptom]["experienced"]
+        conversations[symptom] = [
+            {"type": "bot", "text": DASHBOARD_QUESTIONS[symptom], "icon": "robotIcon"},
+            {
+                "type": "patient",
+                "text": "Yes, I have." if experienced else "No, I haven't.",
+                "icon": "userIcon",
+                "experienced": experienced
+            },
+            {"type": "bot", "text": "We will keep tracking this and inform your healthcare provider.", "icon": "robotIcon"}
+        ]
+    return conversations
+
+
+def generate_patient(seed, index, end, years, checkins):
+    """A patient document and their conversation logs, determined only by ``seed`` and ``index``."""
+    rng = random.Random(f"{seed}:{index}")
+    created = end - timedelta(days=int(365 * years * rng.uniform(0.5, 1.0)))
+    _id = object_id(rng, created)
+    patient_id = str(_id)
+
+    base_score = rng.uniform(10, 90)
+    risk_level = "High" if base_score >= 65 else "Moderate" if base_score >= 35 else "Low"
+    # Sicker patients report symptoms more often
+    symptom_rates = {symptom: min(0.6, rng.uniform(0.02, 0.15) * (1 + base_score / 50)) for symptom in SYMPTOMS}
+
+    # Check-in days spread over the patient's time in the program
+    span_days = max(1, (end - created).days)
+    count = min(span_days, max(1, int(rng.expovariate(1 / checkins)) + 1)) if checkins else 0
+    days = sorted(rng.sample(range(span_days), count))
+
+    logs = []
+    symptom_states = {}
+    latest = None
+    for day in days:
+        started = (created + timedelta(days=day)).replace(hour=rng.randint(8, 20), minute=rng.randint(0, 59), second=0, microsecond=0)
+        day_logs, states = checkin(rng, patient_id, started, symptom_rates)
+        logs.extend(day_logs)
+        symptom_states[started.strftime("%Y-%m-%d")] = states
+        latest = (started, states)
+
+    age = rng.randint(28, 85)
+    patient = {
+        "_id": _id,
+        # Clear of the hand-written sample patients' IDs
+        "id": str(1000000 + index),
+        "name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+        "age": age,
+        "gender": rng.choice(["Female", "Male"]),
+        "date_of_birth": f"{end.year - age}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        "cancerType": rng.choice(CANCER_TYPES),
+        "stage": rng.choice(STAGES),
+        "treatment": rng.choice(TREATMENTS),
+        "hospitalizations": sorted(
+            ({"date": us_date(created + timedelta(days=rng.randrange(span_days))), "reason": rng.choice(HOSPITALIZATION_REASONS)}
+             for _ in range(rng.choice([0, 0, 1, 1, 2, 3]))),
+            key=lambda h: datetime.strptime(h["date"], "%m/%d/%Y")
+        ),
+        "riskLevel": risk_level,
+        "wearableSensorData": vital_series(rng, 10, end),
+        "aiRiskPrediction": risk_prediction(rng, end, base_score),
+        "alexa_user_id": f"amzn1.ask.account.synthetic.{index:08d}",
+        "alexa_id_added_at": created,
+        "conversation_ended": True,
+        "symptom_states": symptom_states,
+        "synthetic": True
+    }
+    if latest:
+        patient["last_conversation_date"] = latest[0] + timedelta(minutes=10)
+        patient["conversationLog"] = {"date": us_date(latest[0]), "conversations": dashboard_conversation(latest[1])}
+    patient.update(list_fields(patient))
+    return patient, logs
+
+
+_db = None
+
+
+def init_worker(mongo_uri, database):
+    global _db
+    _db = MongoClient(mongo_uri)[database]
+
+
+def load_chunk(task):
+    """Generate patients ``start`` to ``stop`` and insert them with their logs."""
+    seed, start, stop, end, years, checkins, log_batch = task
+    patients = []
+    logs = []
+    inserted_logs = 0
+    for index in range(start, stop):
+        patient, patient_logs = generate_patient(seed, index, end, years, checkins)
+        patients.append(patient)
+        logs.extend(patient_logs)
+        if len(logs) >= log_batch:
+            _db.conversation_logs.insert_many(logs, ordered=False)
+            inserted_logs += len(logs)
+            logs = []
+    if logs:
+        _db.conversation_logs.insert_many(logs, ordered=False)
+        inserted_logs += len(logs)
+    _db.patients.insert_many(patients, ordered=False)
+    _db.symptom_history.insert_many([history_document(patient) for patient in patients], ordered=False)
+    return len(patients), inserted_logs
+
+
+def build_indexes(db):
+    """Indexes the app's queries rely on, built once after the bulk load."""
+    db.patients.create_index("id")
+    db.patients.create_index("alexa_user_id")
+    db.conversation_logs.create_index([("patient_id", ASCENDING), ("created_at", ASCENDING)])
+    ensure_patient_list_indexes(db)
+    ensure_patient_overview_indexes(db)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic patient cohort')
+    parser.add_argument('--patients', type=int, default=1000, help='Patients to generate')
+    parser.add_argument('--years', type=float, default=2, help='Longest time a patient has been in the program')
+    parser.add_argument('--checkins', type=float, default=3, help='Mean check-ins per patient (about 15 messages each)')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed; the same seed gives the same cohort')
+    parser.add_argument('--end-date', type=str, default=None, help='Last day of the histories, YYYY-MM-DD (default: today)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 4, help='Parallel generator processes')
+    parser.add_argument('--chunk', type=int, default=500, help='Patients per bulk insert')
+    parser.add_argument('--log-batch', type=int, default=10000, help='Conversation logs per bulk insert')
+    parser.add_argument('--offset', type=int, default=0, help='Index of the first patient, to extend an existing cohort')
+    parser.add_argument('--mongo-uri', type=str, default=os.getenv('MONGO_URI'), help='MongoDB to load (default: MONGO_URI)')
+    parser.add_argument('--database', type=str, default=None, help='Database name (default: from the URI, else patient_data)')
+    parser.add_argument('--drop', action='store_true', help='Remove earlier synthetic patients and their logs first')
+    args = parser.parse_args()
+
+    if not args.mongo_uri:
+        print("Error: MONGO_URI not found in environment variables.")
+        sys.exit(1)
+    client = MongoClient(args.mongo_uri)
+    db = client.get_default_database(default="patient_data") if args.database is None else client[args.database]
+    client.admin.command('ping')
+    print(f"✅ Connected to MongoDB database {db.name}")
+
+    if args.drop:
+        ids = [str(p["_id"]) for p in db.patients.find({"synthetic": True}, {"_id": 1})]
+        for i in range(0, len(ids), 10000):
+            db.conversation_logs.delete_many({"patient_id": {"$in": ids[i:i + 10000]}})
+        removed = db.patients.delete_many({"synthetic": True}).deleted_count
+        print(f"✅ Removed {removed} synthetic patients and their conversation logs")
+
+    end = datetime.strptime(args.end_date, "%Y-%m-%d") if args.end_date else datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    end = end.replace(hour=23, minute=59)
+    first, last = args.offset, args.offset + args.patients
+    tasks = [
+        (args.seed, start, min(start + args.chunk, last), end, args.years, args.checkins, args.log_batch)
+        for start in range(first, last, args.chunk)
+    ]
+
+    print(f"Generating {args.patients} patients with {args.workers} workers...")
+    started = time.perf_counter()
+    patients = messages = 0
+    with Pool(args.workers, initializer=init_worker, initargs=(args.mongo_uri, db.name)) as pool:
+        for done, (chunk_patients, chunk_logs) in enumerate(pool.imap_unordered(load_chunk, tasks), 1):
+            patients += chunk_patients
+            messages += chunk_logs
+            if done % max(1, math.ceil(len(tasks) / 20)) == 0 or done == len(tasks):
+                elapsed = time.perf_counter() - started
+                print(f"  {patients}/{args.patients} patients, {messages} messages "
+                      f"({patients / elapsed:.0f} patients/s, {messages / elapsed:.0f} messages/s)")
+
+    print("Building indexes...")
+    build_indexes(db)
+    print("Building the cohort overview...")
+    rebuild_patient_overview(db)
+    elapsed = time.perf_counter() - started
+    print(f"\n✅ Loaded {patients} patients and {messages} conversation messages in {elapsed:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,435 @@
+#!/usr/bin/env python
+"""
+Open-loop load generator for the Alexa conversation API and the dashboard.
+
+Simulates many patients checking in at once. Check-ins and dashboard page
+loads arrive as a Poisson process sized to hit a target request rate,
+whether or not earlier requests have finished, so a slow server builds a
+backlog instead of quietly slowing the load down. Each check-in replays a
+conversation from the corpus turn by turn with think time in between,
+then ends the session.
+
+Latency is measured from when each request was due, so time spent queued
+behind a saturated server (or client) counts. Runs one or more steps of
+increasing rate and reports latency histograms, percentiles and error
+rates per step, and the first step that misses the SLO.
+
+Usage:
+  python scripts/load_generator.py --base-url http://localhost:5002 --steps 5,10,20,40 --duration 60
+"""
+import os
+import sys
+import json
+import math
+import time
+import heapq
+import random
+import argparse
+import threading
+from collections import deque
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+
+# Get the parent directory
+script_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(script_dir)
+
+# Load environment variables from .env file
+load_dotenv(os.path.join(parent_dir, '.env'))
+
+RESULTS_DIR = os.path.join(parent_dir, "benchmark_results")
+DEFAULT_CORPUS = os.path.join(script_dir, "conversation_corpus.json")
+
+# Requests in a dashboard page load: the patient list, then what a patient switch fetches
+DASHBOARD_DETAIL_PATHS = ["", "/wearable-data", "/risk-prediction", "/available-dates"]
+DASHBOARD_REQUESTS = 2 + len(DASHBOARD_DETAIL_PATHS)
+
+HISTOGRAM_BUCKETS_MS = [10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    # Nearest-rank percentile
+    return sorted_values[min(len(sorted_values) - 1, max(0, math.ceil(p / 100 * len(sorted_values)) - 1))]
+
+
+class StepStats:
+    """Outcomes of the requests issued during one load step."""
+
+    def __init__(self):
+        self.latencies = {}
+        self.service = {}
+        self.errors = {}
+        self.client_errors = {}
+        self.issued = 0
+        self.completed = 0
+        self.dropped_arrivals = 0
+        self._lock = threading.Lock()
+
+    def record(self, label, latency, service, status):
+        with self._lock:
+            self.latencies.setdefault(label, []).append(latency)
+            self.service.setdefault(label, []).append(service)
+            self.completed += 1
+            if status is None or status >= 500:
+                self.errors[label] = self.errors.get(label, 0) + 1
+            elif status >= 400:
+                self.client_errors[label] = self.client_errors.get(label, 0) + 1
+
+    def summary(self, target_rps, seconds):
+        endpoints = {}
+        all_latencies = []
+        for label in sorted(self.latencies):
+            values = sorted(self.latencies[label])
+            service = sorted(self.service[label])
+            all_latencies.extend(values)
+            endpoints[label] = {
+                "count": len(values),
+                "errors": self.errors.get(label, 0),
+                "client_errors": self.client_errors.get(label, 0),
+                "p50_ms": round(percentile(values, 50) * 1000, 1),
+                "p95_ms": round(percentile(values, 95) * 1000, 1),
+                "p99_ms": round(percentile(values, 99) * 1000, 1),
+                "service_p95_ms": round(percentile(service, 95) * 1000, 1),
+                "histogram": histogram(values)
+            }
+        all_latencies.sort()
+        errors = sum(self.errors.values())
+        return {
+            "target_rps": target_rps,
+            "achieved_rps": round(self.completed / seconds, 2) if seconds else 0.0,
+            "issued": self.issued,
+            "completed": self.completed,
+            "error_rate": round(errors / self.completed, 4) if self.completed else 0.0,
+            "dropped_arrivals": self.dropped_arrivals,
+            "p50_ms": round(percentile(all_latencies, 50) * 1000, 1) if all_latencies else None,
+            "p95_ms": round(percentile(all_latencies, 95) * 1000, 1) if all_latencies else None,
+            "p99_ms": round(percentile(all_latencies, 99) * 1000, 1) if all_latencies else None,
+            "histogram": histogram(all_latencies),
+            "endpoints": endpoints
+        }
+
+
+def histogram(values):
+    """Counts per latency bucket, keyed by the bucket's upper bound in ms."""
+    counts = {f"<={bound}": 0 for bound in HISTOGRAM_BUCKETS_MS}
+    counts[f">{HISTOGRAM_BUCKETS_MS[-1]}"] = 0
+    for value in values:
+        ms = value * 1000
+        for bound in HISTOGRAM_BUCKETS_MS:
+            if ms <= bound:
+                counts[f"<={bound}"] += 1
+                break
+        else:
+            counts[f">{HISTOGRAM_BUCKETS_MS[-1]}"] += 1
+    return counts
+
+
+class LoadGenerator:
+    """
+    Issues requests at their due times from a single scheduler thread.
+
+    Sessions are chains of timed events rather than threads, so thousands
+    of patients can be mid-check-in with only as many threads as there are
+    requests in flight.
+    """
+
+    def __init__(self, args, corpus, alexa_ids, dashboard_ids):
+        self.args = args
+        self.base_url = args.base_url.rstrip("/")
+        self.corpus = corpus
+        self.alexa_ids = alexa_ids
+        self.idle_patients = deque(alexa_ids)
+        self.dashboard_ids = dashboard_ids
+        self.random = random.Random(args.seed)
+        self.pool = ThreadPoolExecutor(max_workers=args.max_in_flight, thread_name_prefix="load")
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=args.max_in_flight, pool_maxsize=args.max_in_flight)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({"X-API-Key": args.api_key, "Content-Type": "application/json"})
+        self._events = []
+        self._sequence = 0
+        self._condition = threading.Condition()
+        self._active_sessions = 0
+        # Bumped after each step so callbacks of abandoned sessions are ignored
+        self._generation = 0
+        self.stats = None
+
+        mean_turns = sum(len(conversation["turns"]) for conversation in corpus) / len(corpus)
+        # session_end follows the turns
+        checkin_requests = mean_turns + 1
+        share = args.dashboard_share
+        self.requests_per_arrival = (1 - share) * checkin_requests + share * DASHBOARD_REQUESTS
+
+    def schedule(self, due, action):
+        with self._condition:
+            self._sequence += 1
+            heapq.heappush(self._events, (due, self._sequence, action))
+            self._condition.notify()
+
+    def request(self, due, label, method, path, then=None, **kwargs):
+        """Send a request at ``due`` and record its latency from then; ``then`` gets the response."""
+        stats = self.stats
+        generation = self._generation
+
+        def send():
+            started = time.perf_counter()
+            try:
+                response = self.session.request(method, f"{self.base_url}{path}", timeout=self.args.timeout, **kwargs)
+                status = response.status_code
+            except requests.RequestException:
+                response, status = None, None
+            finished = time.perf_counter()
+            stats.record(label, finished - due, finished - started, status)
+            if then is not None and generation == self._generation:
+                then(response)
+
+        def submit():
+            stats.issued += 1
+            self.pool.submit(send)
+        self.schedule(due, submit)
+
+    def think_time(self):
+        return self.random.expovariate(1 / self.args.think_time) if self.args.think_time else 0.0
+
+    def start_checkin(self, due):
+        if not self.idle_patients:
+            self.stats.dropped_arrivals += 1
+            return
+        alexa_id = self.idle_patients.popleft()
+        turns = list(self.random.choice(self.corpus)["turns"])
+        with self._condition:
+            self._active_sessions += 1
+        self.next_turn(due, alexa_id, turns)
+
+    def next_turn(self, due, alexa_id, turns):
+        path = f"/api/alexa/user/{alexa_id}"
+        if not turns:
+            self.request(due, "POST session_end", "POST", f"{path}/session_end",
+                         then=lambda response: self.end_checkin(alexa_id))
+            return
+
+        content = turns.pop(0)
+
+        def after_turn(response):
+            should_end = False
+            if response is not None and response.ok:
+                try:
+                    should_end = bool(response.json().get("should_end"))
+                except ValueError:
+                    pass
+            self.next_turn(time.perf_counter() + self.think_time(), alexa_id, [] if should_end else turns)
+        self.request(due, "POST conversation", "POST", f"{path}/conversation", then=after_turn, json={"content": content})
+
+    def end_checkin(self, alexa_id):
+        self.idle_patients.append(alexa_id)
+        with self._condition:
+            self._active_sessions -= 1
+            self._condition.notify()
+
+    def start_dashboard(self, due):
+        self.request(due, "GET patients", "GET", "/api/patients")
+        if not self.dashboard_ids:
+            return
+        patient_id = self.random.choice(self.dashboard_ids)
+        # The dashboard fetches a patient's panels in parallel
+        for suffix in DASHBOARD_DETAIL_PATHS:
+            self.request(due, f"GET patient{suffix or ''}", "GET", f"/api/patients/{patient_id}{suffix}")
+        self.request(due, "GET daily-summary", "GET", f"/api/daily-summary/{patient_id}")
+
+    def run_step(self, target_rps, duration):
+        """Generate load at ``target_rps`` for ``duration`` seconds, then let sessions finish."""
+        self.stats = StepStats()
+        arrival_rate = target_rps / self.requests_per_arrival
+        started = time.perf_counter()
+        end = started + duration
+        next_arrival = started
+
+        # Arrivals are events too, so one thread paces everything
+        def arrive():
+            nonlocal next_arrival
+            due = next_arrival
+            if self.random.random() < self.args.dashboard_share:
+                self.start_dashboard(due)
+            else:
+                self.start_checkin(due)
+            next_arrival += self.random.expovariate(arrival_rate)
+            if next_arrival < end:
+                self.schedule(next_arrival, arrive)
+        self.schedule(next_arrival, arrive)
+
+        max_lag = 0.0
+        drain_until = end + self.args.drain
+        while True:
+            with self._condition:
+                now = time.perf_counter()
+                if now >= drain_until or (now >= end and not self._active_sessions and not self._events):
+                    break
+                if not self._events or self._events[0][0] > now:
+                    timeout = (self._events[0][0] - now) if self._events else 0.1
+                    self._condition.wait(min(timeout, 0.1))
+                    continue
+                due, _, action = heapq.heappop(self._events)
+            max_lag = max(max_lag, now - due)
+            action()
+
+        # Sessions still going after the drain are abandoned; their requests
+        # in flight finish in the background but start nothing new
+        with self._condition:
+            self._events.clear()
+            unfinished = self._active_sessions
+            self._active_sessions = 0
+            self._generation += 1
+        self.idle_patients = deque(self.alexa_ids)
+
+        # Achieved rate counts the completed requests of this step's arrivals,
+        # per second of arrivals, comparable to the target
+        summary = self.stats.summary(target_rps, duration)
+        summary["scheduler_max_lag_ms"] = round(max_lag * 1000, 1)
+        summary["unfinished_sessions"] = unfinished
+        return summary
+
+
+def ensure_patients(args):
+    """Create the simulated patients (existing ones are reused) and return their Alexa IDs."""
+    alexa_ids = [f"{args.patient_prefix}-{i:05d}" for i in range(args.patients)]
+    if args.skip_setup:
+        return alexa_ids
+    headers = {"X-API-Key": args.api_key, "Content-Type": "application/json"}
+
+    def create(alexa_id):
+        response = requests.post(
+            f"{args.base_url.rstrip('/')}/api/patients",
+            headers=headers,
+            json={"name": f"Load Patient {alexa_id}", "alexa_user_id": alexa_id},
+            timeout=args.timeout
+        )
+        return response.status_code in (201, 409)
+
+    print(f"Creating {args.patients} simulated patients...")
+    with ThreadPoolExecutor(max_workers=32) as pool:
+        created = sum(pool.map(create, alexa_ids))
+    if created < len(alexa_ids):
+        print(f"⚠️ Only {created} of {len(alexa_ids)} patients could be created or found")
+    return alexa_ids
+
+
+def dashboard_patient_ids(args):
+    try:
+        response = requests.get(f"{args.base_url.rstrip('/')}/api/patients", params={"limit": 200}, timeout=args.timeout)
+        return [patient["id"] for patient in response.json()["patients"] if patient.get("id")]
+    except Exception as e:
+        print(f"⚠️ Could not load dashboard patients: {str(e)}")
+        return []
+
+
+def saturated(step, args):
+    """Why a step missed the SLO, or None if it met it."""
+    reasons = []
+    if step["achieved_rps"] < 0.9 * step["target_rps"]:
+        reasons.append(f"achieved {step['achieved_rps']} of {step['target_rps']} rps")
+    if step["p95_ms"] is not None and step["p95_ms"] > args.slo_p95_ms:
+        reasons.append(f"p95 {step['p95_ms']} ms over {args.slo_p95_ms} ms")
+    if step["error_rate"] > args.max_error_rate:
+        reasons.append(f"error rate {step['error_rate']:.1%}")
+    if step["dropped_arrivals"]:
+        reasons.append(f"{step['dropped_arrivals']} check-ins dropped for lack of idle patients")
+    return "; ".join(reasons) or None
+
+
+def print_step(step):
+    print(f"\n📈 Target {step['target_rps']} rps: achieved {step['achieved_rps']} rps, "
+          f"{step['completed']} requests, error rate {step['error_rate']:.2%}, "
+          f"p50 {step['p50_ms']} ms, p95 {step['p95_ms']} ms, p99 {step['p99_ms']} ms")
+    total = max(step["completed"], 1)
+    for bucket, count in step["histogram"].items():
+        bar = "█" * int(40 * count / total)
+        print(f"  {bucket:>8} ms {count:>7} {bar}")
+    print(f"  {'endpoint':<30}{'count':>7}{'5xx':>6}{'4xx':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'svc p95':>10}")
+    for label, stats in step["endpoints"].items():
+        print(f"  {label:<30}{stats['count']:>7}{stats['errors']:>6}{stats['client_errors']:>6}"
+              f"{stats['p50_ms']:>10}{stats['p95_ms']:>10}{stats['p99_ms']:>10}{stats['service_p95_ms']:>10}")
+    if step["scheduler_max_lag_ms"] > 100:
+        print(f"  ⚠️ The generator fell {step['scheduler_max_lag_ms']} ms behind schedule; results understate the load")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Open-loop load generator for the Alexa conversation API')
+    parser.add_argument('--base-url', type=str, default="http://localhost:5002", help='Backend to load')
+    parser.add_argument('--api-key', type=str, default=os.getenv("ALEXA_API_KEY"), help='API key (default: ALEXA_API_KEY)')
+    parser.add_argument('--steps', type=str, default="5,10,20", help='Comma-separated target requests per second')
+    parser.add_argument('--duration', type=float, default=60, help='Seconds of arrivals per step')
+    parser.add_argument('--drain', type=float, default=30, help='Seconds to let sessions finish after each step')
+    parser.add_argument('--patients', type=int, default=2000, help='Simulated patients')
+    parser.add_argument('--patient-prefix', type=str, default="load", help='Prefix of the simulated Alexa user IDs')
+    parser.add_argument('--skip-setup', action='store_true', help="Don't create the simulated patients")
+    parser.add_argument('--corpus', type=str, default=DEFAULT_CORPUS, help='JSON list of conversations')
+    parser.add_argument('--dashboard-share', type=float, default=0.1, help='Share of arrivals that are dashboard page loads')
+    parser.add_argument('--think-time', type=float, default=3.0, help='Mean seconds a patient takes to answer')
+    parser.add_argument('--timeout', type=float, default=10.0, help='Request timeout in seconds')
+    parser.add_argument('--max-in-flight', type=int, default=256, help='Client threads, i.e. most requests in flight')
+    parser.add_argument('--slo-p95-ms', type=float, default=2000, help='p95 latency a step must stay under')
+    parser.add_argument('--max-error-rate', type=float, default=0.01, help='Error rate a step must stay under')
+    parser.add_argument('--seed', type=int, default=None, help='Random seed')
+    parser.add_argument('--output', type=str, default=None, help='Where to save the results (default: benchmark_results/)')
+    args = parser.parse_args()
+
+    if not args.api_key:
+        print("❌ Error: set ALEXA_API_KEY or pass --api-key")
+        sys.exit(1)
+    try:
+        requests.get(f"{args.base_url.rstrip('/')}/health", timeout=args.timeout)
+    except requests.exceptions.ConnectionError:
+        print(f"❌ Could not connect to server at {args.base_url}")
+        sys.exit(1)
+
+    with open(args.corpus) as f:
+        corpus = json.load(f)
+    steps = [float(step) for step in args.steps.split(",") if step.strip()]
+
+    alexa_ids = ensure_patients(args)
+    dashboard_ids = dashboard_patient_ids(args)
+    generator = LoadGenerator(args, corpus, alexa_ids, dashboard_ids)
+    print(f"✅ {len(alexa_ids)} patients, {len(corpus)} conversations, "
+          f"~{generator.requests_per_arrival:.1f} requests per arrival")
+
+    results = []
+    saturation = None
+    for target in steps:
+        step = generator.run_step(target, args.duration)
+        step["saturated"] = saturated(step, args)
+        results.append(step)
+        print_step(step)
+        if step["saturated"] and saturation is None:
+            saturation = step
+            print(f"  🔴 Saturated: {step['saturated']}")
+
+    print()
+    if saturation is None:
+        print(f"✅ Met the SLO at every step up to {steps[-1]} rps")
+    else:
+        sustainable = [step["target_rps"] for step in results if not step["saturated"]]
+        print(f"🔴 Saturation at {saturation['target_rps']} rps"
+              + (f"; last step within the SLO: {max(sustainable)} rps" if sustainable else ""))
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"load-{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}.json")
+    with open(output, "w") as f:
+        json.dump({
+            "base_url": args.base_url,
+            "timestamp": datetime.utcnow().isoformat(),
+            "settings": {key: value for key, value in vars(args).items() if key != "api_key"},
+            "steps": results
+        }, f, indent=2)
+    print(f"💾 Saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
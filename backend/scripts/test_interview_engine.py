@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+"""
+Regression check of the interview engine against a running backend.
+
+Run the backend with OPENAI_BASE_URL pointing at scripts/fake_openai_server.py,
+whose conversation replies start with the symptom status header like the
+real model's. The check creates a patient and makes sure that:
+
+  - a "No" after an LLM reply asking about one symptom denies only that
+    symptom, instead of all six named in the header, and the check-in goes on
+  - neither the stored nor the streamed replies contain the header
+  - only plain greetings and positive openers get the local opening
+
+Usage: python scripts/test_interview_engine.py --port 5002
+"""
+import os
+import sys
+import json
+import argparse
+import requests
+from dotenv import load_dotenv
+
+load_dotenv()
+
+parser = argparse.ArgumentParser(description='Check the interview engine against a backend using the fake OpenAI server')
+parser.add_argument('--port', type=int, default=5002, help='Port the Flask server is running on')
+args = parser.parse_args()
+
+BASE_URL = f"http://localhost:{args.port}"
+API_KEY = os.getenv("ALEXA_API_KEY")
+
+if not API_KEY:
+    print("❌ Error: ALEXA_API_KEY environment variable not set.")
+    sys.exit(1)
+
+HEADERS = {
+    "Content-Type": "application/json",
+    "X-API-Key": API_KEY
+}
+
+SEPARATOR = "=============="
+
+
+def say(alexa_user_id, content, stream=False):
+    response = requests.post(
+        f"{BASE_URL}/api/alexa/user/{alexa_user_id}/conversation",
+        headers=HEADERS,
+        params={"stream": "1"} if stream else None,
+        json={"content": content},
+        timeout=30
+    )
+    response.raise_for_status()
+    if not stream:
+        return response.json()
+    lines = [json.loads(line) for line in response.text.splitlines() if line.strip()]
+    streamed = "".join(line.get("delta", "") for line in lines)
+    return dict(lines[-1], streamed=streamed)
+
+
+def create_patient():
+    response = requests.post(f"{BASE_URL}/api/patients", headers=HEADERS, json={"name": "Interview Check"}, timeout=10)
+    response.raise_for_status()
+    return response.json()["alexa_user_id"]
+
+
+def check_openings(failures):
+    openings = {
+        "Good morning!": True,
+        "I'm doing well, thanks": True,
+        "Well my wife passed away last week": False,
+        "I'm in the hospital": False,
+        "I'm not feeling great": False,
+        "I'm not sleeping well": False
+    }
+    for content, local in openings.items():
+        reply = say(create_patient(), content)
+        if ((reply.get("served_by") or {}).get("path") == "interview") != local:
+            failures.append(f"{content!r} was {'not ' if local else ''}answered with the local opening")
+
+
+def main():
+    alexa_user_id = create_patient()
+    print(f"🧪 Created patient with Alexa ID {alexa_user_id}")
+
+    failures = []
+    check_openings(failures)
+    # Not a plain greeting, so the LLM answers: "... How long has that been going on?"
+    first = say(alexa_user_id, "I've been feeling a bit off today", stream=True)
+    if SEPARATOR in first["streamed"] or SEPARATOR in first["response"]:
+        failures.append("the status header reached the client")
+
+    # The LLM asks about swelling only
+    second = say(alexa_user_id, "Since yesterday")
+    if "swelling" not in second["response"].lower():
+        failures.append(f"unexpected reply from the fake model: {second['response']!r}")
+
+    third = say(alexa_user_id, "No")
+    if third["should_end"]:
+        failures.append("one \"No\" ended the check-in")
+    if (third.get("served_by") or {}).get("path") != "interview":
+        failures.append(f"the \"No\" wasn't answered by the interview engine: {third.get('served_by')}")
+
+    logs = requests.get(f"{BASE_URL}/api/alexa/user/{alexa_user_id}/conversation_logs", headers=HEADERS, timeout=10)
+    logs.raise_for_status()
+    if SEPARATOR in logs.text:
+        failures.append("a stored bot message still has the status header")
+
+    for failure in failures:
+        print(f"❌ {failure}")
+    if failures:
+        sys.exit(1)
+    print(f"✅ Check-in continued after the denial: {third['response']!r}")
+
+
+if __name__ == "__main__":
+    main()
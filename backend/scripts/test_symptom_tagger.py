@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+"""
+Offline checks of the rule-based symptom tagger on hand-written conversations.
+
+Needs no server, database or OpenAI key; exits with status 1 if a check fails.
+
+Usage: python scripts/test_symptom_tagger.py
+"""
+import os
+import sys
+
+# Get the parent directory
+script_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(script_dir)
+# Add the parent directory to sys.path
+sys.path.insert(0, parent_dir)
+
+from app.utils.symptom_tagger import tag_conversation, asked_symptoms, strip_status_header
+
+# What the model puts before every reply, as the system prompt asks
+STATUS_HEADER = (
+    "Shortness of Breath: in discussion\n"
+    "Palpitation: not discussed\n"
+    "Chest Discomfort: not discussed\n"
+    "Swelling: not discussed\n"
+    "Fatigue: not discussed\n"
+    "Syncope: not discussed\n"
+    "==============\n"
+)
+
+
+def log(role, content):
+    return {"_id": f"{role}-{len(content)}", "role": role, "content": content}
+
+
+def check_status_header_is_ignored():
+    reply = STATUS_HEADER + "Have you had any trouble breathing?"
+    assert strip_status_header(reply) == "Have you had any trouble breathing?"
+    assert asked_symptoms(reply) == {"Shortness of Breath"}, asked_symptoms(reply)
+
+    result = tag_conversation([log("assistant", reply), log("user", "No")])
+    assert result.resolved["Shortness of Breath"]["experienced"] is False
+    for symptom in ("Palpitation", "Chest Discomfort", "Swelling", "Fatigue", "Syncope"):
+        # Named only in the header, so not denied; the LLM decides them
+        assert symptom in result.uncertain, (symptom, result.resolved.get(symptom))
+
+
+def check_only_questions_count_as_asked():
+    reply = "I'm sorry you've been so tired. How long has that been going on?"
+    assert asked_symptoms(reply) == set(), asked_symptoms(reply)
+    assert asked_symptoms("Glad your chest feels better. Any swelling in your ankles?") == {"Swelling"}
+
+
+def check_unmatched_turns_go_to_the_llm():
+    for answer in (
+        "My ankles look bigger than usual and my heart feels funny",
+        "I had to sit down because the room was spinning"
+    ):
+        result = tag_conversation([log("assistant", "How have you been today?"), log("user", answer)])
+        assert result.resolved == {}, (answer, result.resolved)
+        assert len(result.messages) == 2, (answer, result.messages)
+    assert all(state["experienced"] is False for state in tag_conversation([]).resolved.values())
+
+
+def check_reported_symptom_stays_reported():
+    result = tag_conversation([
+        log("bot", "Have you noticed your heart racing or beating irregularly?"),
+        log("user", "Yes, my heart was racing last night")
+    ])
+    assert result.resolved["Palpitation"]["experienced"] is True
+
+
+CHECKS = [
+    check_status_header_is_ignored,
+    check_only_questions_count_as_asked,
+    check_unmatched_turns_go_to_the_llm,
+    check_reported_symptom_stays_reported
+]
+
+
+def main():
+    failed = 0
+    for check in CHECKS:
+        try:
+            check()
+            print(f"✅ {check.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {check.__name__}: {e}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -22,12 +22,18 @@ def test_auto_update():
     patient_id = result.inserted_id
     print(f"Created test patient with ID: {patient_id}")
     
-    # Wait for background task to run (typically 15-20 seconds)
-    print("Waiting for background task to run (20 seconds)...")
-    time.sleep(20)
-    
-    # Check if Alexa ID was assigned
-    updated_patient = db.patients.find_one({"_id": patient_id})
+    # Wait for the change stream watcher (or the slower reconciliation job on
+    # standalone deployments) to assign an ID
+    timeout = int(os.getenv("ALEXA_ID_WAIT_SECONDS", 60))
+    print(f"Waiting up to {timeout} seconds for an Alexa ID to be assigned...")
+    started = time.time()
+    updated_patient = None
+    while time.time() - started < timeout:
+        updated_patient = db.patients.find_one({"_id": patient_id})
+        if updated_patient and updated_patient.get("alexa_user_id"):
+            print(f"Alexa ID assigned after {time.time() - started:.2f} seconds")
+            break
+        time.sleep(0.2)
     
     if updated_patient and "alexa_user_id" in updated_patient and updated_patient["alexa_user_id"]:
         print(f"✅ SUCCESS: Alexa ID assigned: {updated_patient['alexa_user_id']}")
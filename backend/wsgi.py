@@ -0,0 +1,13 @@
+"""
+WSGI entry point for production servers.
+
+The app is built without connecting to MongoDB or starting threads so it can
+be imported in a preforking master; each worker initializes itself after the
+fork (``post_worker_init`` in ``gunicorn.conf.py``, or on its first request
+under other servers).
+
+Usage: gunicorn -c gunicorn.conf.py wsgi:application
+"""
+from app import create_app
+
+application = create_app(init_clients=False)